@@ -0,0 +1,34 @@
+"""Функции, которые выполняются в процессах пула AnalysisExecutor.
+
+Процессы запускаются методом spawn и импортируют только этот модуль (и модуль
+__main__ родителя, поэтому точки входа не создают объекты бота при импорте).
+Здесь нет импортов бота, парсера, GPT и хранилищ: тяжёлый NGramAnalyzer
+создаётся один раз в init_worker.
+"""
+import os
+from typing import List, Tuple
+
+from analyzer.ngram_counter import ngram_counters
+
+_analyzer = None
+
+
+def init_worker():
+    global _analyzer
+    from analyzer.ngram import NGramAnalyzer
+    _analyzer = NGramAnalyzer()
+    # Прогрев: первый вызов pymorphy3 и токенизатора NLTK
+    _analyzer.tokenize("прогрев анализатора")
+
+
+def count_shard(texts: List[str], query: str) -> dict:
+    query_tokens = set(_analyzer.tokenize(query)) if query else set()
+    return ngram_counters(_analyzer.tokenize_many(texts, query_tokens), query_tokens)
+
+
+def tfidf(texts: List[str], ngram_range: Tuple[int, int], max_features: int) -> List[Tuple[str, float]]:
+    return _analyzer.analyze_tfidf(texts, ngram_range=ngram_range, max_features=max_features)
+
+
+def ping() -> int:
+    return os.getpid()
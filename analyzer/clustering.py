@@ -0,0 +1,92 @@
+"""Кластеризация похожих фраз для GPTProcessor.cluster_phrases.
+
+Правило прежнее: фразы обходятся по порядку, каждая ещё не занятая фраза начинает
+кластер и забирает все следующие незанятые фразы с fuzz.ratio > threshold (без
+учёта регистра); частоты суммируются, в результате остаётся фраза-затравка.
+
+Вместо n² вызовов fuzz.ratio из Python похожие пары ищутся rapidfuzz.process.cdist
+(C++, все ядра) с блокировкой по длине: ratio = 2·LCS / (len1 + len2) не больше
+2·min / (len1 + len2), поэтому фразы сравниваются только с фразами подходящей
+длины — после сортировки по длине это непрерывный диапазон. Затем тот же жадный
+обход идёт по найденным парам. fuzz.ratio из fuzzywuzzy округляет до целого, так что
+"> 80" означает точное значение строго больше 80.5 (round(80.5) == 80). Результат
+совпадает с fuzzywuzzy на python-Levenshtein (та же метрика Indel); чистый difflib
+в fuzzywuzzy изредка оценивает пары иначе. Без rapidfuzz используется прежний цикл.
+"""
+import bisect
+from typing import Dict, List
+
+try:
+    import numpy as np
+    from rapidfuzz import fuzz as rf_fuzz, process as rf_process
+except ImportError:
+    rf_process = None
+
+CLUSTER_THRESHOLD = 80
+_BLOCK_ROWS = 512  # строк матрицы cdist за один вызов
+
+
+def _cluster_fuzzywuzzy(phrases: List[Dict[str, int]], threshold: int) -> List[Dict[str, int]]:
+    from fuzzywuzzy import fuzz
+    clustered = []
+    used = set()
+    for i, p1 in enumerate(phrases):
+        if i in used:
+            continue
+        cluster_count = p1['count']
+        for j, p2 in enumerate(phrases[i + 1:], i + 1):
+            if j not in used and fuzz.ratio(p1['phrase'].lower(), p2['phrase'].lower()) > threshold:
+                cluster_count += p2['count']
+                used.add(j)
+        clustered.append({"phrase": p1['phrase'], "count": cluster_count})
+        used.add(i)
+    return clustered
+
+
+def similar_pairs(strings: List[str], threshold: int = CLUSTER_THRESHOLD) -> List[List[int]]:
+    """Для каждого i — возрастающий список j > i, у которых fuzz.ratio(strings[i], strings[j]) > threshold."""
+    if rf_process is None:
+        from fuzzywuzzy import fuzz
+        return [[j for j in range(i + 1, len(strings)) if fuzz.ratio(a, strings[j]) > threshold]
+                for i, a in enumerate(strings)]
+    cutoff = threshold + 0.5
+    order = sorted((i for i, s in enumerate(strings) if s), key=lambda i: len(strings[i]))
+    lengths = [len(strings[i]) for i in order]
+    sorted_strings = [strings[i] for i in order]
+    neighbours: List[List[int]] = [[] for _ in strings]
+    for start in range(0, len(order), _BLOCK_ROWS):
+        stop = min(start + _BLOCK_ROWS, len(order))
+        # Столбцы, которые по длине могут дать ratio > cutoff хоть с одной строкой блока
+        lo = bisect.bisect_left(lengths, lengths[start] * cutoff / (200 - cutoff))
+        hi = bisect.bisect_right(lengths, lengths[stop - 1] * (200 - cutoff) / cutoff)
+        scores = rf_process.cdist(
+            sorted_strings[start:stop], sorted_strings[lo:hi],
+            scorer=rf_fuzz.ratio, score_cutoff=cutoff, dtype=np.float64, workers=-1
+        )
+        rows, cols = np.nonzero(scores > cutoff)
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            i, j = order[start + row], order[lo + col]
+            if i < j:
+                neighbours[i].append(j)
+    for items in neighbours:
+        items.sort()
+    return neighbours
+
+
+def cluster_phrases(phrases: List[Dict[str, int]], threshold: int = CLUSTER_THRESHOLD) -> List[Dict[str, int]]:
+    if rf_process is None:
+        return _cluster_fuzzywuzzy(phrases, threshold)
+    neighbours = similar_pairs([p['phrase'].lower() for p in phrases], threshold)
+    clustered = []
+    used = bytearray(len(phrases))
+    for i, p1 in enumerate(phrases):
+        if used[i]:
+            continue
+        used[i] = 1
+        cluster_count = p1['count']
+        for j in neighbours[i]:
+            if not used[j]:
+                used[j] = 1
+                cluster_count += phrases[j]['count']
+        clustered.append({"phrase": p1['phrase'], "count": cluster_count})
+    return clustered
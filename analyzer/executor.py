@@ -0,0 +1,68 @@
+"""Анализ текстов в пуле процессов, чтобы не занимать цикл событий бота.
+
+Каждый воркер при старте создаёт свой NGramAnalyzer (pymorphy3, словари NLTK,
+кэш лемм) и держит его до остановки пула. Подсчёт n-грамм делится на части по
+ANALYSIS_SHARD_SIZE текстов (map) и складывается в родительском процессе (reduce);
+результат совпадает с NGramAnalyzer.analyze на всём корпусе. TF-IDF требует
+статистики по всему корпусу, поэтому выполняется одной задачей.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import config
+from analyzer import analysis_worker
+from analyzer.ngram_counter import merge_counters
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_WORKERS = getattr(config, "ANALYSIS_WORKERS", min(4, os.cpu_count() or 1))
+ANALYSIS_SHARD_SIZE = getattr(config, "ANALYSIS_SHARD_SIZE", 200)  # текстов на одну задачу
+
+
+class AnalysisExecutor:
+    """Асинхронный интерфейс к пулу процессов анализа.
+
+    Пул создаётся при первом вызове. Процессы запускаются методом spawn: в родителе
+    к этому моменту уже работают потоки (Selenium, aiohttp), и fork с ними небезопасен.
+    Воркеры выполняют функции из analyzer.analysis_worker.
+    """
+
+    def __init__(self, workers: int = ANALYSIS_WORKERS, shard_size: int = ANALYSIS_SHARD_SIZE):
+        self.workers = workers
+        self.shard_size = shard_size
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=analysis_worker.init_worker
+            )
+        return self._pool
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._get_pool(), func, *args)
+
+    async def warm_up(self):
+        """Запускает все воркеры заранее, чтобы первый запрос не ждал их старта."""
+        pids = await asyncio.gather(*(self._run(analysis_worker.ping) for _ in range(self.workers)))
+        logger.info(f"Analysis workers ready: {len(set(pids))}")
+
+    async def analyze(self, texts: List[str], query: str = '') -> Dict[str, List[Tuple[str, int]]]:
+        """То же, что NGramAnalyzer.analyze по списку текстов: частоты 1-, 2- и 3-грамм."""
+        shards = [texts[i:i + self.shard_size] for i in range(0, len(texts), self.shard_size)] or [[]]
+        parts = await asyncio.gather(*(self._run(analysis_worker.count_shard, shard, query) for shard in shards))
+        return merge_counters(parts)
+
+    async def tfidf(self, texts: List[str], ngram_range=(1, 3), max_features=50) -> List[Tuple[str, float]]:
+        return await self._run(analysis_worker.tfidf, texts, ngram_range, max_features)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -1,11 +1,19 @@
-import openai
+import asyncio
 import hashlib
 import json
-from typing import Dict, List
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
 import logging
-from analyzer.ngram import NGramAnalyzer
-from storage.redis import RedisStorage
-from fuzzywuzzy import fuzz
+import config
+from analyzer.executor import AnalysisExecutor
+from analyzer.json_stream import JSONArrayStream
+from analyzer.openai_client import GPTClient
+from analyzer.prompt_builder import build_chunks, count_tokens, dedupe_texts
+from storage.gpt_cache import GPTResultCache
+from storage.redis import AsyncRedisStorage
+from storage.revalidation import Revalidator
+from analyzer.clustering import cluster_phrases
+from progress import ProgressCallback, emit, GPT_STARTED, GPT_CHUNKS, GPT_FILTER, FALLBACK
 
 # Настройка логирования
 logging.basicConfig(
@@ -18,30 +26,125 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+GPT_MERGED_CALL = getattr(config, "GPT_MERGED_CALL", False)  # извлечение и фильтрация мусора одним запросом
+GPT_CHUNK_MAX_OUTPUT = getattr(config, "GPT_CHUNK_MAX_OUTPUT", 1500)  # max_tokens ответа на одну часть
+GPT_STREAM = getattr(config, "GPT_STREAM", True)  # получать фразы по мере генерации ответа
+
+# Получает промежуточный список фраз (сумма по всем частям) по мере их появления
+PartialCallback = Callable[[List[Dict[str, int]]], Awaitable[None]]
+
+# Входит в ключ кэша GPT: увеличивайте при любой правке промптов ниже
+PROMPT_VERSION = "2"
+
+EXTRACT_PROMPT = """
+        Вы — SEO-аналитик. Дан запрос: "{}".
+        Извлеките из текста ключевые фразы (1–3 слова), релевантные для SEO.
+        Обязательно включите биграммы (например, "зимние ботинки") и триграммы (например, "женские зимние ботинки"), связанные с запросом.
+        Исключите:
+        - Неинформативные слова ("купить", "доставка", "распродажа", "обувная серия", "гарантия", "отзывы").
+        - Бренды (например, "ZOLINBERG", "YZYNX", "Vicappy", "ARPSTAR", "Your Way").
+        - Технические коды ("ma7e4zm/a").
+        - Повторы слов ("ботинки ботинки").
+        Нормализуйте термины ("boots" → "ботинки", "women" → "женские").
+        Верните JSON: [{{ "phrase": "фраза", "count": N }}, ...], где N — частота фразы.
+        Текст:
+        {}
+        """
+
+MERGED_PROMPT = """
+        Вы — SEO-аналитик. Дан запрос: "{}".
+        Извлеките из текста ключевые фразы (1–3 слова), релевантные для SEO.
+        Обязательно включите биграммы (например, "зимние ботинки") и триграммы (например, "женские зимние ботинки"), связанные с запросом.
+        Исключите:
+        - Неинформативные слова ("купить", "доставка", "распродажа", "обувная серия", "гарантия", "отзывы").
+        - Бренды (например, "ZOLINBERG", "YZYNX", "Vicappy", "ARPSTAR", "Your Way").
+        - Технические коды ("ma7e4zm/a").
+        - Повторы слов ("ботинки ботинки").
+        - Рекламные маркеры ("скидка", "акция", "🔥").
+        - Общие слова без конкретики ("качество", "лучший").
+        - Технические или неинформативные фразы ("обувная серия", "в наличии").
+        Нормализуйте термины ("boots" → "ботинки", "women" → "женские").
+        Верните JSON-объект: {{ "phrases": [{{ "phrase": "фраза", "count": N }}, ...] }}, где N — частота фразы.
+        Текст:
+        {}
+        """
+
+
+def parse_phrases(content: str) -> List[Dict[str, int]]:
+    """Список фраз из ответа модели: JSON-массив или объект с ключом "phrases".
+
+    Если ответ обрезан по max_tokens, берутся все фразы до последнего полного объекта.
+    """
+    try:
+        parsed = json.loads(content)
+    except json.JSONDecodeError:
+        start, end = content.find('['), content.rfind('}')
+        if start < 0 or end < start:
+            raise
+        parsed = json.loads(content[start:end + 1] + ']')
+        logger.warning(f"Truncated GPT response, salvaged {len(parsed)} phrases")
+    if isinstance(parsed, dict):
+        parsed = parsed.get("phrases", [])
+    return _valid_phrases(parsed)
+
+
+def _phrase_count(value) -> int:
+    """Частота из ответа GPT: число или строка из цифр, всё остальное считается нулём."""
+    if isinstance(value, bool):
+        return 0
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    return 0
+
+
+def _valid_phrases(items) -> List[Dict[str, int]]:
+    """Оставляет элементы вида {"phrase": str, "count": N > 0}, приводя count к int."""
+    phrases = []
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get('phrase'), str) or not item['phrase']:
+            continue
+        count = _phrase_count(item.get('count'))
+        if count > 0:
+            phrases.append({**item, "count": count})
+    return phrases
+
+
+def merge_phrases(parts: List[List[Dict[str, int]]]) -> List[Dict[str, int]]:
+    """Сумма частот фраз по частям текста. Фразы сравниваются без учёта регистра и лишних
+    пробелов; порядок — по убыванию частоты, при равенстве — по первому появлению."""
+    merged: Dict[str, Dict[str, int]] = {}
+    for phrases in parts:
+        for item in phrases:
+            key = " ".join(str(item['phrase']).lower().split())
+            if key in merged:
+                merged[key]['count'] += int(item['count'])
+            else:
+                merged[key] = {"phrase": item['phrase'], "count": int(item['count'])}
+    return sorted(merged.values(), key=lambda item: -item['count'])
+
+
 class GPTProcessor:
-    def __init__(self, api_key: str):
-        self.client = openai.OpenAI(api_key=api_key)
-        self.redis = RedisStorage()
-        self.analyzer = NGramAnalyzer()
+    def __init__(self, api_key: str, merged_call: bool = GPT_MERGED_CALL, stream: bool = GPT_STREAM):
+        self.gpt = GPTClient(api_key)
+        self.merged_call = merged_call
+        self.stream = stream
+        self.redis = AsyncRedisStorage()
+        self.cache = GPTResultCache(self.redis)
+        self.executor = AnalysisExecutor()
+        self.revalidator = Revalidator()
+
+    async def close(self):
+        await self.revalidator.close()
+        await self.gpt.close()
+        self.executor.shutdown()
 
     def cluster_phrases(self, phrases: List[Dict[str, int]]) -> List[Dict[str, int]]:
-        clustered = []
-        used = set()
-        for i, p1 in enumerate(phrases):
-            if i in used:
-                continue
-            cluster = [p1]
-            cluster_count = p1['count']
-            for j, p2 in enumerate(phrases[i+1:], i+1):
-                if j not in used and fuzz.ratio(p1['phrase'].lower(), p2['phrase'].lower()) > 80:
-                    cluster.append(p2)
-                    cluster_count += p2['count']
-                    used.add(j)
-            clustered.append({"phrase": p1['phrase'], "count": cluster_count})
-            used.add(i)
-        return clustered
-
-    def filter_junk_phrases(self, phrases: List[Dict[str, int]], niche: str) -> List[Dict[str, int]]:
+        return cluster_phrases(phrases)
+
+    async def filter_junk_phrases(self, phrases: List[Dict[str, int]], niche: str,
+                                  usage: Optional[Dict[str, int]] = None) -> List[Dict[str, int]]:
         """Фильтрация мусорных фраз с помощью GPT."""
         phrase_list = [p['phrase'] for p in phrases]
         prompt = """
@@ -57,12 +160,10 @@ class GPTProcessor:
         {}
         """.format(niche, "\n".join(phrase_list))
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=1000,
-                temperature=0.1
-            )
+            response = await self.gpt.complete([{"role": "user", "content": prompt}], max_tokens=1000)
+            if usage is not None and response.usage:
+                usage["prompt_tokens"] += response.usage.prompt_tokens
+                usage["completion_tokens"] += response.usage.completion_tokens
             result = json.loads(response.choices[0].message.content)
             return [
                 p for p in phrases
@@ -72,13 +173,100 @@ class GPTProcessor:
             logger.error(f"GPT junk filter error: {str(e)}")
             return phrases  # Возвращаем исходный список при ошибке
 
-    def process_ngrams(self, query: str, data: Dict[str, List[str]]) -> List[Dict[str, int]]:
-        cache_key = f"gpt_ngrams:{hashlib.md5((query + json.dumps(data)).encode()).hexdigest()}"
-        cached = self.redis.get_cache(0, cache_key)
+    def cache_key(self, query: str, data: Dict[str, List[str]]) -> str:
+        prompt_version = f"{PROMPT_VERSION}:{'merged' if self.merged_call else 'extract'}"
+        return self.cache.key(query, data, self.gpt.model, prompt_version)
+
+    async def process_ngrams(self, query: str, data: Dict[str, List[str]],
+                             on_partial: Optional[PartialCallback] = None,
+                             on_progress: Optional[ProgressCallback] = None) -> List[Dict[str, int]]:
+        """Ключевые фразы по текстам карточек. on_partial вызывается с найденными на данный
+        момент фразами, пока идёт потоковый ответ GPT (до кластеризации и фильтра мусора);
+        on_progress — с этапами: старт GPT, обработанные части, фильтр мусора, локальный анализ."""
+        cache_key = self.cache_key(query, data)
+        cached, stale = await self.cache.get(cache_key)
+        if cached and stale:
+            logger.info(f"Serving stale GPT n-grams, refreshing in background: {cache_key}")
+            self.revalidator.schedule(cache_key, lambda: self._compute_ngrams(query, data, cache_key))
+            return cached
         if cached:
             logger.info(f"Cache hit for GPT n-grams: {cache_key}")
             return cached
+        if await self.cache.is_negative(cache_key):
+            # Этот же вход недавно не удалось обработать — не тратим на него запросы к GPT
+            await emit(on_progress, FALLBACK)
+            return await self.fallback_ngram_analysis(query, data)
+        return await self._compute_ngrams(query, data, cache_key, on_partial, on_progress)
+
+    async def _extract_chunk(self, query: str, chunk: str, usage: Dict[str, int],
+                             on_items: Optional[Callable[[List[dict]], Awaitable[None]]] = None
+                             ) -> List[Dict[str, int]]:
+        if self.stream:
+            return await self._stream_chunk(query, chunk, usage, on_items)
+        template = MERGED_PROMPT if self.merged_call else EXTRACT_PROMPT
+        try:
+            # В режиме merged_call мусорные фразы модель отбрасывает сама
+            response = await self.gpt.complete(
+                [{"role": "user", "content": template.format(query, chunk)}],
+                max_tokens=GPT_CHUNK_MAX_OUTPUT, json_object=self.merged_call
+            )
+        except Exception as e:
+            logger.error(f"GPT chunk extraction error: {str(e)}")
+            usage["failed_chunks"] += 1
+            return []
+        if response.usage:
+            usage["prompt_tokens"] += response.usage.prompt_tokens
+            usage["completion_tokens"] += response.usage.completion_tokens
+        try:
+            return parse_phrases(response.choices[0].message.content)
+        except (json.JSONDecodeError, AttributeError, TypeError) as e:
+            logger.error(f"Invalid JSON from GPT chunk extraction: {str(e)}")
+            usage["failed_chunks"] += 1
+            return []
+
+    async def _stream_chunk(self, query: str, chunk: str, usage: Dict[str, int],
+                            on_items: Optional[Callable[[List[dict]], Awaitable[None]]]) -> List[Dict[str, int]]:
+        template = MERGED_PROMPT if self.merged_call else EXTRACT_PROMPT
+        parser = JSONArrayStream()
+        try:
+            async for text in self.gpt.stream(
+                [{"role": "user", "content": template.format(query, chunk)}],
+                max_tokens=GPT_CHUNK_MAX_OUTPUT, json_object=self.merged_call, usage=usage
+            ):
+                items = _valid_phrases(parser.feed(text))
+                if items and on_items:
+                    await on_items(items)
+        except Exception as e:
+            if not parser.items:
+                logger.error(f"GPT chunk extraction error: {str(e)}")
+                usage["failed_chunks"] += 1
+                return []
+            logger.warning(f"GPT stream interrupted ({str(e)}), keeping {len(parser.items)} phrases")
+            usage["truncated_chunks"] += 1
+        else:
+            if not parser.done:
+                if not parser.items:
+                    logger.error("Invalid JSON from GPT chunk extraction: no complete phrases in stream")
+                    usage["failed_chunks"] += 1
+                    return []
+                # Ответ обрезан по max_tokens: остаются все полностью полученные фразы
+                logger.warning(f"Truncated GPT stream, salvaged {len(parser.items)} phrases")
+                usage["truncated_chunks"] += 1
+        return _valid_phrases(parser.items)
 
+    async def _record_usage(self, query: str, usage: Dict[str, int]):
+        logger.info(f"GPT usage for query {query}: {usage}")
+        try:
+            query_hash = hashlib.md5(query.encode()).hexdigest()
+            await self.redis.set_json(f"gpt_usage:{query_hash}", {"query": query, **usage})
+            for field, value in usage.items():
+                await self.redis.incr_stat("gpt_usage", field, value)
+        except Exception as e:
+            logger.debug(f"Failed to record GPT usage: {str(e)}")
+
+    async def _compute_ngrams(self, query: str, data: Dict[str, List[str]], cache_key: str,
+                              on_partial: Optional[PartialCallback] = None,
+                              on_progress: Optional[ProgressCallback] = None) -> List[Dict[str, int]]:
         texts = (
             data.get('titles', []) +
             data.get('descriptions', []) +
@@ -86,47 +274,78 @@ class GPTProcessor:
             data.get('breadcrumbs', []) +
             data.get('product_descriptions', [])
         )
-        text_input = "\n".join([t for t in texts if t and t.lower() not in ['распродажа', 'осталась 1 шт', '']])
-        if not text_input:
-            logger.warning("Empty or non-informative text input for GPT processing")
-            return self.fallback_ngram_analysis(query, data)
-
-        prompt = """
-        Вы — SEO-аналитик. Дан запрос: "{}".
-        Извлеките из текста ключевые фразы (1–3 слова), релевантные для SEO.
-        Обязательно включите биграммы (например, "зимние ботинки") и триграммы (например, "женские зимние ботинки"), связанные с запросом.
-        Исключите:
-        - Неинформативные слова ("купить", "доставка", "распродажа", "обувная серия", "гарантия", "отзывы").
-        - Бренды (например, "ZOLINBERG", "YZYNX", "Vicappy", "ARPSTAR", "Your Way").
-        - Технические коды ("ma7e4zm/a").
-        - Повторы слов ("ботинки ботинки").
-        Нормализуйте термины ("boots" → "ботинки", "women" → "женские").
-        Верните JSON: [{{ "phrase": "фраза", "count": N }}, ...], где N — частота фразы.
-        Текст:
-        {}
-        """.format(query, text_input)
+        texts = [t for t in texts if t and t.lower() not in ['распродажа', 'осталась 1 шт', '']]
+        started = time.perf_counter()
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=2000,
-                temperature=0.1
-            )
-            result = response.choices[0].message.content
-            parsed_result = json.loads(result)
-            parsed_result = [item for item in parsed_result if item.get('phrase') and item.get('count', 0) > 0]
-            if not parsed_result:
-                logger.warning("GPT returned empty result, falling back to local n-gram analysis")
-                parsed_result = self.fallback_ngram_analysis(query, data)
+            if not texts:
+                logger.warning("Empty or non-informative text input for GPT processing")
+                await emit(on_progress, FALLBACK)
+                return await self.fallback_ngram_analysis(query, data)
+            unique_texts = dedupe_texts(texts)
+            template = MERGED_PROMPT if self.merged_call else EXTRACT_PROMPT
+            chunks, dropped = build_chunks(unique_texts, overhead=count_tokens(template.format(query, "")),
+                                           model=self.gpt.model)
+            usage = {
+                "queries": 1, "texts": len(texts), "unique_texts": len(unique_texts), "chunks": len(chunks),
+                "dropped_tokens": dropped, "failed_chunks": 0, "truncated_chunks": 0,
+                "prompt_tokens": 0, "completion_tokens": 0
+            }
+            received: List[List[Dict[str, int]]] = [[] for _ in chunks]
+
+            def collector(index: int):
+                async def on_items(items: List[dict]):
+                    received[index].extend(items)
+                    await on_partial(merge_phrases(received))
+                return on_items if on_partial else None
+
+            finished = 0
+
+            async def extract(i: int, chunk: str) -> List[Dict[str, int]]:
+                nonlocal finished
+                phrases = await self._extract_chunk(query, chunk, usage, collector(i))
+                finished += 1
+                await emit(on_progress, GPT_CHUNKS, finished, len(chunks))
+                return phrases
+
+            await emit(on_progress, GPT_STARTED, total=len(chunks))
+            parts = await asyncio.gather(*(extract(i, chunk) for i, chunk in enumerate(chunks)))
+            parsed_result = merge_phrases(parts)
+            if not parsed_result and usage["failed_chunks"] == len(chunks):
+                logger.warning("GPT failed on every chunk, falling back to local n-gram analysis")
+                await self._record_usage(query, usage)
+                await self.cache.set_negative(cache_key, "failed")
+                await emit(on_progress, FALLBACK)
+                return await self.fallback_ngram_analysis(query, data)
+            from_fallback = not parsed_result
+            if from_fallback:
+                # GPT ответил, но фраз не нашёл: локальные фразы проходят тот же путь,
+                # что и ответ GPT, — кластеризация, фильтр мусора и кэш
+                logger.warning("GPT returned no phrases, falling back to local n-gram analysis")
+                await emit(on_progress, FALLBACK)
+                parsed_result = await self.fallback_ngram_analysis(query, data)
+                if not parsed_result:
+                    await self._record_usage(query, usage)
+                    await self.cache.set_negative(cache_key, "empty")
+                    return []
             clustered_result = self.cluster_phrases(parsed_result)
-            filtered_result = self.filter_junk_phrases(clustered_result, query)
-            self.redis.set_cache(0, cache_key, filtered_result)
+            if self.merged_call and not from_fallback:
+                filtered_result = clustered_result
+            else:
+                await emit(on_progress, GPT_FILTER)
+                filtered_result = await self.filter_junk_phrases(clustered_result, query, usage)
+            await self._record_usage(query, usage)
+            await self.cache.set(cache_key, filtered_result, self.gpt.model, usage, time.perf_counter() - started)
             return filtered_result
         except Exception as e:
             logger.error(f"GPT processing error: {str(e)}")
-            return self.fallback_ngram_analysis(query, data)
+            try:
+                await self.cache.set_negative(cache_key, "error")
+            except Exception as cache_error:
+                logger.debug(f"Failed to store negative GPT cache entry: {str(cache_error)}")
+            await emit(on_progress, FALLBACK)
+            return await self.fallback_ngram_analysis(query, data)
 
-    def fallback_ngram_analysis(self, query: str, data: Dict[str, List[str]]) -> List[Dict[str, int]]:
+    async def fallback_ngram_analysis(self, query: str, data: Dict[str, List[str]]) -> List[Dict[str, int]]:
         texts = (
             data.get('titles', []) +
             data.get('descriptions', []) +
@@ -134,5 +353,10 @@ class GPTProcessor:
             data.get('breadcrumbs', []) +
             data.get('product_descriptions', [])
         )
-        tfidf_result = self.analyzer.analyze_tfidf(texts, ngram_range=(1, 3), max_features=50)
+        try:
+            tfidf_result = await self.executor.tfidf(texts, ngram_range=(1, 3), max_features=50)
+        except Exception as e:
+            # Например, "empty vocabulary" у TfidfVectorizer, если в текстах одни стоп-слова
+            logger.error(f"Local n-gram analysis error: {str(e)}")
+            return []
         return [{"phrase": phrase, "count": int(score * 10)} for phrase, score in tfidf_result]
\ No newline at end of file
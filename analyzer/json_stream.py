@@ -0,0 +1,60 @@
+"""Потоковый разбор JSON-массива объектов из ответа GPT.
+
+Ответ приходит кусками (stream=True), и ждать его конца, чтобы сделать json.loads,
+не нужно: JSONArrayStream.feed принимает очередной кусок текста и возвращает объекты
+массива, которые в нём закончились. Массив ищется по первой "[", поэтому подходят и
+голый массив, и объект вида {"phrases": [...]}, и ответ с текстом перед JSON. Если
+поток оборвался, в items остаются все полностью полученные объекты.
+"""
+import json
+from typing import List
+
+
+class JSONArrayStream:
+    def __init__(self):
+        self.items: List[dict] = []
+        self.started = False  # встретилась открывающая "[" массива
+        self.done = False  # массив закрыт
+        self._buffer: List[str] = []  # текст текущего элемента
+        self._depth = 0  # вложенность внутри текущего элемента
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text: str) -> List[dict]:
+        found = []
+        for ch in text:
+            if self.done:
+                break
+            if not self.started:
+                self.started = ch == '['
+                continue
+            if self._depth == 0:
+                if ch == '{':
+                    self._depth = 1
+                    self._buffer = [ch]
+                elif ch == ']':
+                    self.done = True
+                continue
+            self._buffer.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in '{[':
+                self._depth += 1
+            elif ch in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        item = json.loads(''.join(self._buffer))
+                    except json.JSONDecodeError:
+                        continue  # испорченный элемент пропускаем, остальные разбираем дальше
+                    if isinstance(item, dict):
+                        found.append(item)
+        self.items.extend(found)
+        return found
@@ -0,0 +1,96 @@
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+LEMMA_CACHE_SIZE = getattr(config, "LEMMA_CACHE_SIZE", 100_000)
+LEMMA_CACHE_PATH = getattr(config, "LEMMA_CACHE_PATH", None)  # например "lemmas.db"; None — только в памяти
+_SQLITE_BATCH = 500  # лимит параметров в одном запросе SQLite
+
+
+class LemmaCache:
+    """Кэш лемм: ограниченный LRU в процессе и, при заданном path, словарь в SQLite.
+
+    SQLite-файл общий для всех процессов (режим WAL), поэтому воркеры анализа
+    лемматизируют каждое слово один раз на всех. get_many() работает пачкой:
+    один проход по LRU, один SELECT по промахам, pymorphy3 только для новых слов.
+    """
+
+    def __init__(self, lemmatize: Callable[[str], str], maxsize: int = LEMMA_CACHE_SIZE,
+                 path: Optional[str] = LEMMA_CACHE_PATH):
+        self.lemmatize = lemmatize
+        self.maxsize = maxsize
+        self.path = path
+        self._lru: "OrderedDict[str, str]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.counters = {"hit": 0, "disk_hit": 0, "miss": 0}
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        if self.path and self._conn is None:
+            try:
+                self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("CREATE TABLE IF NOT EXISTS lemmas (token TEXT PRIMARY KEY, lemma TEXT NOT NULL)")
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Lemma cache database unavailable, using memory only: {str(e)}")
+                self.path = None
+                self._conn = None
+        return self._conn
+
+    def _remember(self, token: str, lemma: str):
+        self._lru[token] = lemma
+        if len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+
+    def get(self, token: str) -> str:
+        return self.get_many([token])[token]
+
+    def get_many(self, tokens: Iterable[str]) -> Dict[str, str]:
+        with self._lock:
+            result = {}
+            missing = []
+            for token in dict.fromkeys(tokens):
+                lemma = self._lru.get(token)
+                if lemma is None:
+                    missing.append(token)
+                else:
+                    self._lru.move_to_end(token)
+                    result[token] = lemma
+            self.counters["hit"] += len(result)
+            if not missing:
+                return result
+
+            conn = self._db()
+            if conn is not None:
+                for i in range(0, len(missing), _SQLITE_BATCH):
+                    batch = missing[i:i + _SQLITE_BATCH]
+                    rows = conn.execute(
+                        f"SELECT token, lemma FROM lemmas WHERE token IN ({','.join('?' * len(batch))})", batch
+                    ).fetchall()
+                    for token, lemma in rows:
+                        result[token] = lemma
+                        self._remember(token, lemma)
+                self.counters["disk_hit"] += sum(1 for token in missing if token in result)
+                missing = [token for token in missing if token not in result]
+
+            computed = [(token, self.lemmatize(token)) for token in missing]
+            self.counters["miss"] += len(computed)
+            for token, lemma in computed:
+                result[token] = lemma
+                self._remember(token, lemma)
+            if conn is not None and computed:
+                conn.executemany("INSERT OR IGNORE INTO lemmas (token, lemma) VALUES (?, ?)", computed)
+                conn.commit()
+            return result
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -2,10 +2,10 @@ import nltk
 import re
 import pymorphy3
 from nltk.tokenize import word_tokenize
-from nltk.util import ngrams
-from collections import Counter
 from typing import Dict, List, Tuple
 from analyzer.stopwords import StopWords
+from analyzer.lemma_cache import LemmaCache
+from analyzer.ngram_counter import ORDER_NAMES, count_ngrams as count_ngram_orders
 from sklearn.feature_extraction.text import TfidfVectorizer
 
 class NGramAnalyzer:
@@ -13,6 +13,7 @@ class NGramAnalyzer:
         nltk.download('punkt', quiet=True)
         self.stopwords = StopWords()
         self.morph = pymorphy3.MorphAnalyzer()
+        self.lemmas = LemmaCache(self.lemmatize)
         self.term_mapping = {
             'case': 'чехол',
             'silicone': 'силиконовый',
@@ -46,10 +47,25 @@ class NGramAnalyzer:
         """Лемматизация токена с помощью pymorphy3."""
         return self.morph.parse(token)[0].normal_form
 
-    def tokenize(self, text: str, query_tokens: set = None) -> List[str]:
+    def _raw_tokens(self, text: str) -> List[str]:
         text = re.sub(r'[><.,:;!?()"\\/]|\b\d+\b|\b\w*_\w*\b|\s+', ' ', text)
-        tokens = word_tokenize(text.lower(), language='russian')
-        tokens = [self.term_mapping.get(token, self.lemmatize(token)) for token in tokens]
+        return word_tokenize(text.lower(), language='russian')
+
+    def _lemmas_for(self, raw_tokens: List[str]) -> Dict[str, str]:
+        return self.lemmas.get_many(token for token in raw_tokens if token not in self.term_mapping)
+
+    def tokenize(self, text: str, query_tokens: set = None) -> List[str]:
+        raw_tokens = self._raw_tokens(text)
+        return self._finish_tokens(raw_tokens, self._lemmas_for(raw_tokens), query_tokens)
+
+    def tokenize_many(self, texts: List[str], query_tokens: set = None) -> List[List[str]]:
+        """Токенизация списка текстов с одним обращением к кэшу лемм на все тексты."""
+        raw = [self._raw_tokens(text) for text in texts]
+        lemmas = self._lemmas_for([token for tokens in raw for token in tokens])
+        return [self._finish_tokens(tokens, lemmas, query_tokens) for tokens in raw]
+
+    def _finish_tokens(self, raw_tokens: List[str], lemmas: Dict[str, str], query_tokens: set = None) -> List[str]:
+        tokens = [self.term_mapping[token] if token in self.term_mapping else lemmas[token] for token in raw_tokens]
         filtered_tokens = [
             token for token in self.stopwords.filter(tokens)
             if any(c.isalpha() for c in token) and
@@ -66,15 +82,10 @@ class NGramAnalyzer:
         return filtered_tokens
 
     def extract_ngrams(self, texts: List[str], n: int, query_tokens: set = None) -> List[Tuple[str, int]]:
-        all_ngrams = []
-        for text in texts:
-            tokens = self.tokenize(text, query_tokens)
-            if len(tokens) >= n:
-                n_grams = [' '.join(gram) for gram in ngrams(tokens, n) if len(set(gram)) == len(gram)]
-                if query_tokens:
-                    n_grams = [gram for gram in n_grams if any(q in gram for q in query_tokens)]
-                all_ngrams.extend(n_grams)
-        return Counter(all_ngrams).most_common()
+        return self.count_ngrams(self.tokenize_many(texts, query_tokens), n, query_tokens)
+
+    def count_ngrams(self, token_lists: List[List[str]], n: int, query_tokens: set = None) -> List[Tuple[str, int]]:
+        return count_ngram_orders(token_lists, query_tokens, max_n=n)[ORDER_NAMES[n - 1]]
 
     def analyze(self, data: Dict[str, List[str]], query: str = '') -> Dict[str, List[Tuple[str, int]]]:
         texts = (
@@ -85,12 +96,9 @@ class NGramAnalyzer:
             data.get('product_descriptions', [])
         )
         query_tokens = set(self.tokenize(query)) if query else set()
-        result = {
-            'unigrams': self.extract_ngrams(texts, 1, query_tokens),
-            'bigrams': self.extract_ngrams(texts, 2, query_tokens),
-            'trigrams': self.extract_ngrams(texts, 3, query_tokens)
-        }
-        return result
+        # Тексты токенизируются один раз, все порядки n-грамм считаются за один проход
+        token_lists = self.tokenize_many(texts, query_tokens)
+        return count_ngram_orders(token_lists, query_tokens, max_n=3)
 
     def analyze_tfidf(self, texts: List[str], ngram_range=(1, 3), max_features=50) -> List[Tuple[str, float]]:
         """Анализ TF-IDF для извлечения ключевых фраз."""
@@ -0,0 +1,111 @@
+"""Подсчёт 1-, 2- и 3-грамм по целочисленным ID токенов.
+
+Токены интернируются в ID, n-граммы хранятся как кортежи ID, а не как строки,
+склеенные через пробел. Строки собираются только для итогового результата.
+
+Фильтр по запросу сводится к проверке принадлежности ID множеству: токен подходит,
+если в нём как подстрока встречается какой-либо токен запроса. Это то же самое, что
+прежнее `any(q in ' '.join(gram) ...)`, потому что токены запроса не содержат пробелов.
+
+Окна всех порядков строятся из одного списка ID текста, а считает их Counter.update
+(цикл в C). N-граммы с повторяющимися токенами отбрасываются при выдаче, по уникальным
+ключам, что не меняет ни частоты, ни порядок остальных. Порядок результата такой же,
+как у прежней реализации: по убыванию частоты, при равенстве — по первому появлению.
+"""
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+ORDER_NAMES = ('unigrams', 'bigrams', 'trigrams')
+
+
+class TokenVocabulary:
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.tokens: List[str] = []
+
+    def intern(self, tokens: Iterable[str]) -> List[int]:
+        ids = self.ids
+        result = []
+        for token in tokens:
+            token_id = ids.get(token)
+            if token_id is None:
+                token_id = ids[token] = len(self.tokens)
+                self.tokens.append(token)
+            result.append(token_id)
+        return result
+
+
+def _count_ids(token_lists: Iterable[List[str]], query_tokens: set, max_n: int) -> Tuple[List[str], List[Counter]]:
+    vocab = TokenVocabulary()
+    counters = [Counter() for _ in range(max_n)]
+    matching: set = set()
+    checked = 0
+
+    for tokens in token_lists:
+        ids = vocab.intern(tokens)
+        if query_tokens:
+            # Новые токены словаря проверяются на совпадение с запросом один раз
+            for token_id in range(checked, len(vocab.tokens)):
+                if any(q in vocab.tokens[token_id] for q in query_tokens):
+                    matching.add(token_id)
+            checked = len(vocab.tokens)
+            # С фильтром по запросу подходит малая доля окон: отбрасываем остальные сразу
+            counters[0].update(a for a in ids if a in matching)
+            if max_n >= 2:
+                counters[1].update(pair for pair in zip(ids, ids[1:])
+                                   if pair[0] in matching or pair[1] in matching)
+            if max_n >= 3:
+                counters[2].update(triple for triple in zip(ids, ids[1:], ids[2:])
+                                   if triple[0] in matching or triple[1] in matching or triple[2] in matching)
+        else:
+            # Без фильтра окна считаются целиком в C, повторы токенов отсеиваются по уникальным ключам
+            counters[0].update(ids)
+            if max_n >= 2:
+                counters[1].update(zip(ids, ids[1:]))
+            if max_n >= 3:
+                counters[2].update(zip(ids, ids[1:], ids[2:]))
+    return vocab.tokens, counters
+
+
+def _decode(tokens: List[str], items: Iterable[Tuple[tuple, int]], n: int) -> Iterator[Tuple[str, int]]:
+    if n == 1:
+        return ((tokens[key], count) for key, count in items)
+    if n == 2:
+        return ((f"{tokens[a]} {tokens[b]}", count) for (a, b), count in items if a != b)
+    return ((f"{tokens[a]} {tokens[b]} {tokens[c]}", count) for (a, b, c), count in items
+            if a != b and b != c and a != c)
+
+
+def count_ngrams(token_lists: Iterable[List[str]], query_tokens: set = None,
+                 max_n: int = len(ORDER_NAMES)) -> Dict[str, List[Tuple[str, int]]]:
+    """{'unigrams': [(фраза, частота), ...], 'bigrams': ..., 'trigrams': ...} для n <= max_n.
+
+    N-граммы с повторяющимися токенами пропускаются; при query_tokens остаются только
+    n-граммы, где хотя бы один токен содержит токен запроса.
+    """
+    tokens, counters = _count_ids(token_lists, query_tokens, max_n)
+    result = {}
+    for n in range(1, max_n + 1):
+        # Счётчик каждого порядка освобождается сразу после выдачи, чтобы не держать все три
+        result[ORDER_NAMES[n - 1]] = list(_decode(tokens, counters.pop(0).most_common(), n))
+    return result
+
+
+def ngram_counters(token_lists: Iterable[List[str]], query_tokens: set = None,
+                   max_n: int = len(ORDER_NAMES)) -> Dict[str, Counter]:
+    """Те же n-граммы в виде Counter по строкам, в порядке первого появления.
+
+    Для map-reduce: счётчики частей корпуса складываются по порядку частей, и
+    merge_counters(...) даёт тот же результат, что count_ngrams по всему корпусу.
+    """
+    tokens, counters = _count_ids(token_lists, query_tokens, max_n)
+    return {ORDER_NAMES[n - 1]: Counter(dict(_decode(tokens, counters[n - 1].items(), n)))
+            for n in range(1, max_n + 1)}
+
+
+def merge_counters(parts: Iterable[Dict[str, Counter]]) -> Dict[str, List[Tuple[str, int]]]:
+    merged: Dict[str, Counter] = {}
+    for part in parts:
+        for name, counter in part.items():
+            merged.setdefault(name, Counter()).update(counter)
+    return {name: counter.most_common() for name, counter in merged.items()}
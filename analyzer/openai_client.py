@@ -0,0 +1,137 @@
+"""Асинхронный клиент OpenAI для GPTProcessor.
+
+Поверх openai.AsyncOpenAI: таймаут на запрос, повторы с экспоненциальной задержкой
+и случайной добавкой (для 429, 5xx, таймаутов и обрывов соединения) и один семафор
+на процесс, ограничивающий число одновременных запросов от всех пользователей.
+stream() отдаёт ответ по кускам, пока модель его генерирует.
+OPENAI_BASE_URL позволяет направить запросы на локальный мок-сервер
+(python -m benchmarks.mock_openai).
+"""
+import asyncio
+import logging
+import random
+from typing import AsyncIterator, Dict, List, Optional
+
+import openai
+import config
+
+logger = logging.getLogger(__name__)
+
+OPENAI_MODEL = getattr(config, "OPENAI_MODEL", "gpt-3.5-turbo")
+OPENAI_BASE_URL = getattr(config, "OPENAI_BASE_URL", None)
+OPENAI_TIMEOUT = getattr(config, "OPENAI_TIMEOUT", 60)  # секунд на один запрос
+OPENAI_MAX_RETRIES = getattr(config, "OPENAI_MAX_RETRIES", 3)
+OPENAI_BACKOFF = getattr(config, "OPENAI_BACKOFF", 1.0)  # базовая задержка перед повтором, сек
+OPENAI_CONCURRENCY = getattr(config, "OPENAI_CONCURRENCY", 4)
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class GPTClient:
+    def __init__(self, api_key: str, model: str = OPENAI_MODEL, base_url: str = OPENAI_BASE_URL,
+                 timeout: float = OPENAI_TIMEOUT, max_retries: int = OPENAI_MAX_RETRIES,
+                 backoff: float = OPENAI_BACKOFF, concurrency: int = OPENAI_CONCURRENCY):
+        # Повторы делаем сами, чтобы они не занимали слот семафора во время ожидания
+        self.client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0)
+        self.model = model
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.counters = {"requests": 0, "retries": 0, "errors": 0}
+
+    def _delay(self, attempt: int, error: Exception) -> float:
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return retry_after
+        return self.backoff * 2 ** attempt * (1 + random.random() / 2)
+
+    async def complete(self, messages: List[dict], max_tokens: int, temperature: float = 0.1,
+                       json_object: bool = False):
+        """Ответ chat.completions; после OPENAI_MAX_RETRIES неудачных повторов — исключение."""
+        kwargs = {"response_format": {"type": "json_object"}} if json_object else {}
+        attempt = 0
+        while True:
+            try:
+                async with self.semaphore:
+                    self.counters["requests"] += 1
+                    return await self.client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        max_tokens=max_tokens,
+                        temperature=temperature,
+                        **kwargs
+                    )
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    self.counters["errors"] += 1
+                    raise
+                delay = self._delay(attempt, e)
+                attempt += 1
+                self.counters["retries"] += 1
+                logger.warning(f"OpenAI request failed ({type(e).__name__}), retry {attempt} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+            except openai.OpenAIError:
+                self.counters["errors"] += 1
+                raise
+
+    async def stream(self, messages: List[dict], max_tokens: int, temperature: float = 0.1,
+                     json_object: bool = False, usage: Optional[Dict[str, int]] = None) -> AsyncIterator[str]:
+        """Текст ответа по мере генерации (stream=True); токены добавляются в usage.
+
+        Повтор возможен, только пока не пришло ни одного куска: обрыв посреди ответа
+        пробрасывается, а уже полученный текст остаётся у вызывающего.
+        """
+        kwargs = {"response_format": {"type": "json_object"}} if json_object else {}
+        attempt = 0
+        while True:
+            received = False
+            try:
+                async with self.semaphore:
+                    self.counters["requests"] += 1
+                    response = await self.client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        max_tokens=max_tokens,
+                        temperature=temperature,
+                        stream=True,
+                        stream_options={"include_usage": True},
+                        **kwargs
+                    )
+                    async for chunk in response:
+                        if chunk.usage and usage is not None:
+                            usage["prompt_tokens"] += chunk.usage.prompt_tokens
+                            usage["completion_tokens"] += chunk.usage.completion_tokens
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            received = True
+                            yield chunk.choices[0].delta.content
+                    return
+            except RETRYABLE_ERRORS as e:
+                if received or attempt >= self.max_retries:
+                    self.counters["errors"] += 1
+                    raise
+                delay = self._delay(attempt, e)
+                attempt += 1
+                self.counters["retries"] += 1
+                logger.warning(f"OpenAI stream failed ({type(e).__name__}), retry {attempt} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+            except openai.OpenAIError:
+                self.counters["errors"] += 1
+                raise
+
+    async def close(self):
+        await self.client.close()
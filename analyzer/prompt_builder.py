@@ -0,0 +1,94 @@
+"""Подготовка текстов для извлечения ключевых фраз GPT по частям.
+
+Тексты очищаются от почти одинаковых повторов (карточки с одинаковым названием,
+копии описаний), затем упаковываются по порядку в части, каждая из которых вместе
+с шаблоном запроса укладывается в GPT_CHUNK_TOKENS. Токены считаются через tiktoken,
+если он установлен, иначе — грубой оценкой по длине текста.
+"""
+import logging
+import re
+from typing import Dict, Iterable, List, Tuple
+
+import config
+from analyzer.clustering import similar_pairs
+
+logger = logging.getLogger(__name__)
+
+GPT_CHUNK_TOKENS = getattr(config, "GPT_CHUNK_TOKENS", 3000)  # токенов входа на одну часть
+GPT_MAX_CHUNKS = getattr(config, "GPT_MAX_CHUNKS", 8)
+GPT_DEDUP_THRESHOLD = getattr(config, "GPT_DEDUP_THRESHOLD", 95)  # fuzz.ratio, выше — дубликат
+_CHARS_PER_TOKEN = 2.5  # оценка без tiktoken: кириллица дороже латиницы
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+_encodings: Dict[str, object] = {}
+
+
+def _encoding(model: str):
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encodings[model] = tiktoken.get_encoding("cl100k_base")
+    return _encodings[model]
+
+
+def count_tokens(text: str, model: str = "gpt-3.5-turbo") -> int:
+    if tiktoken is None:
+        return int(len(text) / _CHARS_PER_TOKEN) + 1
+    return len(_encoding(model).encode(text))
+
+
+def truncate_tokens(text: str, budget: int, model: str = "gpt-3.5-turbo") -> str:
+    if tiktoken is None:
+        return text[:int(budget * _CHARS_PER_TOKEN)]
+    encoding = _encoding(model)
+    return encoding.decode(encoding.encode(text)[:budget])
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text.lower()).strip()
+
+
+def dedupe_texts(texts: Iterable[str], threshold: int = GPT_DEDUP_THRESHOLD) -> List[str]:
+    """Тексты без повторов: из группы почти одинаковых остаётся первый."""
+    unique: Dict[str, str] = {}
+    for text in texts:
+        unique.setdefault(_normalize(text), text)
+    keys = list(unique)
+    duplicates = set()
+    for i, neighbours in enumerate(similar_pairs(keys, threshold)):
+        if i not in duplicates:
+            duplicates.update(neighbours)
+    return [unique[key] for i, key in enumerate(keys) if i not in duplicates]
+
+
+def build_chunks(texts: List[str], overhead: int, budget: int = GPT_CHUNK_TOKENS,
+                 max_chunks: int = GPT_MAX_CHUNKS, model: str = "gpt-3.5-turbo") -> Tuple[List[str], int]:
+    """Части текста (строки через перевод строки) не длиннее budget токенов с учётом
+    overhead токенов шаблона. Возвращает (части, сколько токенов текста не поместилось)."""
+    room = max(1, budget - overhead)
+    chunks: List[List[str]] = []
+    sizes: List[int] = []
+    dropped = 0
+    for text in texts:
+        tokens = count_tokens(text, model) + 1  # +1 за перевод строки
+        if tokens > room:
+            # Текст длиннее целой части обрезается, остаток считается потерянным
+            dropped += tokens - room
+            text = truncate_tokens(text, room - 1, model)
+            tokens = room
+        if chunks and sizes[-1] + tokens <= room:
+            chunks[-1].append(text)
+            sizes[-1] += tokens
+        elif len(chunks) < max_chunks:
+            chunks.append([text])
+            sizes.append(tokens)
+        else:
+            dropped += tokens
+    if dropped:
+        logger.warning(f"GPT input does not fit {max_chunks} chunks of {budget} tokens, {dropped} tokens dropped")
+    return ["\n".join(chunk) for chunk in chunks], dropped
@@ -0,0 +1,62 @@
+"""Пропускная способность AnalysisExecutor в зависимости от числа воркеров.
+
+Запуск из корня проекта: python -m benchmarks.analysis_scaling [--scale 20] [--workers 1,2,4]
+Корпус из debug_ozon_*.html повторяется --scale раз. Для каждого числа воркеров пул
+прогревается, затем замеряется подсчёт n-грамм по всему корпусу; результат
+сверяется с NGramAnalyzer.analyze в текущем процессе.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from analyzer.executor import AnalysisExecutor, ANALYSIS_SHARD_SIZE
+from analyzer.ngram import NGramAnalyzer
+from benchmarks.corpus import corpus_texts, load_corpus
+
+
+async def measure(workers: int, texts, query: str, repeat: int, shard_size: int):
+    executor = AnalysisExecutor(workers=workers, shard_size=shard_size)
+    try:
+        await executor.warm_up()
+        # Первый прогон заполняет кэши лемм воркеров
+        result = await executor.analyze(texts, query)
+        started = time.perf_counter()
+        for _ in range(repeat):
+            result = await executor.analyze(texts, query)
+        return result, (time.perf_counter() - started) / repeat
+    finally:
+        executor.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", default=",".join(str(n) for n in (1, 2, 4, 8) if n <= (os.cpu_count() or 1)))
+    parser.add_argument("--shard-size", type=int, default=ANALYSIS_SHARD_SIZE)
+    parser.add_argument("--query", default="")
+    args = parser.parse_args()
+
+    data = {key: texts * args.scale for key, texts in load_corpus().items()}
+    texts = corpus_texts(data)
+    if not texts:
+        print("No debug_ozon_*.html files found")
+        return
+
+    analyzer = NGramAnalyzer()
+    analyzer.analyze(data, args.query)
+    started = time.perf_counter()
+    expected = analyzer.analyze(data, args.query)
+    inline_time = time.perf_counter() - started
+    print(f"{len(texts)} texts, shard size {args.shard_size}")
+    print(f"{'workers':>8} {'ms':>9} {'texts/s':>10} {'speedup':>8} {'same':>5}")
+    print(f"{'inline':>8} {inline_time * 1000:9.1f} {len(texts) / inline_time:10.0f} {1.0:8.2f}")
+    for workers in (int(n) for n in args.workers.split(",")):
+        result, elapsed = asyncio.run(measure(workers, texts, args.query, args.repeat, args.shard_size))
+        print(f"{workers:8} {elapsed * 1000:9.1f} {len(texts) / elapsed:10.0f} "
+              f"{inline_time / elapsed:8.2f} {str(result == expected):>5}")
+
+
+if __name__ == "__main__":
+    main()
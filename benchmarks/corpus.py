@@ -0,0 +1,39 @@
+"""Текстовый корпус для бенчмарков анализатора из сохранённых debug_ozon_*.html.
+
+Собирает те же поля, что парсер передаёт в анализ: названия, цены/метки, alt,
+хлебные крошки и тексты товаров.
+"""
+import glob
+from typing import Dict, List
+
+from parser.state_extractor import (
+    extract_search_cards, extract_breadcrumbs, extract_product_details, product_text
+)
+
+
+def load_corpus(pattern: str = "debug_ozon_*.html") -> Dict[str, List[str]]:
+    data = {"titles": [], "descriptions": [], "alt_texts": [], "breadcrumbs": [], "product_descriptions": []}
+    for path in sorted(glob.glob(pattern)):
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        breadcrumb = extract_breadcrumbs(html)
+        for card in extract_search_cards(html):
+            data["titles"].append(card["title"])
+            data["descriptions"].append(card["description"])
+            data["alt_texts"].append(card["alt_text"])
+            if breadcrumb:
+                data["breadcrumbs"].append(breadcrumb)
+        text = product_text(extract_product_details(html))
+        if text:
+            data["product_descriptions"].append(text)
+    return {key: [t for t in texts if t] for key, texts in data.items()}
+
+
+def corpus_texts(data: Dict[str, List[str]]) -> List[str]:
+    return (
+        data.get('titles', []) +
+        data.get('descriptions', []) +
+        data.get('alt_texts', []) +
+        data.get('breadcrumbs', []) +
+        data.get('product_descriptions', [])
+    )
@@ -0,0 +1,97 @@
+"""Лемматизация в NGramAnalyzer: прежняя реализация против кэша лемм.
+
+Запуск из корня проекта: python -m benchmarks.lemmatization [--repeat 5] [--scale 10]
+Прежняя реализация токенизирует каждый текст трижды (для n = 1, 2, 3) и вызывает
+pymorphy3 на каждый токен. Новая токенизирует текст один раз и берёт леммы из LemmaCache.
+--scale повторяет корпус, чтобы приблизить его к объёму описаний товаров.
+"""
+import argparse
+import re
+import time
+from collections import Counter
+
+from nltk.tokenize import word_tokenize
+from nltk.util import ngrams
+
+from analyzer.lemma_cache import LemmaCache
+from analyzer.ngram import NGramAnalyzer
+from benchmarks.corpus import corpus_texts, load_corpus
+
+
+def legacy_tokenize(analyzer: NGramAnalyzer, text: str, query_tokens: set = None):
+    text = re.sub(r'[><.,:;!?()"\\/]|\b\d+\b|\b\w*_\w*\b|\s+', ' ', text)
+    tokens = word_tokenize(text.lower(), language='russian')
+    tokens = [analyzer.term_mapping.get(token, analyzer.lemmatize(token)) for token in tokens]
+    filtered_tokens = [
+        token for token in analyzer.stopwords.filter(tokens)
+        if any(c.isalpha() for c in token) and
+           len(token) > 2 and
+           not token.isdigit() and
+           not analyzer.technical_codes.match(token) and
+           not analyzer.brand_pattern.match(token)
+    ]
+    if query_tokens:
+        filtered_tokens = sorted(
+            filtered_tokens,
+            key=lambda token: 0 if token in query_tokens or any(q in token for q in query_tokens) else 1
+        )
+    return filtered_tokens
+
+
+def legacy_analyze(analyzer: NGramAnalyzer, texts, query: str):
+    query_tokens = set(legacy_tokenize(analyzer, query)) if query else set()
+    result = {}
+    for name, n in (('unigrams', 1), ('bigrams', 2), ('trigrams', 3)):
+        all_ngrams = []
+        for text in texts:
+            tokens = legacy_tokenize(analyzer, text, query_tokens)
+            if len(tokens) >= n:
+                n_grams = [' '.join(gram) for gram in ngrams(tokens, n) if len(set(gram)) == len(gram)]
+                if query_tokens:
+                    n_grams = [gram for gram in n_grams if any(q in gram for q in query_tokens)]
+                all_ngrams.extend(n_grams)
+        result[name] = Counter(all_ngrams).most_common()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--query", default="чехол iphone")
+    args = parser.parse_args()
+
+    data = load_corpus()
+    data = {key: texts * args.scale for key, texts in data.items()}
+    texts = corpus_texts(data)
+    if not texts:
+        print("No debug_ozon_*.html files found")
+        return
+    analyzer = NGramAnalyzer()
+    tokens = sum(len(analyzer._raw_tokens(text)) for text in texts)
+    print(f"{len(texts)} texts, {tokens} tokens, query: {args.query!r}")
+
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        expected = legacy_analyze(analyzer, texts, args.query)
+    legacy_time = (time.perf_counter() - started) / args.repeat
+
+    analyzer.lemmas = LemmaCache(analyzer.lemmatize, path=None)
+    started = time.perf_counter()
+    result = analyzer.analyze(data, args.query)
+    cold_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        result = analyzer.analyze(data, args.query)
+    warm_time = (time.perf_counter() - started) / args.repeat
+
+    print(f"{'legacy':12} {legacy_time * 1000:9.1f} ms")
+    print(f"{'cached cold':12} {cold_time * 1000:9.1f} ms  ({legacy_time / cold_time:.1f}x)")
+    print(f"{'cached warm':12} {warm_time * 1000:9.1f} ms  ({legacy_time / warm_time:.1f}x)")
+    print(f"lemma cache: {analyzer.lemmas.counters}")
+    print(f"same result: {result == expected}")
+
+
+if __name__ == "__main__":
+    main()
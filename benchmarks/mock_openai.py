@@ -0,0 +1,157 @@
+"""Локальный мок OpenAI chat.completions для проверки GPTProcessor без сети.
+
+Сервер: python -m benchmarks.mock_openai --serve [--port 8089] [--latency 0.5] [--fail-rate 0.2]
+затем в config.py: OPENAI_BASE_URL = "http://127.0.0.1:8089/v1".
+
+Нагрузка: python -m benchmarks.mock_openai [--requests 20] [--concurrency 4] [--fail-rate 0.2]
+поднимает сервер в этом же процессе и отправляет запросы через GPTClient: видно,
+как семафор ограничивает параллельность и сколько запросов ушло на повторы.
+
+Ответы строятся из текста запроса: извлечение возвращает слова текста с частотами,
+фильтр мусора помечает все фразы полезными. Ответ длиннее max_tokens обрезается
+(finish_reason "length"), при stream=True он отдаётся кусками через SSE. Часть
+запросов (--fail-rate) получает 429 или 500, чтобы проверить повторы; failures задаёт
+статусы первых запросов явно (для тестов). В app[STATS] — число запросов, ошибок и
+наибольшее число одновременно обрабатываемых запросов (max_in_flight).
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from collections import Counter
+from typing import Iterable
+
+from aiohttp import web
+
+from analyzer.openai_client import GPTClient
+
+_STREAM_PIECE = 40  # символов в одном SSE-куске
+_STREAM_DELAY = 0.01
+STATS = web.AppKey("stats", Counter)
+
+
+def _phrases_response(prompt: str, as_object: bool) -> str:
+    text = prompt.split("Текст:", 1)[-1]
+    words = Counter(w for w in re.findall(r"[а-яёa-z]{3,}", text.lower()))
+    phrases = [{"phrase": word, "count": count} for word, count in words.most_common(50)]
+    return json.dumps({"phrases": phrases} if as_object else phrases, ensure_ascii=False)
+
+
+def _junk_response(prompt: str) -> str:
+    lines = [line.strip() for line in prompt.split("Фразы:", 1)[-1].splitlines() if line.strip()]
+    return json.dumps([{"phrase": line, "is_junk": False} for line in lines], ensure_ascii=False)
+
+
+async def _stream(request: web.Request, base: dict, content: str, finish_reason: str,
+                  usage: dict = None) -> web.StreamResponse:
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+    await response.prepare(request)
+
+    async def send(choices, extra=None):
+        chunk = {**base, "object": "chat.completion.chunk", "choices": choices, **(extra or {})}
+        await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode())
+
+    for start in range(0, len(content), _STREAM_PIECE):
+        await send([{"index": 0, "delta": {"content": content[start:start + _STREAM_PIECE]}, "finish_reason": None}])
+        await asyncio.sleep(_STREAM_DELAY)
+    await send([{"index": 0, "delta": {}, "finish_reason": finish_reason}])
+    if usage:
+        await send([], {"usage": usage})
+    await response.write(b"data: [DONE]\n\n")
+    await response.write_eof()
+    return response
+
+
+def make_app(latency: float = 0.2, fail_rate: float = 0.0, failures: Iterable[int] = ()) -> web.Application:
+    stats = Counter()
+    failures = list(failures)
+
+    async def completions(request: web.Request) -> web.Response:
+        body = await request.json()
+        stats["requests"] += 1
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            await asyncio.sleep(latency)
+        finally:
+            stats["in_flight"] -= 1
+        status = failures.pop(0) if failures else None
+        if status is None and random.random() < fail_rate:
+            status = random.choice((429, 500))
+        if status is not None:
+            stats["failed"] += 1
+            return web.json_response({"error": {"message": "mock failure", "type": "server_error"}},
+                                     status=status, headers={"retry-after": "0.1"} if status == 429 else None)
+        prompt = body["messages"][-1]["content"]
+        as_object = body.get("response_format", {}).get("type") == "json_object"
+        content = _junk_response(prompt) if "is_junk" in prompt else _phrases_response(prompt, as_object)
+        finish_reason = "stop"
+        if len(content) > body.get("max_tokens", 4096) * 4:
+            content = content[:body["max_tokens"] * 4]
+            finish_reason = "length"
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(content) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+        base = {"id": f"chatcmpl-mock-{stats['requests']}", "created": int(time.time()),
+                "model": body.get("model", "mock")}
+        if body.get("stream"):
+            stats["streamed"] += 1
+            return await _stream(request, base, content, finish_reason,
+                                 usage if body.get("stream_options", {}).get("include_usage") else None)
+        return web.json_response({
+            **base,
+            "object": "chat.completion",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                         "finish_reason": finish_reason}],
+            "usage": usage
+        })
+
+    app = web.Application()
+    app[STATS] = stats
+    app.router.add_post("/v1/chat/completions", completions)
+    return app
+
+
+async def load(args):
+    app = make_app(args.latency, args.fail_rate)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", args.port)
+    await site.start()
+    client = GPTClient("mock-key", base_url=f"http://127.0.0.1:{args.port}/v1",
+                       concurrency=args.concurrency, backoff=0.05)
+    prompt = 'Дан запрос: "чехол iphone". Текст:\nЧехол для iPhone 15 силиконовый прозрачный'
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(client.complete([{"role": "user", "content": prompt}], max_tokens=200) for _ in range(args.requests)),
+        return_exceptions=True
+    )
+    elapsed = time.perf_counter() - started
+    failed = sum(1 for r in results if isinstance(r, Exception))
+    print(f"{args.requests} requests, concurrency {args.concurrency}, latency {args.latency}s: {elapsed:.2f}s")
+    print(f"client: {client.counters}, failed after retries: {failed}")
+    print(f"server: {dict(app[STATS])}")
+    await client.close()
+    await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--serve", action="store_true")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+    if args.serve:
+        web.run_app(make_app(args.latency, args.fail_rate), host="127.0.0.1", port=args.port)
+    else:
+        asyncio.run(load(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Подсчёт n-грамм: строковые ключи (прежняя реализация) против интернированных ID.
+
+Запуск из корня проекта: python -m benchmarks.ngram_counting [--scale 50] [--repeat 3]
+Тексты из debug_ozon_*.html токенизируются один раз, затем корпус токенов
+повторяется --scale раз (имитация большого корпуса описаний товаров). Для каждого
+варианта измеряются время и пик памяти (tracemalloc) подсчёта, результаты сравниваются.
+"""
+import argparse
+import time
+import tracemalloc
+from collections import Counter
+
+from analyzer.ngram import NGramAnalyzer
+from analyzer.ngram_counter import count_ngrams
+from benchmarks.corpus import corpus_texts, load_corpus
+
+
+def legacy_count(token_lists, query_tokens):
+    result = {}
+    for name, n in (('unigrams', 1), ('bigrams', 2), ('trigrams', 3)):
+        all_ngrams = []
+        for tokens in token_lists:
+            if len(tokens) >= n:
+                grams = zip(*(tokens[i:] for i in range(n)))
+                n_grams = [' '.join(gram) for gram in grams if len(set(gram)) == len(gram)]
+                if query_tokens:
+                    n_grams = [gram for gram in n_grams if any(q in gram for q in query_tokens)]
+                all_ngrams.extend(n_grams)
+        result[name] = Counter(all_ngrams).most_common()
+    return result
+
+
+def measure(func, *args, repeat: int = 3):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func(*args)
+    elapsed = (time.perf_counter() - started) / repeat
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--query", default="")
+    args = parser.parse_args()
+
+    texts = corpus_texts(load_corpus())
+    if not texts:
+        print("No debug_ozon_*.html files found")
+        return
+    analyzer = NGramAnalyzer()
+    query_tokens = set(analyzer.tokenize(args.query)) if args.query else set()
+    token_lists = analyzer.tokenize_many(texts, query_tokens) * args.scale
+    print(f"{len(token_lists)} texts, {sum(map(len, token_lists))} tokens, query tokens: {query_tokens or '-'}")
+
+    expected, legacy_time, legacy_peak = measure(legacy_count, token_lists, query_tokens, repeat=args.repeat)
+    result, new_time, new_peak = measure(count_ngrams, token_lists, query_tokens, repeat=args.repeat)
+    print(f"{'':10} {'ms':>9} {'peak, MB':>9}")
+    print(f"{'strings':10} {legacy_time * 1000:9.1f} {legacy_peak:9.1f}")
+    print(f"{'ids':10} {new_time * 1000:9.1f} {new_peak:9.1f}  ({legacy_time / new_time:.1f}x faster)")
+    print(f"same result: {result == expected}")
+
+
+if __name__ == "__main__":
+    main()
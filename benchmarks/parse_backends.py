@@ -0,0 +1,83 @@
+"""Время разбора и пиковая память HTML-парсеров на сохранённых страницах Ozon.
+
+Запуск из корня проекта: python -m benchmarks.parse_backends [--repeat 5]
+Каждый парсер измеряется в отдельном процессе, чтобы замеры памяти не смешивались.
+Пик памяти Python-объектов считается через tracemalloc; прирост RSS (включая
+C-память lxml/selectolax) — через resource, где модуль доступен (не Windows).
+"""
+import argparse
+import glob
+import multiprocessing
+import time
+import tracemalloc
+
+from parser.html_backend import BACKENDS, parse_html, resolve_backend
+
+CARD_SELECTOR = ".tile-root, [data-widget='searchResultsV2'] .tile-container, .qj6_24"
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def _max_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    # Linux отдаёт ru_maxrss в КБ, macOS — в байтах
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if rss > 1 << 30 else rss / 1024
+
+
+def _measure(backend: str, files: list, repeat: int, queue):
+    pages = []
+    for path in files:
+        with open(path, encoding="utf-8") as f:
+            pages.append(f.read())
+    # Прогрев импорта парсера, чтобы он не попал в замер
+    parse_html("<html></html>", backend)
+
+    rss_before = _max_rss_mb()
+    tracemalloc.start()
+    started = time.perf_counter()
+    cards = 0
+    for _ in range(repeat):
+        for html in pages:
+            tree = parse_html(html, backend)
+            cards = len(tree.select(CARD_SELECTOR))
+            del tree
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = _max_rss_mb()
+    rss_growth = rss_after - rss_before if rss_before is not None else None
+    queue.put((elapsed / (repeat * len(pages)), peak / 1024 / 1024, rss_growth, cards))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    files = sorted(glob.glob("debug_ozon_*.html"))
+    if not files:
+        print("No debug_ozon_*.html files found")
+        return
+    print(f"{len(files)} pages, {args.repeat} rounds")
+    print(f"{'backend':12} {'ms/page':>9} {'py peak, MB':>12} {'rss +MB':>8} {'cards':>6}")
+    ctx = multiprocessing.get_context("spawn")
+    for backend in BACKENDS:
+        if resolve_backend(backend) != backend:
+            print(f"{backend:12} not installed")
+            continue
+        queue = ctx.Queue()
+        process = ctx.Process(target=_measure, args=(backend, files, args.repeat, queue))
+        process.start()
+        per_page, py_peak, rss_growth, cards = queue.get()
+        process.join()
+        rss = f"{rss_growth:8.1f}" if rss_growth is not None else f"{'n/a':>8}"
+        print(f"{backend:12} {per_page * 1000:9.1f} {py_peak:12.1f} {rss} {cards:6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Кластеризация фраз: прежний цикл fuzz.ratio против cdist с блокировкой по длине.
+
+Запуск из корня проекта: python -m benchmarks.phrase_clustering [--sizes 100,1000,10000]
+Фразы (1–3 слова) набираются из слов корпуса debug_ozon_*.html, часть — с опечатками
+и в другом регистре, чтобы были похожие пары. Прежний O(n²) цикл на больших размерах
+работает минуты, поэтому выше --legacy-max он не запускается.
+"""
+import argparse
+import random
+import re
+import time
+
+from analyzer.clustering import _cluster_fuzzywuzzy, cluster_phrases
+from benchmarks.corpus import corpus_texts, load_corpus
+
+
+def make_phrases(words, n: int, seed: int = 0):
+    rng = random.Random(seed)
+    phrases = []
+    for _ in range(n):
+        phrase = " ".join(rng.choice(words) for _ in range(rng.randint(1, 3)))
+        if rng.random() < 0.3:
+            pos = rng.randrange(len(phrase))
+            phrase = phrase[:pos] + rng.choice("аеиоу") + phrase[pos + 1:]
+        if rng.random() < 0.2:
+            phrase = phrase.capitalize()
+        phrases.append({"phrase": phrase, "count": rng.randint(1, 100)})
+    return phrases
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="100,1000,10000")
+    parser.add_argument("--legacy-max", type=int, default=2000)
+    args = parser.parse_args()
+
+    words = sorted({w for text in corpus_texts(load_corpus()) for w in re.findall(r"[а-яёa-z]{3,}", text.lower())})
+    if not words:
+        print("No debug_ozon_*.html files found")
+        return
+    print(f"{len(words)} distinct words")
+    print(f"{'phrases':>8} {'clusters':>9} {'cdist, ms':>10} {'legacy, ms':>11} {'speedup':>8} {'same':>5}")
+    for n in (int(s) for s in args.sizes.split(",")):
+        phrases = make_phrases(words, n)
+        started = time.perf_counter()
+        result = cluster_phrases(phrases)
+        fast = time.perf_counter() - started
+        if n <= args.legacy_max:
+            started = time.perf_counter()
+            expected = _cluster_fuzzywuzzy(phrases, 80)
+            legacy = time.perf_counter() - started
+            print(f"{n:8} {len(result):9} {fast * 1000:10.1f} {legacy * 1000:11.1f} {legacy / fast:8.1f} "
+                  f"{str(result == expected):>5}")
+        else:
+            print(f"{n:8} {len(result):9} {fast * 1000:10.1f} {'-':>11} {'-':>8} {'-':>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Сравнение извлечения карточек из data-state и полного разбора DOM.
+
+Запуск из корня проекта: python -m benchmarks.state_extraction
+Файлы debug_ozon_*.html служат регрессионными образцами: первые карточки
+из состояния виджетов должны совпадать с карточками из DOM.
+"""
+import glob
+import time
+
+from config import MAX_CARDS
+from parser.html_backend import parse_html
+from parser.ozon import OzonParser
+from parser.state_extractor import extract_search_cards
+
+
+def main(repeat: int = 3):
+    parser = OzonParser()
+    files = sorted(glob.glob("debug_ozon_*.html"))
+    if not files:
+        print("No debug_ozon_*.html files found")
+        return
+    print(f"{'file':40} {'dom, ms':>9} {'state, ms':>10} {'hybrid, ms':>11} {'cards':>6} {'match':>6}")
+    for path in files:
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            dom_cards = parser._dom_cards(parse_html(html, "html.parser"))
+        dom_time = (time.perf_counter() - started) / repeat
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            state_cards = extract_search_cards(html, MAX_CARDS)
+        state_time = (time.perf_counter() - started) / repeat
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            cards, _ = parser.extract_cards(html)
+        hybrid_time = (time.perf_counter() - started) / repeat
+
+        matched = sum(1 for a, b in zip(state_cards, dom_cards) if a["sku"] == b["sku"] and a["title"] == b["title"])
+        print(f"{path:40} {dom_time * 1000:9.1f} {state_time * 1000:10.1f} {hybrid_time * 1000:11.1f} "
+              f"{len(cards):6} {matched:3}/{len(state_cards):<2}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,23 @@
+import asyncio
 import logging
+from typing import Dict
 from aiogram import Bot, Dispatcher, types, F
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from .keyboards import get_main_menu, get_analysis_menu, get_history_menu
+from .keyboards import get_main_menu, get_analysis_menu, get_history_menu, get_job_menu
+from .live_message import LiveMessage, ProgressReporter, format_top_keys
 from config import BOT_TOKEN, DEBUG_MODE, OPENAI_API_KEY
 from storage.sqlite import SQLiteStorage
-from storage.redis import RedisStorage
+from storage.redis import RedisStorage, AsyncRedisStorage
 from parser.ozon import OzonParser
 from analyzer.ngram import NGramAnalyzer
 from analyzer.gpt_processor import GPTProcessor
 from exporter.txt import TXTExporter
 from filters.stopwords_manager import StopWordsManager
-from collections import Counter
+from jobs.analysis import AnalysisPipeline, ANALYSIS_JOB
+from jobs.queue import JobQueue, JOBS_ENABLED, DONE, CANCELLED
+from progress import ProgressEvent
 
 # Настройка логирования
 logging.basicConfig(
@@ -29,10 +34,16 @@ bot = Bot(token=BOT_TOKEN)
 dp = Dispatcher()
 sqlite_storage = SQLiteStorage()
 redis_storage = RedisStorage()
-stopwords_manager = StopWordsManager(redis_client=redis_storage, sqlite_client=sqlite_storage)
+async_redis_storage = AsyncRedisStorage()
+stopwords_manager = StopWordsManager(redis_client=redis_storage, sqlite_client=sqlite_storage,
+                                     async_redis_client=async_redis_storage)
 ozon_parser = OzonParser()
 ngram_analyzer = NGramAnalyzer()
 gpt_processor = GPTProcessor(OPENAI_API_KEY)
+analysis_pipeline = AnalysisPipeline(ozon_parser, gpt_processor, stopwords_manager, sqlite_storage)
+job_queue = JobQueue(async_redis_storage)
+# Статусные сообщения задач, поставленных этим процессом бота: id задачи -> ProgressReporter
+job_reporters: Dict[str, ProgressReporter] = {}
 
 # Тексты кнопок reply-клавиатуры
 BUTTON_TEXTS = ["🔍 Новый анализ", "📊 История", "❓ Помощь", "🔍 Скрыть ключ"]
@@ -75,6 +86,17 @@ async def handle_text(message: types.Message):
     if query not in BUTTON_TEXTS:
         await process_query(message, user_id, query)
 
+def format_window(seconds: float) -> str:
+    """Окно лимита для сообщения пользователю: "час", "2 ч", "30 мин", "45 сек"."""
+    seconds = int(seconds)
+    if seconds == 3600:
+        return "час"
+    if seconds % 3600 == 0:
+        return f"{seconds // 3600} ч"
+    if seconds % 60 == 0:
+        return f"{seconds // 60} мин"
+    return f"{seconds} сек"
+
 async def process_query(message: types.Message, user_id: int, query: str):
     logger.info(f"Processing query for user {user_id}: {query}")
     try:
@@ -82,42 +104,111 @@ async def process_query(message: types.Message, user_id: int, query: str):
             logger.info(f"User {user_id} sent empty query")
             await message.answer("Введите запрос, например: чехол iphone или ссылку на товар Ozon", reply_markup=get_main_menu())
             return
-        if not redis_storage.check_request_limit(user_id):
+        limit = await async_redis_storage.acquire_request(user_id)
+        if not limit.allowed:
             logger.warning(f"User {user_id} exceeded request limit")
-            await message.answer("Лимит запросов (5/час) исчерпан. Попробуйте позже.", reply_markup=get_main_menu())
-            return
-        parse_result = await ozon_parser.parse_search(user_id, query)
-        logger.info(f"Parse result for user {user_id}: {parse_result}")
-        if "error" in parse_result:
-            logger.error(f"Parse error for user {user_id}: {parse_result['error']}")
-            await message.answer(f"Ошибка: {parse_result['error']}", reply_markup=get_main_menu())
+            wait_minutes = max(1, round(limit.retry_after / 60))
+            if limit.scope == "global":
+                text = f"Сервис сейчас перегружен. Попробуйте через {wait_minutes} мин."
+            else:
+                text = f"Лимит запросов ({limit.limit}/{format_window(limit.window)}) исчерпан. " \
+                       f"Попробуйте через {wait_minutes} мин."
+            await message.answer(text, reply_markup=get_main_menu())
             return
-        ngram_result = gpt_processor.process_ngrams(query, parse_result)
-        logger.info(f"NGram result for user {user_id}: {ngram_result}")
-        if not ngram_result:
-            logger.warning(f"No n-grams generated for user {user_id}, query: {query}")
-            await message.answer("Не удалось извлечь ключевые фразы. Попробуйте другой запрос.", reply_markup=get_main_menu())
+        if JOBS_ENABLED:
+            job_id = await job_queue.enqueue(ANALYSIS_JOB, {"user_id": user_id, "query": query},
+                                             user_id=user_id, chat_id=message.chat.id)
+            await message.answer("Запрос принят, ход анализа покажу ниже.", reply_markup=get_job_menu(job_id))
+            job_reporters[job_id] = ProgressReporter(LiveMessage(message))
             return
-        ngram_formatted = {
-            'unigrams': [(item['phrase'], item['count']) for item in ngram_result if len(item['phrase'].split()) == 1],
-            'bigrams': [(item['phrase'], item['count']) for item in ngram_result if len(item['phrase'].split()) == 2],
-            'trigrams': [(item['phrase'], item['count']) for item in ngram_result if len(item['phrase'].split()) == 3]
-        }
-        # Автоматическое обучение стоп-слов
-        ngram_counter = Counter({item['phrase']: item['count'] for item in ngram_result})
-        stopwords_manager.auto_learn_stopwords(ngram_counter, threshold=100, category="одежда")
-        sqlite_storage.add_history(user_id, query, {"parse": parse_result, "ngrams": ngram_formatted})
-        await message.answer("Анализ завершён!", reply_markup=get_analysis_menu())
-        logger.info(f"Sending keyboard to user {user_id}")
-        if DEBUG_MODE:
-            logger.debug(f"Debug mode: Sending immediate keyboard to user {user_id}")
-            await message.answer("Выберите действие:", reply_markup=get_main_menu())
+        # Одно статусное сообщение на весь анализ: этапы парсинга и GPT, затем итоговый топ ключей
+        progress = ProgressReporter(LiveMessage(message))
+        try:
+            outcome = await analysis_pipeline.run(user_id, query, on_partial=progress.on_partial,
+                                                  on_progress=progress.on_progress)
+        except Exception:
+            await progress.finish("❌ Анализ прерван.")
+            raise
+        await progress.finish(outcome_status(outcome))
+        await send_outcome(message.chat.id, outcome)
     except Exception as e:
         logger.error(f"Error in process_query for user {user_id}: {str(e)}", exc_info=True)
         await message.answer("Произошла ошибка при анализе.", reply_markup=get_main_menu())
         if DEBUG_MODE:
             await message.answer("Выберите действие:", reply_markup=get_main_menu())
 
+def outcome_status(outcome: dict) -> str:
+    """Последний текст статусного сообщения по результату AnalysisPipeline.run."""
+    if outcome["status"] == "ok":
+        return format_top_keys(outcome["phrases"], "🔝 Топ ключей:")
+    if outcome["status"] == "empty":
+        return "Ключевые фразы не найдены."
+    return f"❌ {outcome['error']}"
+
+async def send_outcome(chat_id: int, outcome: dict, show_keys: bool = False):
+    """Ответ пользователю по результату AnalysisPipeline.run."""
+    if outcome["status"] == "error":
+        await bot.send_message(chat_id, f"Ошибка: {outcome['error']}", reply_markup=get_main_menu())
+        return
+    if outcome.get("stale"):
+        await bot.send_message(chat_id, "Показаны данные из кэша, они обновляются в фоне.")
+    if outcome["status"] == "empty":
+        await bot.send_message(chat_id, "Не удалось извлечь ключевые фразы. Попробуйте другой запрос.", reply_markup=get_main_menu())
+        return
+    if show_keys:
+        await bot.send_message(chat_id, format_top_keys(outcome["phrases"], "🔝 Топ ключей:"))
+    await bot.send_message(chat_id, "Анализ завершён!", reply_markup=get_analysis_menu())
+    logger.info(f"Sending keyboard to chat {chat_id}")
+    if DEBUG_MODE:
+        logger.debug(f"Debug mode: Sending immediate keyboard to chat {chat_id}")
+        await bot.send_message(chat_id, "Выберите действие:", reply_markup=get_main_menu())
+
+async def deliver_job_results():
+    """Ответы на задачи, выполненные воркерами (при JOBS_ENABLED); работает всё время жизни бота."""
+    while True:
+        try:
+            job = await job_queue.next_finished()
+            if job is None or job.chat_id is None:
+                continue
+            logger.info(f"Delivering result of job {job.id} to chat {job.chat_id}: {job.status}")
+            # Статусного сообщения нет, если задачу ставил другой процесс бота или до перезапуска
+            progress = job_reporters.pop(job.id, None)
+            if job.status == DONE:
+                shown = progress is not None and progress.live.message is not None
+                if progress:
+                    await progress.finish(outcome_status(job.result))
+                await send_outcome(job.chat_id, job.result, show_keys=not shown)
+                continue
+            if progress:
+                await progress.finish("❌ Анализ прерван.")
+            if job.status == CANCELLED:
+                await bot.send_message(job.chat_id, "Анализ отменён.", reply_markup=get_main_menu())
+            else:
+                await bot.send_message(job.chat_id, "Произошла ошибка при анализе.", reply_markup=get_main_menu())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to deliver job result: {str(e)}", exc_info=True)
+            await asyncio.sleep(1)
+
+async def forward_job_progress():
+    """Ход задач из канала очереди — в статусные сообщения (при JOBS_ENABLED); работает всё время жизни бота."""
+    while True:
+        try:
+            async for update in job_queue.progress_updates():
+                progress = job_reporters.get(update.get("id"))
+                if progress is None:
+                    continue
+                if "phrases" in update:
+                    await progress.on_partial(update["phrases"])
+                else:
+                    await progress.on_progress(ProgressEvent(update["stage"], update.get("done"), update.get("total")))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to forward job progress: {str(e)}", exc_info=True)
+            await asyncio.sleep(1)
+
 @dp.message(Command("history"))
 async def cmd_history(message: types.Message):
     user_id = message.from_user.id
@@ -160,7 +251,18 @@ async def process_callback(callback: types.CallbackQuery):
     data = callback.data
     logger.info(f"User {user_id} clicked callback: {data}")
     try:
-        if data.startswith("top_") or data == "all_keys":
+        if data.startswith("cancel_job_"):
+            job = await job_queue.get(data[len("cancel_job_"):])
+            if job is None or job.user_id != user_id:
+                await callback.message.answer("Задача не найдена.", reply_markup=get_main_menu())
+            else:
+                status = await job_queue.cancel(job.id)
+                logger.info(f"User {user_id} cancelled job {job.id}: {status}")
+                if status == "cancelling":
+                    await callback.message.answer("Останавливаю анализ…")
+                elif status != CANCELLED:
+                    await callback.message.answer("Анализ уже завершён.", reply_markup=get_main_menu())
+        elif data.startswith("top_") or data == "all_keys":
             analyses = sqlite_storage.get_history(user_id)
             if not analyses:
                 logger.info(f"User {user_id} has empty history for callback")
@@ -170,7 +272,7 @@ async def process_callback(callback: types.CallbackQuery):
             ngrams = latest[1]["ngrams"]
             limit = 10 if data == "top_10" else 30 if data == "top_30" else None
             keys = ngram_analyzer.get_top_keys(ngrams, limit)
-            keys = stopwords_manager.filter_ngrams(keys, category="одежда")
+            keys = await stopwords_manager.filter_ngrams_async(keys, category="одежда")
             logger.info(f"Keys for user {user_id}: {keys}")
             if not keys:
                 logger.info(f"No keys found for user {user_id}")
@@ -191,7 +293,7 @@ async def process_callback(callback: types.CallbackQuery):
             latest = analyses[0]
             ngrams = latest[1]["ngrams"]
             keys = ngram_analyzer.get_top_keys(ngrams)
-            keys = stopwords_manager.filter_ngrams(keys, category="одежда")
+            keys = await stopwords_manager.filter_ngrams_async(keys, category="одежда")
             txt_file = TXTExporter.export_to_txt(keys)
             await callback.message.answer_document(txt_file, reply_markup=get_main_menu())
         elif data == "repeat":
@@ -28,4 +28,8 @@ def get_history_menu(analyses):
         for i, (query, timestamp) in enumerate(analyses, 1)
     ]
     buttons.append([InlineKeyboardButton(text="🗑 Очистить историю", callback_data="clear_history")])
-    return InlineKeyboardMarkup(inline_keyboard=buttons)
\ No newline at end of file
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+def get_job_menu(job_id):
+    buttons = [[InlineKeyboardButton(text="❌ Отменить анализ", callback_data=f"cancel_job_{job_id}")]]
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
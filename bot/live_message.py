@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+
+from aiogram import types
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+import config
+from progress import (
+    ProgressEvent, QUEUED, SEARCH_STARTED, SEARCH_LOADED, PRODUCTS, GPT_STARTED, GPT_CHUNKS, GPT_FILTER, FALLBACK
+)
+
+logger = logging.getLogger(__name__)
+
+LIVE_EDIT_INTERVAL = getattr(config, "LIVE_EDIT_INTERVAL", 1.5)  # не чаще одной правки сообщения за N сек
+LIVE_MAX_EDITS = getattr(config, "LIVE_MAX_EDITS", 40)  # промежуточных правок на одно сообщение
+LIVE_TOP_KEYS = 10  # сколько ключей показывать в сообщении по ходу анализа
+LIVE_FINISH_ATTEMPTS = 3  # попыток последней правки, если Telegram просит подождать
+
+STAGE_TEXTS = {
+    QUEUED: "⏳ Ожидание парсинга: вы {done}-й в очереди.",
+    SEARCH_STARTED: "🔎 Загружаю выдачу Ozon…",
+    SEARCH_LOADED: "🔎 Выдача загружена: {total} карточек.",
+    PRODUCTS: "📦 Страницы товаров: {done}/{total}",
+    GPT_STARTED: "🤖 Извлекаю ключевые фразы…",
+    GPT_CHUNKS: "🤖 Извлекаю ключевые фразы: {done}/{total} частей",
+    GPT_FILTER: "🧹 Убираю мусорные фразы…",
+    FALLBACK: "📊 Считаю ключевые фразы локально…",
+}
+
+
+def format_top_keys(phrases: List[Dict[str, int]], title: str) -> str:
+    top = sorted(phrases, key=lambda item: -item['count'])[:LIVE_TOP_KEYS]
+    return "\n".join([title] + [f"{item['phrase']}: {item['count']}" for item in top])
+
+
+class LiveMessage:
+    """Сообщение, которое бот обновляет по ходу долгой операции.
+
+    Отправляется при первом update, дальше правится через edit_text. Telegram
+    ограничивает частоту правок, поэтому правки идут не чаще interval (при
+    TelegramRetryAfter — после указанной паузы): текст, пришедший раньше, откладывается,
+    и применяется только последний из отложенных. Текст, на который Telegram ответил
+    RetryAfter, тоже откладывается, если новее не пришло. Промежуточных правок не больше
+    max_edits, так что число вызовов API на сообщение ограничено независимо от числа
+    событий. Ошибки Telegram не прерывают операцию, которую сообщение показывает.
+    """
+
+    def __init__(self, reply_to: types.Message, interval: float = LIVE_EDIT_INTERVAL,
+                 max_edits: int = LIVE_MAX_EDITS):
+        self.reply_to = reply_to
+        self.interval = interval
+        self.max_edits = max_edits
+        self.message: Optional[types.Message] = None
+        self.edits = 0
+        self._text: Optional[str] = None
+        self._pending: Optional[str] = None
+        self._next_edit = 0.0
+        self._flush: Optional[asyncio.Task] = None
+        self._finished = False
+
+    async def update(self, text: str):
+        if self._finished:
+            return
+        if text == self._text:
+            self._pending = None
+            return
+        if self.message is not None and self.edits >= self.max_edits:
+            return
+        if time.monotonic() < self._next_edit:
+            self._pending = text
+            self._schedule_flush()
+            return
+        await self._send(text)
+
+    def _schedule_flush(self):
+        if self._flush is None and not self._finished:
+            self._flush = asyncio.create_task(self._flush_pending())
+
+    async def _flush_pending(self):
+        try:
+            while self._pending is not None and self.edits < self.max_edits:
+                delay = self._next_edit - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    continue
+                await self._send(self._pending)
+        finally:
+            self._flush = None
+
+    async def _send(self, text: str):
+        self._pending = None
+        self._text = text
+        self._next_edit = time.monotonic() + self.interval
+        try:
+            if self.message is None:
+                self.message = await self.reply_to.answer(text)
+            else:
+                self.edits += 1
+                await self.message.edit_text(text)
+        except TelegramRetryAfter as e:
+            self._next_edit = time.monotonic() + e.retry_after
+            self._text = None
+            if self._pending is None:
+                self._pending = text  # повторить после паузы, если за время запроса не пришло новее
+            self._schedule_flush()
+            logger.debug(f"Live message edit throttled for {e.retry_after}s")
+        except TelegramBadRequest as e:
+            logger.debug(f"Live message edit failed: {str(e)}")
+
+    async def finish(self, text: str):
+        """Последняя правка вне лимита правок, но после паузы; если сообщение не отправлялось — ничего."""
+        self._finished = True
+        if self._flush is not None:
+            self._flush.cancel()
+            self._flush = None
+        for _ in range(LIVE_FINISH_ATTEMPTS):
+            self._pending = None
+            if self.message is None or text == self._text:
+                return
+            delay = self._next_edit - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self._send(text)
+
+
+class ProgressReporter:
+    """Статус анализа в одном LiveMessage: текущий этап и найденные на данный момент ключи."""
+
+    def __init__(self, live: LiveMessage):
+        self.live = live
+        self.stage: Optional[str] = None
+        self.phrases: List[Dict[str, int]] = []
+
+    def render(self) -> str:
+        lines = [self.stage] if self.stage else []
+        if self.phrases:
+            lines.append(format_top_keys(self.phrases, f"Найдено фраз: {len(self.phrases)}"))
+        return "\n\n".join(lines)
+
+    async def on_progress(self, event: ProgressEvent):
+        template = STAGE_TEXTS.get(event.stage)
+        if template is None:
+            return
+        self.stage = template.format(done=event.done, total=event.total)
+        await self.live.update(self.render())
+
+    async def on_partial(self, phrases: List[Dict[str, int]]):
+        self.phrases = phrases
+        await self.live.update(self.render())
+
+    async def finish(self, text: str):
+        await self.live.finish(text)
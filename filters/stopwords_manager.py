@@ -2,7 +2,7 @@ import re
 from collections import Counter
 from typing import List, Tuple
 import logging
-from storage.redis import RedisStorage
+from storage.redis import RedisStorage, AsyncRedisStorage
 from storage.sqlite import SQLiteStorage
 from pathlib import Path
 
@@ -18,8 +18,10 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class StopWordsManager:
-    def __init__(self, redis_client: RedisStorage = None, sqlite_client: SQLiteStorage = None):
+    def __init__(self, redis_client: RedisStorage = None, sqlite_client: SQLiteStorage = None,
+                 async_redis_client: AsyncRedisStorage = None):
         self.redis = redis_client
+        self.async_redis = async_redis_client
         self.sqlite = sqlite_client
         self.static_stopwords = set(self._load_file("filters/static_stopwords.txt"))
         self.static_phrases = set(self._load_file("filters/static_stop_phrases.txt"))
@@ -42,11 +44,14 @@ class StopWordsManager:
                 category_stopwords[category] = set(self._load_file(str(file)))
         return category_stopwords
 
-    def is_stopword(self, word: str, category: str = None) -> bool:
-        word = word.lower().strip()
+    def _is_local_stopword(self, word: str, category: str = None) -> bool:
         if word in self.static_stopwords or word in self.static_phrases:
             return True
-        if category and category in self.category_stopwords and word in self.category_stopwords[category]:
+        return bool(category and category in self.category_stopwords and word in self.category_stopwords[category])
+
+    def is_stopword(self, word: str, category: str = None) -> bool:
+        word = word.lower().strip()
+        if self._is_local_stopword(word, category):
             return True
         if self.redis and self.redis.is_stopword(word):
             return True
@@ -57,6 +62,17 @@ class StopWordsManager:
     def filter_ngrams(self, ngram_list: List[Tuple[str, int]], category: str = None) -> List[Tuple[str, int]]:
         return [(ng, count) for ng, count in ngram_list if not self.is_stopword(ng, category)]
 
+    async def filter_ngrams_async(self, ngram_list: List[Tuple[str, int]], category: str = None) -> List[Tuple[str, int]]:
+        """То же, что filter_ngrams, но Redis проверяется одним запросом на весь список."""
+        if not self.async_redis:
+            return self.filter_ngrams(ngram_list, category)
+        candidates = [(ng, count) for ng, count in ngram_list if not self._is_local_stopword(ng.lower().strip(), category)]
+        flags = await self.async_redis.is_stopword_many([ng for ng, _ in candidates])
+        result = [item for item, flag in zip(candidates, flags) if not flag]
+        if self.sqlite:
+            result = [(ng, count) for ng, count in result if not self.sqlite.is_stopword(ng.lower().strip())]
+        return result
+
     def add_stopword(self, word: str, user_id: int = None, category: str = None):
         word = word.lower().strip()
         if category and category in self.category_stopwords:
@@ -0,0 +1,61 @@
+"""Анализ одного запроса: парсинг Ozon → GPT → обучение стоп-слов → история в SQLite.
+
+Выполняется либо прямо в обработчике бота, либо воркером (python -m jobs.worker) как
+задача "analysis". Результат — JSON-совместимый словарь, по которому бот строит ответ:
+{"status": "ok", "phrases": [...], "stale": bool}, {"status": "empty", "stale": bool}
+или {"status": "error", "error": "..."}.
+"""
+import logging
+from collections import Counter
+from typing import Optional
+
+from analyzer.gpt_processor import GPTProcessor, PartialCallback
+from filters.stopwords_manager import StopWordsManager
+from jobs.queue import JobProgress
+from parser.ozon import OzonParser
+from progress import ProgressCallback
+from storage.sqlite import SQLiteStorage
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_JOB = "analysis"
+
+
+class AnalysisPipeline:
+    def __init__(self, ozon_parser: OzonParser, gpt_processor: GPTProcessor,
+                 stopwords_manager: StopWordsManager, sqlite_storage: SQLiteStorage):
+        self.ozon_parser = ozon_parser
+        self.gpt_processor = gpt_processor
+        self.stopwords_manager = stopwords_manager
+        self.sqlite_storage = sqlite_storage
+
+    async def run(self, user_id: int, query: str, on_partial: Optional[PartialCallback] = None,
+                  on_progress: Optional[ProgressCallback] = None) -> dict:
+        parse_result = await self.ozon_parser.parse_search(user_id, query, on_progress=on_progress)
+        logger.info(f"Parse result for user {user_id}: {parse_result}")
+        if "error" in parse_result:
+            logger.error(f"Parse error for user {user_id}: {parse_result['error']}")
+            return {"status": "error", "error": parse_result["error"]}
+        stale = parse_result.pop("stale", False)
+        ngram_result = await self.gpt_processor.process_ngrams(query, parse_result, on_partial=on_partial,
+                                                              on_progress=on_progress)
+        logger.info(f"NGram result for user {user_id}: {ngram_result}")
+        if not ngram_result:
+            logger.warning(f"No n-grams generated for user {user_id}, query: {query}")
+            return {"status": "empty", "stale": stale}
+        ngram_formatted = {
+            'unigrams': [(item['phrase'], item['count']) for item in ngram_result if len(item['phrase'].split()) == 1],
+            'bigrams': [(item['phrase'], item['count']) for item in ngram_result if len(item['phrase'].split()) == 2],
+            'trigrams': [(item['phrase'], item['count']) for item in ngram_result if len(item['phrase'].split()) == 3]
+        }
+        # Автоматическое обучение стоп-слов
+        ngram_counter = Counter({item['phrase']: item['count'] for item in ngram_result})
+        self.stopwords_manager.auto_learn_stopwords(ngram_counter, threshold=100, category="одежда")
+        self.sqlite_storage.add_history(user_id, query, {"parse": parse_result, "ngrams": ngram_formatted})
+        return {"status": "ok", "phrases": ngram_result, "stale": stale}
+
+    async def run_job(self, payload: dict, progress: Optional[JobProgress] = None) -> dict:
+        if progress is None:
+            return await self.run(payload["user_id"], payload["query"])
+        return await self.run(payload["user_id"], payload["query"], on_partial=progress.on_partial,
+                              on_progress=progress.on_progress)
@@ -0,0 +1,284 @@
+"""Очередь фоновых задач в Redis.
+
+Задача — хэш jobs:job:<id> (тип, payload, статус, попытки, таймаут, результат или
+ошибка, user_id и chat_id для ответа) плюс её id в одной из структур:
+- jobs:queue (list) — готовые к выполнению;
+- jobs:delayed (sorted set, score — время готовности) — ждут повтора после ошибки;
+- jobs:leases (sorted set, score — крайний срок) — выполняются воркерами;
+- jobs:finished (list) — завершились (done/failed/cancelled), бот забирает их и отвечает.
+
+Забор задачи воркером — один Lua-скрипт: он переносит созревшие повторы в очередь,
+возвращает в очередь задачи, чей срок аренды истёк (воркер упал), и выдаёт следующую
+задачу со статусом queued, засчитывая попытку. Завершение через ZREM аренды: если
+аренду уже забрал скрипт, результат опоздавшего воркера не записывается, и задача
+не выполняется дважды с двумя ответами пользователю.
+
+Статусы: queued → running → done | failed | cancelled; при ошибке или таймауте задача
+возвращается в queued (через jobs:delayed), пока не исчерпаны JOB_MAX_ATTEMPTS.
+Время передаётся из Python (now), как в storage.rate_limit.
+
+Ход выполняющейся задачи (этапы и найденные фразы) воркер публикует в канал
+jobs:progress, бот превращает его в правки статусного сообщения. Это pub/sub: события,
+пришедшие, когда бот не слушал, теряются, но результат всё равно придёт через jobs:finished.
+"""
+import json
+import logging
+import time
+import uuid
+from typing import AsyncIterator, Dict, List, Optional
+
+import config
+from progress import ProgressEvent
+from storage.redis import AsyncRedisStorage
+
+logger = logging.getLogger(__name__)
+
+JOBS_ENABLED = getattr(config, "JOBS_ENABLED", False)  # анализ в воркерах (python -m jobs.worker), а не в боте
+JOB_TIMEOUT = getattr(config, "JOB_TIMEOUT", 600)  # секунд на одну попытку
+JOB_MAX_ATTEMPTS = getattr(config, "JOB_MAX_ATTEMPTS", 2)
+JOB_RETRY_BACKOFF = getattr(config, "JOB_RETRY_BACKOFF", 30)  # задержка перед повтором, удваивается, сек
+JOB_LEASE_GRACE = getattr(config, "JOB_LEASE_GRACE", 60)  # сверх таймаута, прежде чем задача упавшего воркера вернётся в очередь
+JOB_RESULT_TTL = getattr(config, "JOB_RESULT_TTL", 86400)  # сколько хранится завершённая задача, сек
+JOB_PROGRESS_INTERVAL = getattr(config, "JOB_PROGRESS_INTERVAL", 1.0)  # не чаще, сек, публикация найденных фраз
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINAL_STATUSES = (DONE, FAILED, CANCELLED)
+
+# KEYS: queue, delayed, leases, finished; ARGV: now_ms, worker, префикс хэшей задач, grace_ms, result_ttl.
+# Ответ: id выданной задачи или false, если очередь пуста.
+_CLAIM = """
+local now = tonumber(ARGV[1])
+local prefix = ARGV[3]
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now, 'LIMIT', 0, 100)) do
+    redis.call('ZREM', KEYS[2], id)
+    redis.call('LPUSH', KEYS[1], id)
+end
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', now, 'LIMIT', 0, 100)) do
+    redis.call('ZREM', KEYS[3], id)
+    local key = prefix .. id
+    local attempts = tonumber(redis.call('HGET', key, 'attempts') or '0')
+    local max_attempts = tonumber(redis.call('HGET', key, 'max_attempts') or '1')
+    if redis.call('HGET', key, 'cancel_requested') == '1' then
+        redis.call('HSET', key, 'status', 'cancelled', 'finished_at', now)
+        redis.call('EXPIRE', key, tonumber(ARGV[5]))
+        redis.call('LPUSH', KEYS[4], id)
+    elseif attempts >= max_attempts then
+        redis.call('HSET', key, 'status', 'failed', 'error', 'worker lost', 'finished_at', now)
+        redis.call('EXPIRE', key, tonumber(ARGV[5]))
+        redis.call('LPUSH', KEYS[4], id)
+    else
+        redis.call('HSET', key, 'status', 'queued')
+        redis.call('LPUSH', KEYS[1], id)
+    end
+end
+while true do
+    local id = redis.call('RPOP', KEYS[1])
+    if not id then
+        return false
+    end
+    local key = prefix .. id
+    if redis.call('HGET', key, 'status') == 'queued' then
+        redis.call('HINCRBY', key, 'attempts', 1)
+        redis.call('HSET', key, 'status', 'running', 'worker', ARGV[2], 'started_at', now)
+        local timeout_ms = tonumber(redis.call('HGET', key, 'timeout')) * 1000
+        redis.call('ZADD', KEYS[3], now + timeout_ms + tonumber(ARGV[4]), id)
+        return id
+    end
+end
+"""
+
+# KEYS: хэш задачи, queue, delayed, finished; ARGV: now_ms, id, result_ttl.
+# Ответ: статус после вызова ("cancelled", "cancelling" для выполняющейся) или false.
+_CANCEL = """
+local status = redis.call('HGET', KEYS[1], 'status')
+if status == 'queued' then
+    redis.call('HSET', KEYS[1], 'status', 'cancelled', 'finished_at', ARGV[1])
+    redis.call('EXPIRE', KEYS[1], tonumber(ARGV[3]))
+    redis.call('LREM', KEYS[2], 0, ARGV[2])
+    redis.call('ZREM', KEYS[3], ARGV[2])
+    redis.call('LPUSH', KEYS[4], ARGV[2])
+    return 'cancelled'
+elseif status == 'running' then
+    redis.call('HSET', KEYS[1], 'cancel_requested', '1')
+    return 'cancelling'
+end
+return status
+"""
+
+
+def _now_ms(now: float = None) -> int:
+    return int((time.time() if now is None else now) * 1000)
+
+
+class Job:
+    def __init__(self, fields: dict):
+        self.id = fields["id"]
+        self.type = fields["type"]
+        self.payload = json.loads(fields.get("payload") or "{}")
+        self.status = fields.get("status")
+        self.attempts = int(fields.get("attempts", 0))
+        self.max_attempts = int(fields.get("max_attempts", 1))
+        self.timeout = float(fields.get("timeout", JOB_TIMEOUT))
+        self.user_id = int(fields["user_id"]) if fields.get("user_id") else None
+        self.chat_id = int(fields["chat_id"]) if fields.get("chat_id") else None
+        self.result = json.loads(fields["result"]) if fields.get("result") else None
+        self.error = fields.get("error")
+        self.cancel_requested = fields.get("cancel_requested") == "1"
+
+    def __repr__(self) -> str:
+        return f"Job(id={self.id}, type={self.type}, status={self.status}, attempts={self.attempts})"
+
+
+class JobQueue:
+    def __init__(self, redis: AsyncRedisStorage, prefix: str = "jobs", timeout: float = JOB_TIMEOUT,
+                 max_attempts: int = JOB_MAX_ATTEMPTS, retry_backoff: float = JOB_RETRY_BACKOFF,
+                 lease_grace: float = JOB_LEASE_GRACE, result_ttl: int = JOB_RESULT_TTL):
+        self.client = redis.client
+        self.prefix = prefix
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.lease_grace = lease_grace
+        self.result_ttl = result_ttl
+        self.queue_key = f"{prefix}:queue"
+        self.delayed_key = f"{prefix}:delayed"
+        self.leases_key = f"{prefix}:leases"
+        self.finished_key = f"{prefix}:finished"
+        self.progress_channel = f"{prefix}:progress"
+        self._claim = self.client.register_script(_CLAIM)
+        self._cancel = self.client.register_script(_CANCEL)
+
+    def _job_key(self, job_id: str) -> str:
+        return f"{self.prefix}:job:{job_id}"
+
+    async def enqueue(self, job_type: str, payload: dict, user_id: int = None, chat_id: int = None,
+                      timeout: float = None, max_attempts: int = None, now: float = None) -> str:
+        job_id = uuid.uuid4().hex[:12]
+        fields = {
+            "id": job_id, "type": job_type, "payload": json.dumps(payload, ensure_ascii=False),
+            "status": QUEUED, "attempts": 0, "max_attempts": max_attempts or self.max_attempts,
+            "timeout": timeout or self.timeout, "created_at": _now_ms(now),
+            "user_id": user_id or "", "chat_id": chat_id or "",
+        }
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hset(self._job_key(job_id), mapping=fields)
+        pipe.lpush(self.queue_key, job_id)
+        await pipe.execute()
+        logger.info(f"Enqueued job {job_id} ({job_type}) for user {user_id}")
+        return job_id
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        fields = await self.client.hgetall(self._job_key(job_id))
+        return Job(fields) if fields else None
+
+    async def claim(self, worker: str, now: float = None) -> Optional[Job]:
+        job_id = await self._claim(
+            keys=[self.queue_key, self.delayed_key, self.leases_key, self.finished_key],
+            args=[_now_ms(now), worker, f"{self.prefix}:job:", int(self.lease_grace * 1000), self.result_ttl]
+        )
+        return await self.get(job_id) if job_id else None
+
+    async def _finish(self, job_id: str, status: str, now: float = None, **fields) -> bool:
+        # Аренда есть только у задачи, которую ещё никто не вернул в очередь
+        if not await self.client.zrem(self.leases_key, job_id):
+            logger.warning(f"Lease of job {job_id} already expired, dropping {status} result")
+            return False
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hset(self._job_key(job_id), mapping={"status": status, "finished_at": _now_ms(now), **fields})
+        pipe.expire(self._job_key(job_id), self.result_ttl)
+        pipe.lpush(self.finished_key, job_id)
+        await pipe.execute()
+        return True
+
+    async def complete(self, job_id: str, result: dict, now: float = None) -> bool:
+        return await self._finish(job_id, DONE, now, result=json.dumps(result, ensure_ascii=False))
+
+    async def cancelled(self, job_id: str, now: float = None) -> bool:
+        return await self._finish(job_id, CANCELLED, now)
+
+    async def fail(self, job_id: str, error: str, retry: bool = True, now: float = None) -> str:
+        """Повтор через retry_backoff·2^(попытка−1) или окончательная ошибка; возвращает новый статус."""
+        job = await self.get(job_id)
+        if job is None:
+            return FAILED
+        if job.cancel_requested:
+            await self._finish(job_id, CANCELLED, now, error=error)
+            return CANCELLED
+        if not retry or job.attempts >= job.max_attempts:
+            await self._finish(job_id, FAILED, now, error=error)
+            return FAILED
+        if not await self.client.zrem(self.leases_key, job_id):
+            return QUEUED  # аренду уже забрал скрипт, задача вернулась в очередь без нас
+        ready_at = _now_ms(now) + int(self.retry_backoff * 2 ** (job.attempts - 1) * 1000)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hset(self._job_key(job_id), mapping={"status": QUEUED, "error": error})
+        pipe.zadd(self.delayed_key, {job_id: ready_at})
+        await pipe.execute()
+        logger.info(f"Job {job_id} failed ({error}), retry {job.attempts + 1}/{job.max_attempts} scheduled")
+        return QUEUED
+
+    async def cancel(self, job_id: str, now: float = None) -> Optional[str]:
+        status = await self._cancel(
+            keys=[self._job_key(job_id), self.queue_key, self.delayed_key, self.finished_key],
+            args=[_now_ms(now), job_id, self.result_ttl]
+        )
+        return status or None
+
+    async def is_cancel_requested(self, job_id: str) -> bool:
+        return await self.client.hget(self._job_key(job_id), "cancel_requested") == "1"
+
+    async def publish_progress(self, job_id: str, update: dict):
+        await self.client.publish(self.progress_channel, json.dumps({"id": job_id, **update}, ensure_ascii=False))
+
+    async def progress_updates(self) -> AsyncIterator[dict]:
+        """События хода задач: {"id", "stage", "done", "total"} или {"id", "phrases"}."""
+        pubsub = self.client.pubsub()
+        await pubsub.subscribe(self.progress_channel)
+        try:
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    yield json.loads(message["data"])
+        finally:
+            await pubsub.aclose()
+
+    async def next_finished(self, timeout: float = 5) -> Optional[Job]:
+        """Следующая завершённая задача (для ответа пользователю) или None по таймауту."""
+        item = await self.client.brpop([self.finished_key], timeout=timeout)
+        return await self.get(item[1]) if item else None
+
+    async def stats(self) -> dict:
+        pipe = self.client.pipeline(transaction=False)
+        pipe.llen(self.queue_key)
+        pipe.zcard(self.delayed_key)
+        pipe.zcard(self.leases_key)
+        pipe.llen(self.finished_key)
+        queued, delayed, running, finished = await pipe.execute()
+        return {"queued": queued, "delayed": delayed, "running": running, "finished": finished}
+
+
+class JobProgress:
+    """on_progress и on_partial для AnalysisPipeline.run в воркере: события уходят в канал
+    очереди. Найденные фразы публикуются не чаще interval — бот всё равно правит сообщение
+    реже. Ошибка Redis только пишется в лог и не прерывает задачу."""
+
+    def __init__(self, queue: JobQueue, job_id: str, interval: float = JOB_PROGRESS_INTERVAL):
+        self.queue = queue
+        self.job_id = job_id
+        self.interval = interval
+        self._next_partial = 0.0
+
+    async def _publish(self, update: dict):
+        try:
+            await self.queue.publish_progress(self.job_id, update)
+        except Exception as e:
+            logger.debug(f"Failed to publish progress of job {self.job_id}: {str(e)}")
+
+    async def on_progress(self, event: ProgressEvent):
+        await self._publish({"stage": event.stage, "done": event.done, "total": event.total})
+
+    async def on_partial(self, phrases: List[Dict[str, int]]):
+        now = time.monotonic()
+        if now < self._next_partial:
+            return
+        self._next_partial = now + self.interval
+        await self._publish({"phrases": phrases})
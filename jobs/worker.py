@@ -0,0 +1,142 @@
+"""Воркер фоновых задач: python -m jobs.worker [--concurrency N].
+
+Забирает задачи из JobQueue и выполняет их обработчиком по типу задачи. Каждая попытка
+ограничена таймаутом задачи; обработчик получает JobProgress, чтобы сообщать боту о ходе
+выполнения. Раз в JOB_CANCEL_POLL секунд воркер проверяет флаг отмены и прерывает
+выполняющуюся задачу. Исключения и таймауты уходят на повтор (JobQueue.fail). Воркеров
+можно запускать сколько угодно и на разных машинах: общий у них только Redis (и
+history.db, куда пишется история анализов).
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Awaitable, Callable, Dict
+
+import config
+from jobs.queue import JobQueue, Job, JobProgress
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('logs/bot.log', encoding='utf-8'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+JOB_WORKER_CONCURRENCY = getattr(config, "JOB_WORKER_CONCURRENCY", 2)  # задач одновременно на процесс
+JOB_POLL_INTERVAL = getattr(config, "JOB_POLL_INTERVAL", 0.5)  # пауза, когда очередь пуста, сек
+JOB_CANCEL_POLL = getattr(config, "JOB_CANCEL_POLL", 1.0)
+
+JobHandler = Callable[[dict, JobProgress], Awaitable[dict]]
+
+
+class Worker:
+    def __init__(self, queue: JobQueue, handlers: Dict[str, JobHandler],
+                 concurrency: int = JOB_WORKER_CONCURRENCY, poll_interval: float = JOB_POLL_INTERVAL):
+        self.queue = queue
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self._stopping = asyncio.Event()
+
+    def stop(self):
+        """Новые задачи не забираются, выполняющиеся дорабатывают."""
+        self._stopping.set()
+
+    async def run(self):
+        logger.info(f"Worker {self.name} started, concurrency {self.concurrency}")
+        await asyncio.gather(*(self._slot(i) for i in range(self.concurrency)))
+        logger.info(f"Worker {self.name} stopped")
+
+    async def _slot(self, index: int):
+        name = f"{self.name}/{index}"
+        while not self._stopping.is_set():
+            try:
+                job = await self.queue.claim(name)
+            except Exception as e:
+                logger.error(f"Failed to claim job: {str(e)}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self.process(job)
+
+    async def process(self, job: Job):
+        handler = self.handlers.get(job.type)
+        if handler is None:
+            await self.queue.fail(job.id, f"unknown job type {job.type}", retry=False)
+            return
+        logger.info(f"Running job {job.id} ({job.type}), attempt {job.attempts}/{job.max_attempts}")
+        started = time.monotonic()
+        task = asyncio.create_task(handler(job.payload, JobProgress(self.queue, job.id)))
+        try:
+            while True:
+                remaining = job.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+                    logger.warning(f"Job {job.id} timed out after {job.timeout:.0f}s")
+                    await self.queue.fail(job.id, "timeout")
+                    return
+                done, _ = await asyncio.wait({task}, timeout=min(remaining, JOB_CANCEL_POLL))
+                if done:
+                    break
+                if await self.queue.is_cancel_requested(job.id):
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+                    logger.info(f"Job {job.id} cancelled")
+                    await self.queue.cancelled(job.id)
+                    return
+            result = task.result()
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {str(e)}", exc_info=True)
+            await self.queue.fail(job.id, str(e) or type(e).__name__)
+            return
+        await self.queue.complete(job.id, result)
+        logger.info(f"Job {job.id} done in {time.monotonic() - started:.1f}s")
+
+
+async def main(concurrency: int):
+    from analyzer.gpt_processor import GPTProcessor
+    from filters.stopwords_manager import StopWordsManager
+    from jobs.analysis import AnalysisPipeline, ANALYSIS_JOB
+    from parser.ozon import OzonParser
+    from storage.redis import RedisStorage, AsyncRedisStorage
+    from storage.sqlite import SQLiteStorage
+
+    sqlite_storage = SQLiteStorage()
+    async_redis_storage = AsyncRedisStorage()
+    stopwords_manager = StopWordsManager(redis_client=RedisStorage(), sqlite_client=sqlite_storage,
+                                         async_redis_client=async_redis_storage)
+    ozon_parser = OzonParser()
+    gpt_processor = GPTProcessor(config.OPENAI_API_KEY)
+    pipeline = AnalysisPipeline(ozon_parser, gpt_processor, stopwords_manager, sqlite_storage)
+    worker = Worker(JobQueue(async_redis_storage), {ANALYSIS_JOB: pipeline.run_job}, concurrency)
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    await gpt_processor.executor.warm_up()
+    try:
+        await worker.run()
+    finally:
+        await ozon_parser.close()
+        await gpt_processor.close()
+        await AsyncRedisStorage.close_pools()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=JOB_WORKER_CONCURRENCY)
+    asyncio.run(main(parser.parse_args().concurrency))
@@ -1,8 +1,7 @@
 import asyncio
 import logging
-from bot.handlers import dp, bot
 from config import AUTO_FLUSH_REDIS
-from storage.redis import RedisStorage
+from storage.redis import RedisStorage, AsyncRedisStorage
 
 # Настройка логирования
 logging.basicConfig(
@@ -26,8 +25,18 @@ def flush_redis():
             logger.error(f"Failed to flush Redis cache: {str(e)}")
 
 async def main():
+    # Бот, парсер и GPT создаются при импорте bot.handlers. Импорт здесь, а не в начале файла:
+    # процессы пула анализа (spawn) импортируют этот модуль заново и не должны их создавать.
+    from bot.handlers import dp, bot, ozon_parser, gpt_processor, deliver_job_results, forward_job_progress
+    from jobs.queue import JOBS_ENABLED
+
     # Очистка кэша Redis перед запуском
     flush_redis()
+    # Воркеры анализа стартуют заранее, чтобы первый запрос не ждал загрузки pymorphy3/NLTK
+    await gpt_processor.executor.warm_up()
+    # Анализ выполняют воркеры (python -m jobs.worker), бот показывает их ход и отправляет результаты
+    delivery = [asyncio.create_task(deliver_job_results()), asyncio.create_task(forward_job_progress())] \
+        if JOBS_ENABLED else []
 
     try:
         await dp.start_polling(bot)
@@ -41,6 +50,12 @@ async def main():
         await dp.stop_polling()
         await bot.session.close()
         logger.info("Bot stopped due to error.")
+    finally:
+        for task in delivery:
+            task.cancel()
+        await ozon_parser.close()
+        await gpt_processor.close()
+        await AsyncRedisStorage.close_pools()
 
 if __name__ == "__main__":
     try:
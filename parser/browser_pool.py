@@ -0,0 +1,335 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, List, Optional
+
+import config
+from playwright.async_api import async_playwright
+from selenium import webdriver
+from selenium.webdriver.edge.service import Service
+from selenium.webdriver.edge.options import Options
+from webdriver_manager.microsoft import EdgeChromiumDriverManager
+from parser.proxy import ProxyManager, to_playwright_proxy
+from parser.interception import BlockCounter, RequestFilter, block_selenium_requests
+from parser.waits import polite_pause, polite_pause_sync
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('logs/bot.log', encoding='utf-8'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+BROWSER_POOL_SIZE = getattr(config, "BROWSER_POOL_SIZE", 2)
+BROWSER_MAX_PAGES = getattr(config, "BROWSER_MAX_PAGES", 30)
+BROWSER_HEADLESS = getattr(config, "BROWSER_HEADLESS", False)
+OZON_HOME_URL = "https://www.ozon.com"
+
+
+class PooledContext:
+    """Прогретый контекст Playwright: куки уже выставлены, страница открыта."""
+
+    def __init__(self, context, page, proxy: str = None, session_id: str = None, blocks: BlockCounter = None):
+        self.context = context
+        self.page = page
+        self.proxy = proxy
+        self.session_id = session_id
+        self.blocks = blocks  # заблокированные RequestFilter запросы этого контекста
+        self.pages_served = 0
+        self.broken = False
+        self.banned = False
+        self.created_at = time.monotonic()
+
+    def mark_broken(self):
+        self.broken = True
+
+    def mark_banned(self):
+        """Ozon показал антибот: контекст выбрасывается, прокси получает штраф."""
+        self.broken = True
+        self.banned = True
+
+
+class BrowserPool:
+    """Долгоживущий браузер Playwright с пулом прогретых контекстов.
+
+    Контексты выдаются через lease(), после N страниц пересоздаются,
+    при сбое (mark_broken или упавший браузер) выбрасываются из пула.
+    """
+
+    def __init__(self, headers: Dict[str, str], cookies: List[dict], proxies: ProxyManager = None,
+                 size: int = BROWSER_POOL_SIZE, max_pages: int = BROWSER_MAX_PAGES,
+                 headless: bool = BROWSER_HEADLESS, request_filter: RequestFilter = None):
+        self.headers = headers
+        self.cookies = cookies
+        self.proxies = proxies
+        self.request_filter = request_filter
+        self.size = size
+        self.max_pages = max_pages
+        self.headless = headless
+        self._playwright = None
+        self._browser = None
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._created = 0
+        self._lock = asyncio.Lock()
+        self._slots = asyncio.Semaphore(size)
+        self._context_seq = 0
+
+    async def _ensure_browser(self):
+        async with self._lock:
+            if self._browser and self._browser.is_connected():
+                return
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            logger.info(f"Launching pooled Chromium (size={self.size}, headless={self.headless})")
+            self._browser = await self._playwright.chromium.launch(headless=self.headless)
+            # Контексты старого браузера больше не валидны
+            while not self._idle.empty():
+                self._idle.get_nowait()
+            self._created = 0
+
+    async def _create_context(self) -> PooledContext:
+        await self._ensure_browser()
+        # Прокси закреплён за контекстом: куки сессии и IP не меняются до пересоздания
+        self._context_seq += 1
+        session_id = f"browser-context:{self._context_seq}"
+        proxy = await self.proxies.get_proxy(session_id) if self.proxies else None
+        context = None
+        try:
+            context = await self._browser.new_context(
+                user_agent=self.headers["User-Agent"],
+                extra_http_headers=self.headers,
+                proxy=to_playwright_proxy(proxy)
+            )
+            blocks = await self.request_filter.install(context) if self.request_filter else None
+            page = await context.new_page()
+            await page.goto(OZON_HOME_URL, timeout=30000, wait_until='domcontentloaded')
+            await polite_pause()
+            await context.add_cookies(self.cookies)
+        except BaseException as e:
+            # В том числе отмена: контекст закрывается, прокси освобождается
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception as close_error:
+                    logger.debug(f"Error closing browser context: {str(close_error)}")
+            if self.proxies:
+                if isinstance(e, Exception):
+                    self.proxies.report(proxy, ok=False)
+                self.proxies.release(session_id)
+            raise
+        self._created += 1
+        logger.info(f"Warmed up browser context ({self._created}/{self.size})")
+        return PooledContext(context, page, proxy, session_id, blocks)
+
+    async def _is_healthy(self, pooled: PooledContext) -> bool:
+        if pooled.broken or not self._browser or not self._browser.is_connected():
+            return False
+        if pooled.page.is_closed():
+            return False
+        try:
+            await pooled.page.evaluate("1")
+            return True
+        except Exception:
+            return False
+
+    async def _discard(self, pooled: PooledContext, reason: str):
+        logger.info(f"Recycling browser context after {pooled.pages_served} pages: {reason}")
+        self._created = max(0, self._created - 1)
+        if self.proxies:
+            self.proxies.release(pooled.session_id)
+        try:
+            await pooled.context.close()
+        except Exception as e:
+            logger.debug(f"Error closing browser context: {str(e)}")
+
+    async def _acquire(self) -> PooledContext:
+        while not self._idle.empty():
+            pooled = self._idle.get_nowait()
+            if await self._is_healthy(pooled):
+                return pooled
+            await self._discard(pooled, "health check failed")
+        return await self._create_context()
+
+    @asynccontextmanager
+    async def lease(self):
+        """Выдаёт прогретый контекст на время загрузки одной страницы."""
+        async with self._slots:
+            pooled = await self._acquire()
+            try:
+                yield pooled
+            except BaseException:
+                # В том числе отмена по дедлайну: страница могла остаться в середине загрузки
+                pooled.mark_broken()
+                raise
+            finally:
+                pooled.pages_served += 1
+                if self.proxies:
+                    self.proxies.report(pooled.proxy, ok=not pooled.broken, banned=pooled.banned)
+                if pooled.broken:
+                    await self._discard(pooled, "marked broken")
+                elif pooled.pages_served >= self.max_pages:
+                    await self._discard(pooled, "page limit reached")
+                else:
+                    self._idle.put_nowait(pooled)
+
+    async def close(self):
+        while not self._idle.empty():
+            pooled = self._idle.get_nowait()
+            try:
+                await pooled.context.close()
+            except Exception:
+                pass
+        if self._browser:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+        self._created = 0
+        logger.info("Browser pool closed")
+
+
+class PooledDriver:
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages_served = 0
+        self.broken = False
+        self.banned = False
+
+    def mark_broken(self):
+        self.broken = True
+
+    def mark_banned(self):
+        """Ozon показал антибот: драйвер с его куками выбрасывается."""
+        self.broken = True
+        self.banned = True
+
+
+class SeleniumDriverPool:
+    """Пул драйверов Edge для Selenium-режима с теми же правилами, что и BrowserPool."""
+
+    _driver_path: Optional[str] = None
+    _driver_path_lock = threading.Lock()
+
+    def __init__(self, user_agent: str, cookies: List[dict],
+                 size: int = BROWSER_POOL_SIZE, max_pages: int = BROWSER_MAX_PAGES,
+                 block_requests: bool = True):
+        self.user_agent = user_agent
+        self.cookies = cookies
+        self.block_requests = block_requests
+        self.size = size
+        self.max_pages = max_pages
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @classmethod
+    def driver_path(cls) -> str:
+        """EdgeChromiumDriverManager().install() выполняется один раз на процесс."""
+        with cls._driver_path_lock:
+            if cls._driver_path is None:
+                cls._driver_path = EdgeChromiumDriverManager().install()
+            return cls._driver_path
+
+    def _create_driver(self) -> PooledDriver:
+        options = Options()
+        options.add_argument("--headless")
+        options.add_argument(f"user-agent={self.user_agent}")
+        options.add_argument("--disable-blink-features=AutomationControlled")
+        options.add_argument("--no-sandbox")
+        options.add_argument("--disable-dev-shm-usage")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--window-size=1920,1080")
+        options.add_experimental_option("excludeSwitches", ["enable-automation"])
+        options.add_experimental_option("useAutomationExtension", False)
+
+        driver = webdriver.Edge(service=Service(self.driver_path()), options=options)
+        try:
+            driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
+                "source": """
+                    Object.defineProperty(navigator, 'webdriver', {
+                        get: () => undefined
+                    })
+                """
+            })
+            if self.block_requests:
+                block_selenium_requests(driver)
+            driver.get(OZON_HOME_URL)
+            polite_pause_sync()
+            for cookie in self.cookies:
+                selenium_cookie = {
+                    "name": cookie["name"],
+                    "value": cookie["value"],
+                    "domain": cookie["domain"],
+                    "path": cookie["path"],
+                    "httpOnly": cookie.get("httpOnly", False),
+                    "secure": cookie.get("secure", False),
+                }
+                if cookie.get("expires", -1) > 0:
+                    selenium_cookie["expiry"] = int(cookie["expires"])
+                driver.add_cookie(selenium_cookie)
+        except Exception:
+            driver.quit()
+            raise
+        logger.info("Warmed up Selenium driver")
+        return PooledDriver(driver)
+
+    def _is_healthy(self, pooled: PooledDriver) -> bool:
+        if pooled.broken:
+            return False
+        try:
+            pooled.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, pooled: PooledDriver, reason: str):
+        logger.info(f"Recycling Selenium driver after {pooled.pages_served} pages: {reason}")
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            logger.debug(f"Error quitting Selenium driver: {str(e)}")
+
+    def _acquire(self) -> PooledDriver:
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                return self._create_driver()
+            if self._is_healthy(pooled):
+                return pooled
+            self._discard(pooled, "health check failed")
+
+    @contextmanager
+    def lease(self):
+        with self._slots:
+            pooled = self._acquire()
+            try:
+                yield pooled
+            except Exception:
+                pooled.mark_broken()
+                raise
+            finally:
+                pooled.pages_served += 1
+                if pooled.banned:
+                    self._discard(pooled, "antibot page")
+                elif pooled.broken:
+                    self._discard(pooled, "marked broken")
+                elif pooled.pages_served >= self.max_pages:
+                    self._discard(pooled, "page limit reached")
+                else:
+                    self._idle.put(pooled)
+
+    def close(self):
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(pooled, "pool closed")
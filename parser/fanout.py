@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import random
+from typing import Awaitable, Callable, Dict, List, Optional, TypeVar
+from urllib.parse import urlparse
+
+import config
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('logs/bot.log', encoding='utf-8'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+PRODUCT_FETCH_CONCURRENCY = getattr(config, "PRODUCT_FETCH_CONCURRENCY", 3)
+HOST_MIN_INTERVAL = getattr(config, "HOST_MIN_INTERVAL", 1.5)  # секунд между запросами к одному хосту
+QUERY_DEADLINE = getattr(config, "QUERY_DEADLINE", 90)  # секунд на весь запрос
+
+T = TypeVar("T")
+
+
+class HostThrottle:
+    """Ограничивает частоту старта запросов к одному хосту (вежливость к Ozon)."""
+
+    def __init__(self, min_interval: float = HOST_MIN_INTERVAL):
+        self.min_interval = min_interval
+        self._next_start: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def wait(self, url: str):
+        host = urlparse(url).netloc
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            loop = asyncio.get_running_loop()
+            delay = self._next_start.get(host, 0) - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # Небольшой разброс, чтобы запросы не шли строго по таймеру
+            self._next_start[host] = loop.time() + self.min_interval * random.uniform(1.0, 1.5)
+
+
+async def fetch_ordered(urls: List[str], fetch: Callable[[str], Awaitable[Optional[T]]],
+                        concurrency: int = PRODUCT_FETCH_CONCURRENCY,
+                        throttle: HostThrottle = None,
+                        deadline: float = None,
+                        on_done: Callable[[int, int], Awaitable[None]] = None) -> List[Optional[T]]:
+    """Параллельно загружает urls, сохраняя порядок результатов.
+
+    Страницы, не успевшие загрузиться до deadline (в секундах), или упавшие с ошибкой
+    возвращаются как None, остальные результаты не теряются. on_done(готово, всего)
+    вызывается после каждой завершённой страницы, удачной или нет.
+    """
+    if not urls:
+        return []
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    throttle = throttle or HostThrottle()
+
+    finished = 0
+
+    async def run(url: str) -> Optional[T]:
+        nonlocal finished
+        result, error = None, None
+        async with semaphore:
+            await throttle.wait(url)
+            try:
+                result = await fetch(url)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = e
+        finished += 1
+        if on_done:
+            await on_done(finished, len(urls))
+        if error is not None:
+            raise error
+        return result
+
+    tasks = [asyncio.create_task(run(url)) for url in urls]
+    try:
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+        if pending:
+            logger.warning(f"Deadline reached: {len(pending)}/{len(tasks)} product pages not fetched")
+    finally:
+        # При дедлайне, отмене или ошибке незавершённые загрузки не должны остаться висеть
+        unfinished = [task for task in tasks if not task.done()]
+        for task in unfinished:
+            task.cancel()
+        await asyncio.gather(*unfinished, return_exceptions=True)
+
+    results = []
+    for url, task in zip(urls, tasks):
+        if task in done and task.exception() is None:
+            results.append(task.result())
+        else:
+            if task in done:
+                logger.error(f"Error fetching {url}: {str(task.exception())}")
+            results.append(None)
+    return results
@@ -0,0 +1,95 @@
+"""Выбор HTML-парсера для parser.ozon.
+
+Поддерживаются:
+- "html.parser" — BeautifulSoup на встроенном парсере Python (медленно, без зависимостей);
+- "lxml" — BeautifulSoup поверх lxml (тот же API, в разы быстрее);
+- "selectolax" — Lexbor через selectolax, самый быстрый, узлы оборачиваются в адаптер
+  с методами BeautifulSoup, которые использует парсер (select, select_one, text, get, []).
+"""
+import logging
+from typing import List, Optional
+
+import config
+from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+HTML_PARSER_BACKEND = getattr(config, "HTML_PARSER_BACKEND", "lxml")
+BACKENDS = ("html.parser", "lxml", "selectolax")
+
+
+class SelectolaxNode:
+    """Адаптер узла selectolax к используемому подмножеству API BeautifulSoup."""
+
+    def __init__(self, node):
+        self._node = node
+
+    @property
+    def text(self) -> str:
+        return self._node.text(deep=True, separator="")
+
+    def get(self, attr: str, default=None):
+        value = self._node.attributes.get(attr)
+        return default if value is None else value
+
+    def __getitem__(self, attr: str) -> str:
+        value = self._node.attributes.get(attr)
+        if value is None:
+            raise KeyError(attr)
+        return value
+
+    def select(self, css: str) -> List["SelectolaxNode"]:
+        return [SelectolaxNode(n) for n in self._node.css(css)]
+
+    def select_one(self, css: str) -> Optional["SelectolaxNode"]:
+        node = self._node.css_first(css)
+        return SelectolaxNode(node) if node is not None else None
+
+
+def _available(backend: str) -> bool:
+    try:
+        if backend == "lxml":
+            import lxml  # noqa: F401
+        elif backend == "selectolax":
+            import selectolax  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def resolve_backend(backend: str = None) -> str:
+    backend = backend or HTML_PARSER_BACKEND
+    if backend not in BACKENDS:
+        logger.warning(f"Unknown HTML parser backend {backend}, using html.parser")
+        return "html.parser"
+    if not _available(backend):
+        logger.warning(f"HTML parser backend {backend} is not installed, using html.parser")
+        return "html.parser"
+    return backend
+
+
+def parse_html(html: str, backend: str = None):
+    """Разбирает HTML выбранным парсером и возвращает корень с select/select_one."""
+    backend = resolve_backend(backend)
+    if backend == "selectolax":
+        from selectolax.lexbor import LexborHTMLParser
+        return SelectolaxNode(LexborHTMLParser(html).root)
+    return BeautifulSoup(html, backend)
+
+
+class ParsedPage:
+    """Загруженная страница: HTML разбирается не более одного раза, по первому обращению."""
+
+    def __init__(self, url: str, html: str, backend: str = None):
+        self.url = url
+        self.html = html
+        self.backend = backend
+        self._tree = None
+        self.description: Optional[str] = None
+        self.details: Optional[dict] = None
+
+    @property
+    def tree(self):
+        if self._tree is None:
+            self._tree = parse_html(self.html, self.backend)
+        return self._tree
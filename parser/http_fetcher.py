@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+import config
+from parser.proxy import ProxyManager
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('logs/bot.log', encoding='utf-8'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+HTTP_POOL_SIZE = getattr(config, "HTTP_POOL_SIZE", 20)
+HTTP_TIMEOUT = getattr(config, "HTTP_TIMEOUT", 20)
+HTTP_FALLBACK_MODE = getattr(config, "HTTP_FALLBACK_MODE", "playwright")
+BLOCKED_STATUSES = (403, 429)  # Ozon так отвечает антиботом; браузер может пройти
+
+
+def is_antibot_page(html: str) -> bool:
+    return "Доступ ограничен" in html or "captcha" in html.lower()
+
+
+class HttpFetcher:
+    """Загрузка страниц Ozon обычным HTTP-клиентом без браузера.
+
+    Одна сессия aiohttp на процесс: общий пул соединений с keep-alive, заголовки и куки
+    парсера. aiohttp работает по HTTP/1.1; HTTP/2 он не поддерживает. Если Ozon отдаёт
+    антибот-страницу, 403 или 429, fetch() просит перейти на браузер; при прочих ошибках
+    (404, 5xx, сеть, кодировка) браузер не поможет, и страница просто не загружается.
+    """
+
+    def __init__(self, headers: Dict[str, str], cookies: List[dict], proxies: ProxyManager = None,
+                 pool_size: int = HTTP_POOL_SIZE, timeout: float = HTTP_TIMEOUT):
+        self.headers = headers
+        self.proxies = proxies
+        self.cookies = {c["name"]: c["value"] for c in cookies}
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock = asyncio.Lock()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        async with self._lock:
+            if self._session is None or self._session.closed:
+                connector = aiohttp.TCPConnector(
+                    limit=self.pool_size,
+                    limit_per_host=self.pool_size,
+                    keepalive_timeout=60,
+                    ttl_dns_cache=300
+                )
+                self._session = aiohttp.ClientSession(
+                    connector=connector,
+                    headers=self.headers,
+                    cookies=self.cookies,
+                    timeout=aiohttp.ClientTimeout(total=self.timeout)
+                )
+            return self._session
+
+    async def fetch(self, url: str, session_id: str = None) -> Tuple[Optional[str], bool]:
+        """(HTML страницы или None, нужен ли браузер). Прокси берётся из пула (закреплён за session_id)."""
+        session = await self._get_session()
+        proxy = await self.proxies.get_proxy(session_id) if self.proxies else None
+        started = time.perf_counter()
+        try:
+            async with session.get(url, proxy=proxy, allow_redirects=True) as response:
+                final_url = str(response.url)
+                if final_url != url:
+                    logger.warning(f"Redirect detected: {url} -> {final_url}")
+                if response.status in BLOCKED_STATUSES:
+                    logger.warning(f"HTTP {response.status} for URL: {url}, browser fallback required")
+                    self._report(proxy, ok=False, banned=True)
+                    return None, True
+                if response.status != 200:
+                    logger.warning(f"HTTP {response.status} for URL: {url}")
+                    self._report(proxy, ok=False)
+                    return None, False
+                html = await response.text()
+                if is_antibot_page(html):
+                    logger.warning(f"Antibot page for HTTP fetch of {url}, browser fallback required")
+                    self._report(proxy, ok=False, banned=True)
+                    return None, True
+                self._report(proxy, ok=True, latency=time.perf_counter() - started)
+                logger.debug(f"Fetched {url} over HTTP: {len(html)} chars")
+                return html, False
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Error fetching page {url} over HTTP: {str(e)}")
+            self._report(proxy, ok=False)
+            return None, False
+        except UnicodeDecodeError as e:
+            # Тело не в той кодировке, что указана в Content-Type
+            logger.error(f"Failed to decode page {url} fetched over HTTP: {str(e)}")
+            self._report(proxy, ok=True, latency=time.perf_counter() - started)
+            return None, False
+
+    def _report(self, proxy: Optional[str], ok: bool, banned: bool = False, latency: float = None):
+        if self.proxies and proxy:
+            self.proxies.report(proxy, ok=ok, banned=banned, latency=latency)
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
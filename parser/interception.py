@@ -0,0 +1,143 @@
+"""Перехват запросов браузера: парсеру нужен только текст страницы.
+
+Картинки (alt берём из разметки), шрифты, медиа, аналитика и скрипты сторонних доменов
+блокируются, CSS — по настройке. Для каждой страницы в лог пишется объём трафика
+и время до появления нужного селектора.
+"""
+import logging
+import time
+from typing import Dict, Iterable
+from urllib.parse import urlparse
+
+import config
+
+logger = logging.getLogger(__name__)
+
+BLOCKED_RESOURCE_TYPES = set(getattr(config, "BLOCKED_RESOURCE_TYPES", ("image", "media", "font")))
+BLOCK_STYLESHEETS = getattr(config, "BLOCK_STYLESHEETS", False)
+ALLOWED_DOMAINS = tuple(getattr(config, "ALLOWED_DOMAINS", (
+    "ozon.ru", "ozon.com", "ozone.ru", "ozonusercontent.com"
+)))
+BLOCKED_URL_PATTERNS = tuple(getattr(config, "BLOCKED_URL_PATTERNS", (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "mc.yandex.",
+    "top-fwz1.mail.ru", "vk.com/rtrg", "/tracker/", "/analytics", "sentry"
+)))
+# Для Selenium блокировка задаётся шаблонами URL (CDP Network.setBlockedURLs)
+SELENIUM_BLOCKED_URLS = [
+    "*.jpg", "*.jpeg", "*.png", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.mp4", "*.webm",
+] + [f"*{pattern}*" for pattern in BLOCKED_URL_PATTERNS]
+
+
+def _host_allowed(host: str, allowed: Iterable[str]) -> bool:
+    return any(host == domain or host.endswith("." + domain) for domain in allowed)
+
+
+class BlockCounter:
+    """Заблокированные запросы одного контекста браузера."""
+
+    def __init__(self):
+        self.blocked = 0
+
+
+class RequestFilter:
+    """Решает, пропускать ли запрос браузера; ставится на контекст Playwright один раз.
+
+    blocked — всего по всем контекстам; счётчик отдельного контекста возвращает install(),
+    потому что контексты пула загружают страницы одновременно.
+    """
+
+    def __init__(self, blocked_types: Iterable[str] = None, block_stylesheets: bool = BLOCK_STYLESHEETS,
+                 allowed_domains: Iterable[str] = ALLOWED_DOMAINS,
+                 blocked_patterns: Iterable[str] = BLOCKED_URL_PATTERNS):
+        self.blocked_types = set(blocked_types if blocked_types is not None else BLOCKED_RESOURCE_TYPES)
+        if block_stylesheets:
+            self.blocked_types.add("stylesheet")
+        self.allowed_domains = tuple(allowed_domains)
+        self.blocked_patterns = tuple(blocked_patterns)
+        self.blocked = 0
+
+    def should_block(self, url: str, resource_type: str) -> bool:
+        if resource_type in self.blocked_types:
+            return True
+        if any(pattern in url for pattern in self.blocked_patterns):
+            return True
+        host = urlparse(url).hostname or ""
+        # Документы пропускаем всегда (редиректы, антибот), прочее — только с доменов Ozon
+        if resource_type != "document" and host and not _host_allowed(host, self.allowed_domains):
+            return True
+        return False
+
+    async def _handle(self, route, counter: BlockCounter):
+        request = route.request
+        if self.should_block(request.url, request.resource_type):
+            self.blocked += 1
+            counter.blocked += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def install(self, context) -> BlockCounter:
+        counter = BlockCounter()
+
+        async def handle(route):
+            await self._handle(route, counter)
+
+        await context.route("**/*", handle)
+        return counter
+
+
+class TrafficMeter:
+    """Считает трафик и время до селектора для одной загрузки страницы."""
+
+    def __init__(self, page, blocks: BlockCounter = None):
+        self.page = page
+        self.blocks = blocks
+        self.requests = 0
+        self.bytes = 0
+        self.started_at = 0.0
+        self.selector_ms = None
+        self._blocked_at_start = 0
+
+    async def _on_finished(self, request):
+        self.requests += 1
+        try:
+            sizes = await request.sizes()
+            self.bytes += sizes.get("responseBodySize", 0) + sizes.get("responseHeadersSize", 0)
+        except Exception:
+            pass
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._blocked_at_start = self.blocks.blocked if self.blocks else 0
+        self.page.on("requestfinished", self._on_finished)
+
+    def mark_selector(self):
+        if self.selector_ms is None:
+            self.selector_ms = (time.perf_counter() - self.started_at) * 1000
+
+    def stop(self) -> Dict[str, float]:
+        self.page.remove_listener("requestfinished", self._on_finished)
+        blocked = (self.blocks.blocked - self._blocked_at_start) if self.blocks else 0
+        return {
+            "requests": self.requests,
+            "blocked": blocked,
+            "kb": self.bytes / 1024,
+            "selector_ms": self.selector_ms,
+            "total_ms": (time.perf_counter() - self.started_at) * 1000,
+        }
+
+    def log(self, url: str):
+        stats = self.stop()
+        selector = f"{stats['selector_ms']:.0f} ms" if stats["selector_ms"] is not None else "n/a"
+        logger.info(
+            f"Page traffic for {url}: {stats['kb']:.0f} KB in {stats['requests']} requests, "
+            f"{stats['blocked']} blocked, selector after {selector}, total {stats['total_ms']:.0f} ms"
+        )
+        return stats
+
+
+def block_selenium_requests(driver):
+    """Блокировка картинок, шрифтов и аналитики в Selenium через CDP."""
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": SELENIUM_BLOCKED_URLS})
@@ -1,24 +1,36 @@
 import logging
 import re
-from bs4 import BeautifulSoup
 from urllib.parse import quote
-from playwright.async_api import async_playwright
-from selenium import webdriver
-from selenium.webdriver.edge.service import Service
-from selenium.webdriver.edge.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.action_chains import ActionChains
 from config import OZON_SEARCH_URL, MAX_CARDS, PARSER_MODE
-from storage.redis import RedisStorage
-from typing import Dict, List
+from storage.redis import AsyncRedisStorage
+from storage.search_cache import SearchResultCache
+from storage.product_cache import ProductCache
+from parser.browser_pool import BrowserPool, SeleniumDriverPool
+from parser.state_extractor import (
+    extract_search_cards, extract_breadcrumbs, extract_product_details, product_text, product_sku, tile_grid_fragment
+)
+from parser.interception import RequestFilter, TrafficMeter
+from parser.proxy import ProxyManager
+from parser.selenium_worker import SeleniumWorker, SeleniumQueueFull
+from parser.http_fetcher import HttpFetcher, HTTP_FALLBACK_MODE, is_antibot_page
+from parser.waits import (
+    StepTimer, polite_pause, polite_pause_sync, wait_for_stable_count, wait_for_stable_count_sync,
+    wait_for_hydrated, wait_for_hydrated_sync,
+    SEARCH_RESULTS_SELECTOR, DESCRIPTION_SELECTOR, SHOW_MORE_SELECTOR
+)
+from parser.html_backend import ParsedPage, parse_html
+from parser.fanout import HostThrottle, fetch_ordered, PRODUCT_FETCH_CONCURRENCY, QUERY_DEADLINE
+from parser.scheduler import ScrapeScheduler, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from progress import ProgressCallback, emit, QUEUED, SEARCH_STARTED, SEARCH_LOADED, PRODUCTS
+from typing import Dict, List, Optional, Tuple
 import time
 import random
 import hashlib
-import asyncio
-from webdriver_manager.microsoft import EdgeChromiumDriverManager
-from proxybroker import Broker
+import uuid
 
 # Настройка логирования
 logging.basicConfig(
@@ -33,7 +45,9 @@ logger = logging.getLogger(__name__)
 
 class OzonParser:
     def __init__(self):
-        self.redis = RedisStorage()
+        self.redis = AsyncRedisStorage()
+        self.search_cache = SearchResultCache(self.redis)
+        self.product_cache = ProductCache(self.redis)
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36",
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
@@ -136,6 +150,16 @@ class OzonParser:
                 "secure": False
             }
         ]
+        fixed_cookies = [self.fix_cookie_samesite(dict(c)) for c in self.cookies]
+        self.proxies = ProxyManager()
+        self.request_filter = RequestFilter()
+        self.browser_pool = BrowserPool(self.headers, fixed_cookies, proxies=self.proxies,
+                                        request_filter=self.request_filter)
+        self.driver_pool = SeleniumDriverPool(self.headers["User-Agent"], self.cookies)
+        self.host_throttle = HostThrottle()
+        self.http = HttpFetcher(self.headers, self.cookies, proxies=self.proxies)
+        self.selenium_worker = SeleniumWorker()
+        self.scheduler = ScrapeScheduler()
 
     def fix_cookie_samesite(self, cookie: dict) -> dict:
         if 'sameSite' in cookie:
@@ -156,82 +180,47 @@ class OzonParser:
         text = re.sub(r'\s+', ' ', text)
         return text.strip()
 
-    async def get_proxy(self) -> dict | None:
-        """Получение прокси через proxybroker."""
-        proxy_queue = asyncio.Queue()
-        broker = Broker(proxy_queue)
-        tasks = await asyncio.gather(
-            broker.find(types=['HTTP', 'HTTPS'], limit=1),
-            return_exceptions=True
-        )
-        if tasks and not isinstance(tasks[0], Exception):
-            proxy = await proxy_queue.get()
-            return {
-                "server": f"{proxy.host}:{proxy.port}",
-                "username": proxy.username or "",
-                "password": proxy.password or ""
-            }
-        logger.warning("No proxy found")
-        return None
-
     async def fetch_page_playwright(self, url: str) -> str | None:
-        async with async_playwright() as p:
-            proxy = await self.get_proxy()
-            browser = await p.chromium.launch(
-                headless=False,
-                proxy=proxy if proxy else None
-            )
-            context = await browser.new_context(
-                user_agent=self.headers["User-Agent"],
-                extra_http_headers=self.headers
-            )
-            page = await context.new_page()
+        async with self.browser_pool.lease() as lease:
+            page = lease.page
+            meter = TrafficMeter(page, lease.blocks)
+            timer = StepTimer(url)
+            meter.start()
             try:
-                fixed_cookies = [self.fix_cookie_samesite(c) for c in self.cookies]
-                logger.debug(f"Setting cookies: {[c['name'] for c in fixed_cookies]}")
-                await page.goto("https://www.ozon.com", timeout=30000, wait_until='networkidle')
-                await page.wait_for_timeout(random.uniform(2000, 4000))
-                await context.add_cookies(fixed_cookies)
-
                 # Случайные действия
                 await page.mouse.move(random.randint(100, 500), random.randint(100, 500))
-                await page.wait_for_timeout(random.uniform(500, 1000))
+                await polite_pause(timer)
 
-                response = await page.goto(url, timeout=30000, wait_until='networkidle')
+                with timer.step("goto"):
+                    response = await page.goto(url, timeout=30000, wait_until='domcontentloaded')
                 final_url = response.url
                 if final_url != url:
                     logger.warning(f"Redirect detected: {url} -> {final_url}")
 
-                selectors = [
-                    ".tile-root",
-                    "[data-widget='searchResultsV2']",
-                    "[data-widget='catalogResults']",
-                    ".tile-container",
-                    ".qj6_24"
-                ]
-                for selector in selectors:
+                with timer.step("selector"):
                     try:
-                        await page.wait_for_selector(selector, timeout=30000)
-                        logger.debug(f"Found selector: {selector}")
-                        break
-                    except:
-                        logger.debug(f"Selector {selector} not found, trying next")
-                else:
-                    raise Exception("No valid selector found for search results")
+                        await page.wait_for_selector(SEARCH_RESULTS_SELECTOR, timeout=30000)
+                    except Exception:
+                        raise Exception("No valid selector found for search results")
+                meter.mark_selector()
 
                 await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                await page.wait_for_timeout(random.uniform(3000, 5000))
+                with timer.step("cards"):
+                    cards = await wait_for_stable_count(page)
+                logger.debug(f"Search page settled with {cards} cards")
                 await page.evaluate("window.scrollTo(0, 0)")
-                await page.wait_for_timeout(random.uniform(3000, 5000))
+                await polite_pause(timer)
                 html = await page.content()
                 timestamp = int(time.time())
                 with open(f"debug_ozon_search_{timestamp}.html", "w", encoding="utf-8") as f:
                     f.write(html)
-                if "Доступ ограничен" in html or "captcha" in html.lower():
+                if is_antibot_page(html):
                     logger.error(f"Antibot page detected for URL: {url}")
+                    lease.mark_banned()
                     return None
                 return html
             except Exception as e:
+                lease.mark_broken()
                 timestamp = int(time.time())
                 await page.screenshot(path=f"ozon_error_{timestamp}.png", full_page=True)
                 html = await page.content()
@@ -240,118 +229,111 @@ class OzonParser:
                 logger.error(f"Error fetching page {url} with Playwright: {str(e)}")
                 return None
             finally:
-                await browser.close()
+                meter.log(url)
+                timer.log()
 
     def fetch_page_selenium(self, url: str) -> str | None:
-        options = Options()
-        options.add_argument("--headless")
-        options.add_argument(f"user-agent={self.headers['User-Agent']}")
-        options.add_argument("--disable-blink-features=AutomationControlled")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("--disable-gpu")
-        options.add_argument("--window-size=1920,1080")
-        options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        options.add_experimental_option("useAutomationExtension", False)
-
-        driver = webdriver.Edge(service=Service(EdgeChromiumDriverManager().install()), options=options)
-        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
-            "source": """
-                Object.defineProperty(navigator, 'webdriver', {
-                    get: () => undefined
-                })
-            """
-        })
+        with self.driver_pool.lease() as lease:
+            driver = lease.driver
+            timer = StepTimer(url)
+            try:
+                with timer.step("goto"):
+                    driver.get(url)
+                with timer.step("selector"):
+                    WebDriverWait(driver, 30).until(
+                        EC.presence_of_any_elements_located((By.CSS_SELECTOR, SEARCH_RESULTS_SELECTOR))
+                    )
+                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+                with timer.step("cards"):
+                    wait_for_stable_count_sync(driver)
+                driver.execute_script("window.scrollTo(0, 0);")
+                polite_pause_sync(timer)
+                html = driver.page_source
+                timestamp = int(time.time())
+                with open(f"debug_ozon_search_{timestamp}.html", "w", encoding="utf-8") as f:
+                    f.write(html)
+                if is_antibot_page(html):
+                    logger.error(f"Antibot page detected for URL: {url}")
+                    lease.mark_banned()
+                    return None
+                return html
+            except Exception as e:
+                lease.mark_broken()
+                logger.error(f"Error fetching page {url} with Selenium: {str(e)}")
+                return None
+            finally:
+                timer.log()
 
+    async def fetch_search_page(self, url: str, session_id: str = None) -> str | None:
+        """Страница поиска: в режиме aiohttp — HTTP-клиентом, браузер только при антиботе."""
+        mode = PARSER_MODE
+        if mode == "aiohttp":
+            html, escalate = await self.http.fetch(url, session_id)
+            if html or not escalate:
+                return html
+            logger.info(f"Escalating search page to {HTTP_FALLBACK_MODE}: {url}")
+            mode = HTTP_FALLBACK_MODE
+        if mode == "playwright":
+            return await self.fetch_page_playwright(url)
         try:
-            driver.get("https://www.ozon.com")
-            time.sleep(random.uniform(2, 4))
-            for cookie in self.cookies:
-                selenium_cookie = {
-                    "name": cookie["name"],
-                    "value": cookie["value"],
-                    "domain": cookie["domain"],
-                    "path": cookie["path"],
-                    "httpOnly": cookie.get("httpOnly", False),
-                    "secure": cookie.get("secure", False),
-                }
-                if cookie.get("expires", -1) > 0:
-                    selenium_cookie["expiry"] = int(cookie["expires"])
-                driver.add_cookie(selenium_cookie)
-            driver.get(url)
-            WebDriverWait(driver, 30).until(
-                EC.presence_of_any_elements_located((
-                    By.CSS_SELECTOR, ".tile-root, [data-widget='searchResultsV2'], [data-widget='catalogResults'], .tile-container, .qj6_24"
-                ))
-            )
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(random.uniform(3, 5))
-            driver.execute_script("window.scrollTo(0, 0);")
-            time.sleep(random.uniform(3, 5))
-            html = driver.page_source
-            timestamp = int(time.time())
-            with open(f"debug_ozon_search_{timestamp}.html", "w", encoding="utf-8") as f:
-                f.write(html)
-            if "Доступ ограничен" in html or "captcha" in html.lower():
-                logger.error(f"Antibot page detected for URL: {url}")
-                return None
-            return html
-        except Exception as e:
-            logger.error(f"Error fetching page {url} with Selenium: {str(e)}")
+            return await self.selenium_worker.run(self.fetch_page_selenium, url)
+        except SeleniumQueueFull:
             return None
-        finally:
-            driver.quit()
-
-    async def fetch_product_page(self, url: str, timeout: int = 30000) -> str | None:
-        if PARSER_MODE == "playwright":
-            async with async_playwright() as p:
-                proxy = await self.get_proxy()
-                browser = await p.chromium.launch(
-                    headless=False,
-                    proxy=proxy if proxy else None
-                )
-                context = await browser.new_context(
-                    user_agent=self.headers["User-Agent"],
-                    extra_http_headers=self.headers
-                )
-                page = await context.new_page()
-                try:
-                    fixed_cookies = [self.fix_cookie_samesite(c) for c in self.cookies]
-                    logger.debug(f"Setting cookies for product page: {[c['name'] for c in fixed_cookies]}")
-                    await page.goto("https://www.ozon.com", timeout=30000, wait_until='networkidle')
-                    await page.wait_for_timeout(random.uniform(2000, 4000))
-                    await context.add_cookies(fixed_cookies)
 
-                    response = await page.goto(url, timeout=30000, wait_until='networkidle')
+    async def fetch_product_page(self, url: str, timeout: int = 30000, session_id: str = None) -> ParsedPage | None:
+        mode = PARSER_MODE
+        if mode == "aiohttp":
+            html, escalate = await self.http.fetch(url, session_id)
+            if html:
+                product_page = ParsedPage(url, html)
+                if not self.extract_product_description(product_page):
+                    logger.warning(f"No product description found for URL: {url}")
+                return product_page
+            if not escalate:
+                return None
+            logger.info(f"Escalating product page to {HTTP_FALLBACK_MODE}: {url}")
+            mode = HTTP_FALLBACK_MODE
+        return await self.fetch_product_page_browser(url, mode, timeout)
+
+    async def fetch_product_page_browser(self, url: str, mode: str, timeout: int = 30000) -> ParsedPage | None:
+        if mode == "playwright":
+            async with self.browser_pool.lease() as lease:
+                page = lease.page
+                meter = TrafficMeter(page, lease.blocks)
+                timer = StepTimer(url)
+                meter.start()
+                try:
+                    with timer.step("goto"):
+                        response = await page.goto(url, timeout=30000, wait_until='domcontentloaded')
                     final_url = response.url
                     if final_url != url:
                         logger.warning(f"Redirect detected: {url} -> {final_url}")
 
-                    await page.wait_for_selector(
-                        "[data-widget='webCharacteristics'], .tsBody500Medium, .webDescription, .pdp-description-text, .pdp-details, .tsBodyM, .tsBodyL, [data-auto='description'], .product-description, .description-container, [data-widget='webProductDescription']",
-                        timeout=timeout
-                    )
+                    with timer.step("selector"):
+                        await page.wait_for_selector(DESCRIPTION_SELECTOR, timeout=timeout)
+                    meter.mark_selector()
                     await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                    await page.wait_for_timeout(random.uniform(3000, 5000))
-                    await page.evaluate("window.scrollTo(0, 0)")
-                    await page.wait_for_timeout(random.uniform(3000, 5000))
+                    with timer.step("hydration"):
+                        await wait_for_hydrated(page)
                     try:
-                        await page.click("[data-auto='showMoreDescription'], .show-more, [data-state*='webShowMore']", timeout=5000)
-                        await page.wait_for_timeout(random.uniform(3000, 5000))
+                        await page.click(SHOW_MORE_SELECTOR, timeout=2000)
+                        with timer.step("show_more"):
+                            await wait_for_hydrated(page, min_chars=100, timeout_ms=5000)
                     except:
                         logger.debug(f"No 'Show More' button found for URL: {url}")
-                    await page.evaluate("window.scrollBy(0, 1); window.scrollBy(0, -1);")
-                    await page.wait_for_timeout(random.uniform(2000, 4000))
+                    await page.evaluate("window.scrollTo(0, 0)")
+                    await polite_pause(timer)
                     html = await page.content()
                     url_hash = hashlib.md5(url.encode()).hexdigest()
                     timestamp = int(time.time())
                     with open(f"debug_ozon_product_{url_hash}_{timestamp}.html", "w", encoding="utf-8") as f:
                         f.write(html)
-                    soup = BeautifulSoup(html, "html.parser")
-                    if not soup.select_one("[data-widget='webCharacteristics'], .tsBody500Medium, .webDescription, .pdp-description-text, .pdp-details, .tsBodyM, .tsBodyL, [data-auto='description'], .product-description, .description-container, [data-widget='webProductDescription']"):
+                    product_page = ParsedPage(url, html)
+                    if not self.extract_product_description(product_page):
                         logger.warning(f"No product description found for URL: {url}")
-                    return html
+                    return product_page
                 except Exception as e:
+                    lease.mark_broken()
                     timestamp = int(time.time())
                     await page.screenshot(path=f"ozon_product_error_{timestamp}.png", full_page=True)
                     html = await page.content()
@@ -360,90 +342,187 @@ class OzonParser:
                     logger.error(f"Error fetching product page {url} with Playwright: {str(e)}")
                     return None
                 finally:
-                    await browser.close()
-        else:
-            options = Options()
-            options.add_argument("--headless")
-            options.add_argument(f"user-agent={self.headers['User-Agent']}")
-            options.add_argument("--disable-blink-features=AutomationControlled")
-            options.add_argument("--no-sandbox")
-            options.add_argument("--disable-dev-shm-usage")
-            options.add_argument("--disable-gpu")
-            options.add_argument("--window-size=1920,1080")
-            options.add_experimental_option("excludeSwitches", ["enable-automation"])
-            options.add_experimental_option("useAutomationExtension", False)
-
-            driver = webdriver.Edge(service=Service(EdgeChromiumDriverManager().install()), options=options)
+                    meter.log(url)
+                    timer.log()
+        return await self.selenium_worker.run(self.fetch_product_page_selenium, url, timeout)
+
+    def fetch_product_page_selenium(self, url: str, timeout: int = 30000) -> ParsedPage | None:
+        """Синхронная загрузка через Selenium; вызывается только из потоков SeleniumWorker."""
+        with self.driver_pool.lease() as lease:
+            driver = lease.driver
+            timer = StepTimer(url)
             try:
-                driver.get("https://www.ozon.com")
-                time.sleep(random.uniform(2, 4))
-                for cookie in self.cookies:
-                    selenium_cookie = {
-                        "name": cookie["name"],
-                        "value": cookie["value"],
-                        "domain": cookie["domain"],
-                        "path": cookie["path"],
-                        "httpOnly": cookie.get("httpOnly", False),
-                        "secure": cookie.get("secure", False),
-                    }
-                    if cookie.get("expires", -1) > 0:
-                        selenium_cookie["expiry"] = int(cookie["expires"])
-                    driver.add_cookie(selenium_cookie)
-                driver.get(url)
-                WebDriverWait(driver, timeout // 1000).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, "[data-widget='webCharacteristics'], .tsBody500Medium, .webDescription, .pdp-description-text, .pdp-details, .tsBodyM, .tsBodyL, [data-auto='description'], .product-description, .description-container, [data-widget='webProductDescription']"))
-                )
+                with timer.step("goto"):
+                    driver.get(url)
+                with timer.step("selector"):
+                    WebDriverWait(driver, timeout // 1000).until(
+                        EC.presence_of_element_located((By.CSS_SELECTOR, DESCRIPTION_SELECTOR))
+                    )
                 driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(random.uniform(3, 5))
-                driver.execute_script("window.scrollTo(0, 0);")
-                time.sleep(random.uniform(3, 5))
+                with timer.step("hydration"):
+                    wait_for_hydrated_sync(driver)
                 try:
-                    more_button = driver.find_element(By.CSS_SELECTOR, "[data-auto='showMoreDescription'], .show-more, [data-state*='webShowMore']")
+                    more_button = driver.find_element(By.CSS_SELECTOR, SHOW_MORE_SELECTOR)
                     ActionChains(driver).move_to_element(more_button).click().perform()
-                    time.sleep(random.uniform(3, 5))
+                    with timer.step("show_more"):
+                        wait_for_hydrated_sync(driver, min_chars=100, timeout_ms=5000)
                 except:
                     logger.debug(f"No 'Show More' button found for URL: {url}")
-                driver.execute_script("window.scrollBy(0, 1); window.scrollBy(0, -1);")
-                time.sleep(random.uniform(2, 4))
+                driver.execute_script("window.scrollTo(0, 0);")
+                polite_pause_sync(timer)
                 html = driver.page_source
                 url_hash = hashlib.md5(url.encode()).hexdigest()
                 timestamp = int(time.time())
                 with open(f"debug_ozon_product_{url_hash}_{timestamp}.html", "w", encoding="utf-8") as f:
                     f.write(html)
-                soup = BeautifulSoup(html, "html.parser")
-                if not soup.select_one("[data-widget='webCharacteristics'], .tsBody500Medium, .webDescription, .pdp-description-text, .pdp-details, .tsBodyM, .tsBodyL, [data-auto='description'], .product-description, .description-container, [data-widget='webProductDescription']"):
+                product_page = ParsedPage(url, html)
+                if not self.extract_product_description(product_page):
                     logger.warning(f"No product description found for URL: {url}")
-                return html
+                return product_page
             except Exception as e:
+                lease.mark_broken()
                 logger.error(f"Error fetching product page {url} with Selenium: {str(e)}")
                 return None
             finally:
-                driver.quit()
+                timer.log()
+
+    async def close(self):
+        """Закрывает пулы браузеров и HTTP-сессию при остановке бота."""
+        await self.search_cache.revalidator.close()
+        await self.http.close()
+        await self.proxies.stop()
+        await self.browser_pool.close()
+        self.selenium_worker.shutdown()
+        self.driver_pool.close()
 
-    async def parse_search(self, user_id: int, query: str) -> Dict[str, List[str]]:
-        cached = self.redis.get_cache(user_id, query)
-        if cached:
-            logger.info(f"Cache hit for user {user_id}, query: {query}")
-            return cached
+    def _dom_cards(self, soup, skip: set = None, limit: int = MAX_CARDS) -> List[Dict[str, str]]:
+        """Карточки поиска по CSS-селекторам (запасной вариант, если нет data-state)."""
+        skip = skip or set()
+        cards = []
+        for item in soup.select(".tile-root, [data-widget='searchResultsV2'] .tile-container, .qj6_24"):
+            if len(cards) >= limit:
+                break
+            product_link = item.select_one("a[href^='/product/']")
+            link = product_link["href"] if product_link and product_link.get("href") else ""
+            sku = product_sku(link) or ""
+            if (sku or link) and (sku or link) in skip:
+                continue
 
+            card = {"sku": sku, "title": "", "description": "", "alt_text": "", "link": link}
+            title = item.select_one(".tsBody500Medium, .tile-title, .tsBody, [data-auto-name='title']")
+            if title:
+                card["title"] = self.clean_text(title.text)
+
+            desc = item.select_one(".p6b00-a4, .c301-a1, .tsBody400Small, .tsBodyControl400Small, .tile-info, [data-auto-name='price']")
+            if desc:
+                card["description"] = self.clean_text(desc.text)
+            else:
+                desc_fallback = item.select_one(".desc, .priceData")
+                if desc_fallback:
+                    card["description"] = self.clean_text(desc_fallback.text)
+
+            img = item.select_one("img[src*='ozon.com'], img.tile-image")
+            if img and img.get("alt"):
+                card["alt_text"] = self.clean_text(img["alt"])
+            cards.append(card)
+        return cards
+
+    def extract_cards(self, html: str) -> Tuple[List[Dict[str, str]], str]:
+        """Карточки и хлебные крошки страницы поиска.
+
+        Основной источник — JSON-состояние виджетов. Сервер отдаёт в нём только первую
+        порцию выдачи, поэтому недостающие до MAX_CARDS карточки добираются селекторами
+        из фрагмента с сеткой товаров, а не из всей страницы.
+        """
+        cards = extract_search_cards(html, MAX_CARDS)
+        breadcrumb = extract_breadcrumbs(html)
+        if cards:
+            if len(cards) < MAX_CARDS and html.count("tile-root") > len(cards):
+                seen = {card["sku"] or card["link"] for card in cards}
+                fragment = parse_html(tile_grid_fragment(html))
+                cards += self._dom_cards(fragment, skip=seen, limit=MAX_CARDS - len(cards))
+            logger.debug(f"Extracted {len(cards)} cards from widget state")
+            return cards, breadcrumb
+
+        logger.info("No widget state found, falling back to DOM selectors")
+        soup = parse_html(html)
+        if not breadcrumb:
+            breadcrumb_node = soup.select_one("nav.breadcrumbs, .nav_24, .breadcrumb, .breadcrumbs-wrapper")
+            if breadcrumb_node:
+                breadcrumb = self.clean_text(breadcrumb_node.text)
+        return self._dom_cards(soup), breadcrumb
+
+    def extract_product_description(self, page: ParsedPage) -> str:
+        """Описание товара; результат запоминается на странице, DOM строится максимум один раз."""
+        if page.description is not None:
+            return page.description
+        details = extract_product_details(page.html)
+        page.details = details
+        text = self.clean_text(product_text(details))
+        if not text:
+            product_desc = page.tree.select_one("[data-widget='webCharacteristics'], .tsBody500Medium, .webDescription, .pdp-description-text, .pdp-details, .tsBodyM, .tsBodyL, [data-auto='description'], .product-description, .description-container, [data-widget='webProductDescription']")
+            if product_desc:
+                text = self.clean_text(product_desc.text)
+        page.description = text
+        return text
+
+    async def parse_search(self, user_id: int, query: str,
+                           on_progress: Optional[ProgressCallback] = None) -> Dict[str, List[str]]:
+        """on_progress получает события парсинга: место в очереди, загрузку выдачи и страниц товаров.
+        Если результат есть в кэше, событий нет."""
+        logger.info(f"Search requested by user {user_id}: {query}")
+
+        async def on_position(position: int):
+            await emit(on_progress, QUEUED, position)
+
+        async def fetch(q: str) -> Tuple[Dict[str, List[str]], bool]:
+            async with self.scheduler.slot(user_id, PRIORITY_INTERACTIVE, on_position if on_progress else None):
+                return await self._scrape_for_cache(q, on_progress)
+
+        async def refresh(q: str) -> Tuple[Dict[str, List[str]], bool]:
+            async with self.scheduler.slot(user_id, PRIORITY_BACKGROUND):
+                return await self._scrape_for_cache(q)
+
+        return await self.search_cache.get_or_fetch(query, fetch, refresh)
+
+    async def _scrape_for_cache(self, query: str,
+                                on_progress: Optional[ProgressCallback] = None) -> Tuple[Dict[str, List[str]], bool]:
+        result, complete = await self.scrape(query, on_progress)
+        if "error" in result:
+            return result, False
+        if not complete:
+            # Частичный результат отдаём пользователю, но не кэшируем на сутки
+            logger.warning(f"Partial result for query: {query}, skipping cache")
+        return result, complete
+
+    async def scrape(self, query: str,
+                     on_progress: Optional[ProgressCallback] = None) -> Tuple[Dict[str, List[str]], bool]:
+        """Загрузка и разбор выдачи без кэша. Возвращает (результат, все ли страницы товаров загружены)."""
+        session_id = uuid.uuid4().hex
+        try:
+            return await self._scrape(query, session_id, on_progress)
+        finally:
+            self.proxies.release(session_id)
+
+    async def _scrape(self, query: str, session_id: str,
+                      on_progress: Optional[ProgressCallback] = None) -> Tuple[Dict[str, List[str]], bool]:
+        started_at = time.monotonic()
         encoded_query = quote(query)
         url = f"{OZON_SEARCH_URL}?text={encoded_query}"
 
-        if PARSER_MODE == "playwright":
-            html = await self.fetch_page_playwright(url)
-        else:
-            html = self.fetch_page_selenium(url)
+        await emit(on_progress, SEARCH_STARTED)
+        html = await self.fetch_search_page(url, session_id)
 
         if not html:
             logger.error(f"Failed to fetch page for query: {query}")
-            return {"error": "Не удалось загрузить страницу"}
+            return {"error": "Не удалось загрузить страницу"}, False
 
-        if "Доступ ограничен" in html or "captcha" in html.lower():
+        if is_antibot_page(html):
             logger.error(f"Antibot page detected for query: {query}")
-            return {"error": "Обнаружена страница антибот-защиты"}
+            return {"error": "Обнаружена страница антибот-защиты"}, False
 
-        soup = BeautifulSoup(html, "html.parser")
-        items = soup.select(".tile-root, [data-widget='searchResultsV2'] .tile-container, .qj6_24")[:MAX_CARDS]
+        cards, breadcrumb = self.extract_cards(html)
+        await emit(on_progress, SEARCH_LOADED, total=len(cards))
         result = {
             "titles": [],
             "descriptions": [],
@@ -453,48 +532,54 @@ class OzonParser:
         }
 
         max_product_pages = 20
-        for i, item in enumerate(items):
-            title = item.select_one(".tsBody500Medium, .tile-title, .tsBody, [data-auto-name='title']")
-            if title:
-                result["titles"].append(self.clean_text(title.text))
+        product_urls = []
+        for i, card in enumerate(cards):
+            if card["title"]:
+                result["titles"].append(card["title"])
+            if card["description"]:
+                result["descriptions"].append(card["description"])
+            if card["alt_text"]:
+                result["alt_texts"].append(card["alt_text"])
+            if i < max_product_pages and card["link"].startswith("/product/"):
+                product_urls.append("https://www.ozon.com" + card["link"])
+            if breadcrumb:
+                result["breadcrumbs"].append(breadcrumb)
 
-            desc = item.select_one(".p6b00-a4, .c301-a1, .tsBody400Small, .tsBodyControl400Small, .tile-info, [data-auto-name='price']")
-            if desc:
-                result["descriptions"].append(self.clean_text(desc.text))
-            else:
-                desc_fallback = item.select_one(".desc, .priceData")
-                if desc_fallback:
-                    result["descriptions"].append(self.clean_text(desc_fallback.text))
+        # Товары, уже известные по другим запросам, берём из кэша; остальные грузим параллельно
+        skus = [product_sku(product_url) for product_url in product_urls]
+        entries = await self.product_cache.get_many(skus)
+        to_fetch = self.product_cache.plan(skus, entries)
+        cached_count = len(skus) - len(to_fetch)
 
-            img = item.select_one("img[src*='ozon.com'], img.tile-image")
-            if img and img.get("alt"):
-                result["alt_texts"].append(self.clean_text(img["alt"]))
-
-            if i < max_product_pages:
-                product_link = item.select_one("a[href^='/product/']")
-                if product_link and product_link.get("href"):
-                    product_url = "https://www.ozon.com" + product_link["href"]
-                    product_html = await self.fetch_product_page(product_url)
-                    if product_html:
-                        product_soup = BeautifulSoup(product_html, "html.parser")
-                        product_desc = product_soup.select_one("[data-widget='webCharacteristics'], .tsBody500Medium, .webDescription, .pdp-description-text, .pdp-details, .tsBodyM, .tsBodyL, [data-auto='description'], .product-description, .description-container, [data-widget='webProductDescription']")
-                        if product_desc:
-                            cleaned_desc = self.clean_text(product_desc.text)
-                            if cleaned_desc:
-                                result["product_descriptions"].append(cleaned_desc)
-                            else:
-                                logger.warning(f"Empty cleaned description for URL: {product_url}")
-                        else:
-                            logger.warning(f"No description found for URL: {product_url}")
-
-            breadcrumb = soup.select_one("nav.breadcrumbs, .nav_24, .breadcrumb, .breadcrumbs-wrapper")
-            if breadcrumb:
-                result["breadcrumbs"].append(self.clean_text(breadcrumb.text))
+        async def on_product_done(done: int, total: int):
+            await emit(on_progress, PRODUCTS, cached_count + done, len(skus))
+
+        await emit(on_progress, PRODUCTS, cached_count, len(skus))
+        remaining = max(0.0, QUERY_DEADLINE - (time.monotonic() - started_at))
+        product_pages = await fetch_ordered(
+            [product_urls[i] for i in to_fetch],
+            lambda product_url: self.fetch_product_page(product_url, session_id=session_id),
+            concurrency=PRODUCT_FETCH_CONCURRENCY, throttle=self.host_throttle, deadline=remaining,
+            on_done=on_product_done if on_progress else None
+        )
+        descriptions = [entry["text"] if entry else "" for entry in entries]
+        complete = True
+        fresh_entries = []
+        for i, product_page in zip(to_fetch, product_pages):
+            if product_page is None:
+                # Если обновить не удалось, остаётся устаревшая запись из кэша
+                complete = complete and entries[i] is not None
+                continue
+            description = self.extract_product_description(product_page)
+            descriptions[i] = description
+            if skus[i] and description:
+                fresh_entries.append(self.product_cache.entry(skus[i], description, product_page.details))
+        await self.product_cache.set_many(fresh_entries)
+        result["product_descriptions"] = [d for d in descriptions if d]
 
         if not any(result.values()):
             logger.warning(f"No data parsed for query: {query}")
-            return {"error": "Не удалось извлечь данные"}
+            return {"error": "Не удалось извлечь данные"}, False
 
-        logger.info(f"Parsed {len(items)} items for query: {query}")
-        self.redis.set_cache(user_id, query, result)
-        return result
\ No newline at end of file
+        logger.info(f"Parsed {len(cards)} items for query: {query}")
+        return result, complete
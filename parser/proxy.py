@@ -1,24 +1,233 @@
 import asyncio
-from proxybroker import Broker
-from typing import Optional
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+import aiohttp
+import config
+
+logger = logging.getLogger(__name__)
+
+PROXY_ENABLED = getattr(config, "PROXY_ENABLED", True)
+PROXY_MIN_POOL = getattr(config, "PROXY_MIN_POOL", 5)  # сколько проверенных прокси держать наготове
+PROXY_FETCH_LIMIT = getattr(config, "PROXY_FETCH_LIMIT", 20)  # кандидатов за одно пополнение
+PROXY_REFILL_INTERVAL = getattr(config, "PROXY_REFILL_INTERVAL", 60)  # секунд между проверками пула
+PROXY_CHECK_URL = getattr(config, "PROXY_CHECK_URL", "https://www.ozon.ru/robots.txt")
+PROXY_CHECK_TIMEOUT = getattr(config, "PROXY_CHECK_TIMEOUT", 10)
+PROXY_MIN_SUCCESS_RATE = getattr(config, "PROXY_MIN_SUCCESS_RATE", 0.5)
+PROXY_MAX_BAN_RATE = getattr(config, "PROXY_MAX_BAN_RATE", 0.3)
+PROXY_EVICT_TTL = getattr(config, "PROXY_EVICT_TTL", 1800)  # секунд, пока выселенный прокси не берётся снова
+PROXY_MIN_SAMPLES = 3  # до стольких запросов прокси не выселяется по статистике
+
+ProxySource = Callable[[int], Awaitable[List[str]]]
+ProxyValidator = Callable[[str], Awaitable[Optional[float]]]
+
+
+async def broker_source(limit: int) -> List[str]:
+    """Поиск кандидатов через proxybroker."""
+    from proxybroker import Broker
+
+    queue = asyncio.Queue()
+    broker = Broker(queue, max_tries=3)
+    await broker.find(types=['HTTP', 'HTTPS'], limit=limit)
+    proxies = []
+    while not queue.empty():
+        proxy = queue.get_nowait()
+        if proxy is None:
+            break
+        proxies.append(f"http://{proxy.host}:{proxy.port}")
+    return proxies
+
+
+def list_source(proxies: List[str]) -> ProxySource:
+    """Источник из фиксированного списка (свои прокси или локальная заглушка в тестах)."""
+    async def source(limit: int) -> List[str]:
+        return list(proxies)[:limit]
+    return source
+
+
+async def check_proxy(proxy: str, url: str = PROXY_CHECK_URL, timeout: float = PROXY_CHECK_TIMEOUT) -> Optional[float]:
+    """Задержка прокси в секундах или None, если прокси не работает."""
+    started = time.perf_counter()
+    try:
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+            async with session.get(url, proxy=proxy) as response:
+                if response.status >= 400:
+                    return None
+                await response.read()
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+        return None
+    return time.perf_counter() - started
+
+
+def to_playwright_proxy(proxy: Optional[str]) -> Optional[dict]:
+    if not proxy:
+        return None
+    parsed = urlparse(proxy)
+    server = f"{parsed.scheme or 'http'}://{parsed.hostname}:{parsed.port}"
+    result = {"server": server}
+    if parsed.username:
+        result["username"] = parsed.username
+        result["password"] = parsed.password or ""
+    return result
+
+
+class ProxyStats:
+    def __init__(self, address: str, latency: float):
+        self.address = address
+        self.latency = latency
+        self.successes = 0
+        self.failures = 0
+        self.bans = 0
+        self.leases = 0
+
+    @property
+    def requests(self) -> int:
+        return self.successes + self.failures + self.bans
+
+    @property
+    def success_rate(self) -> float:
+        return self.successes / self.requests if self.requests else 1.0
+
+    @property
+    def ban_rate(self) -> float:
+        return self.bans / self.requests if self.requests else 0.0
+
+    @property
+    def score(self) -> float:
+        """Чем выше, тем лучше: успешность минус баны, с небольшим штрафом за задержку."""
+        return self.success_rate - 2 * self.ban_rate - min(self.latency, 10) / 20
+
+    def is_bad(self) -> bool:
+        if self.requests < PROXY_MIN_SAMPLES:
+            return False
+        return self.success_rate < PROXY_MIN_SUCCESS_RATE or self.ban_rate > PROXY_MAX_BAN_RATE
+
 
 class ProxyManager:
-    def __init__(self):
-        self.broker = Broker(max_tries=3)
-        self.proxies = asyncio.Queue()
+    """Общий пул проверенных прокси.
+
+    Фоновая задача поддерживает в пуле не меньше PROXY_MIN_POOL прокси, проверяя
+    кандидатов из source через validator. get_proxy(session_id) закрепляет прокси
+    за сессией (запросом или контекстом браузера), report() обновляет статистику,
+    плохие прокси выселяются на evict_ttl секунд, после чего снова могут пройти проверку.
+    """
+
+    def __init__(self, source: ProxySource = broker_source, validator: ProxyValidator = check_proxy,
+                 min_pool: int = PROXY_MIN_POOL, fetch_limit: int = PROXY_FETCH_LIMIT,
+                 refill_interval: float = PROXY_REFILL_INTERVAL, enabled: bool = PROXY_ENABLED,
+                 evict_ttl: float = PROXY_EVICT_TTL):
+        self.source = source
+        self.validator = validator
+        self.min_pool = min_pool
+        self.fetch_limit = fetch_limit
+        self.refill_interval = refill_interval
+        self.enabled = enabled
+        self.evict_ttl = evict_ttl
+        self.proxies: Dict[str, ProxyStats] = {}
+        self.evicted: Dict[str, float] = {}  # прокси -> время выселения (time.monotonic)
+        self.sessions: Dict[str, str] = {}
+        self._refill_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_list(cls, proxies: List[str], **kwargs) -> "ProxyManager":
+        return cls(source=list_source(proxies), **kwargs)
 
-    async def fetch_proxies(self):
-        await self.broker.find(types=['HTTP', 'HTTPS'], limit=10)
+    async def fetch_proxies(self) -> int:
+        """Получает кандидатов, проверяет их параллельно и добавляет рабочие в пул."""
+        async with self._refill_lock:
+            try:
+                candidates = await self.source(self.fetch_limit)
+            except Exception as e:
+                logger.error(f"Proxy source failed: {str(e)}")
+                return 0
+            self._forget_evicted()
+            candidates = [p for p in dict.fromkeys(candidates) if p not in self.proxies and p not in self.evicted]
+            latencies = await asyncio.gather(*(self.validator(p) for p in candidates), return_exceptions=True)
+            added = 0
+            for proxy, latency in zip(candidates, latencies):
+                if isinstance(latency, (int, float)) and not isinstance(latency, bool):
+                    self.proxies[proxy] = ProxyStats(proxy, float(latency))
+                    added += 1
+            logger.info(f"Validated {added}/{len(candidates)} proxies, pool size {len(self.proxies)}")
+            return added
+
+    async def _refill_loop(self):
         while True:
-            proxy = await self.broker.get()
-            if proxy is None:
-                break
-            await self.proxies.put(f"http://{proxy.host}:{proxy.port}")
+            if len(self.proxies) < self.min_pool:
+                await self.fetch_proxies()
+            await asyncio.sleep(self.refill_interval)
+
+    def start(self):
+        if self.enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._refill_loop())
 
-    async def get_proxy(self) -> Optional[str]:
-        if self.proxies.empty():
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def get_proxy(self, session_id: str = None) -> Optional[str]:
+        if not self.enabled:
+            return None
+        self.start()
+        if session_id and session_id in self.sessions:
+            proxy = self.sessions[session_id]
+            if proxy in self.proxies:
+                return proxy
+            del self.sessions[session_id]
+        if not self.proxies:
             await self.fetch_proxies()
-        try:
-            return self.proxies.get_nowait()
-        except asyncio.QueueEmpty:
-            return None
\ No newline at end of file
+        if not self.proxies:
+            logger.warning("No proxy found")
+            return None
+        stats = max(self.proxies.values(), key=lambda s: (s.score, -s.leases))
+        stats.leases += 1
+        if session_id:
+            self.sessions[session_id] = stats.address
+        return stats.address
+
+    def release(self, session_id: str):
+        self.sessions.pop(session_id, None)
+
+    def report(self, proxy: Optional[str], ok: bool, banned: bool = False, latency: float = None):
+        stats = self.proxies.get(proxy) if proxy else None
+        if not stats:
+            return
+        if banned:
+            stats.bans += 1
+        elif ok:
+            stats.successes += 1
+        else:
+            stats.failures += 1
+        if latency is not None:
+            stats.latency = 0.7 * stats.latency + 0.3 * latency
+        if stats.is_bad():
+            self.evict(proxy)
+
+    def _forget_evicted(self):
+        """Снимает выселение с прокси, у которых истёк evict_ttl: бан на стороне Ozon не вечен."""
+        deadline = time.monotonic() - self.evict_ttl
+        self.evicted = {p: at for p, at in self.evicted.items() if at > deadline}
+
+    def evict(self, proxy: str):
+        stats = self.proxies.pop(proxy, None)
+        self.evicted[proxy] = time.monotonic()
+        self.sessions = {sid: p for sid, p in self.sessions.items() if p != proxy}
+        if stats:
+            logger.info(f"Evicted proxy {proxy}: success {stats.success_rate:.0%}, bans {stats.ban_rate:.0%}")
+
+    def snapshot(self) -> List[dict]:
+        return [
+            {
+                "proxy": s.address, "latency": round(s.latency, 3), "success_rate": round(s.success_rate, 3),
+                "ban_rate": round(s.ban_rate, 3), "requests": s.requests
+            }
+            for s in sorted(self.proxies.values(), key=lambda s: s.score, reverse=True)
+        ]
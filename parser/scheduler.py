@@ -0,0 +1,235 @@
+"""Очередь на парсинг Ozon перед OzonParser.parse_search.
+
+Браузерный парсинг — самый дефицитный ресурс, поэтому одновременно выполняется не
+больше SCRAPE_CONCURRENCY парсингов (по умолчанию — по размеру пула браузеров), а
+ожидающие обслуживаются так:
+- по уровням приоритета: пока ждёт хоть один запрос уровня PRIORITY_INTERACTIVE,
+  фоновые (PRIORITY_BACKGROUND, обновление кэша) не стартуют; кроме того, фоновые
+  занимают не больше SCRAPE_BACKGROUND_SLOTS мест, чтобы пользователю всегда
+  оставалось место;
+- внутри уровня — по кругу между пользователями: у каждого своя очередь, и следующим
+  получает место тот, кто обслуживался давнее всех (новый пользователь — раньше тех,
+  кто уже получал место), так что за один круг каждый получает по одному месту,
+  сколько бы запросов он ни отправил;
+- у одного пользователя выполняется не больше SCRAPE_PER_USER интерактивных парсингов
+  сразу; фоновое обновление кэша, запущенное его запросом, в этот лимит не входит,
+  иначе оно задерживало бы его же следующие запросы.
+
+slot() сообщает ожидающему его место в очереди (on_position) при постановке и при
+каждом сдвиге, чтобы бот мог показать его пользователю.
+"""
+import asyncio
+import itertools
+import logging
+from collections import Counter, OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+SCRAPE_CONCURRENCY = getattr(config, "SCRAPE_CONCURRENCY", getattr(config, "BROWSER_POOL_SIZE", 2))
+SCRAPE_PER_USER = getattr(config, "SCRAPE_PER_USER", 1)
+SCRAPE_BACKGROUND_SLOTS = getattr(config, "SCRAPE_BACKGROUND_SLOTS", 1)
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+# Получает номер места в очереди (1 — следующий)
+PositionCallback = Callable[[int], Awaitable[None]]
+
+
+_ticket_seq = itertools.count()
+
+
+class _Ticket:
+    __slots__ = ("user_id", "priority", "seq", "granted", "moved")
+
+    def __init__(self, user_id: int, priority: int):
+        self.user_id = user_id
+        self.priority = priority
+        self.seq = next(_ticket_seq)
+        self.granted = asyncio.get_running_loop().create_future()
+        self.moved = asyncio.Event()
+
+
+class ScrapeScheduler:
+    def __init__(self, concurrency: int = SCRAPE_CONCURRENCY, per_user: int = SCRAPE_PER_USER,
+                 background_slots: int = SCRAPE_BACKGROUND_SLOTS):
+        self.concurrency = max(1, concurrency)
+        self.per_user = max(1, per_user)
+        self.background_slots = background_slots
+        # Уровень приоритета → пользователь → его ожидающие запросы
+        self._waiting: Dict[int, "OrderedDict[int, Deque[_Ticket]]"] = {}
+        # Уровень приоритета → пользователь → номер выдачи, на которой он последний раз получил место.
+        # Переживает опустевшую очередь пользователя, иначе его новый запрос встал бы в круг заново.
+        self._last_served: Dict[int, Dict[int, int]] = {}
+        self._grants = 0
+        self._running = 0
+        self._running_by_user: Counter = Counter()  # только интерактивные
+        self._running_background = 0
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(tickets) for users in self._waiting.values() for tickets in users.values())
+
+    def _eligible(self, user_id: int, priority: int) -> bool:
+        if priority != PRIORITY_INTERACTIVE:
+            return self._running_background < self.background_slots
+        return self._running_by_user[user_id] < self.per_user
+
+    def _dispatch(self):
+        granted = False
+        while self._running < self.concurrency:
+            ticket = self._next_ticket()
+            if ticket is None:
+                break
+            self._running += 1
+            if ticket.priority == PRIORITY_INTERACTIVE:
+                self._running_by_user[ticket.user_id] += 1
+            else:
+                self._running_background += 1
+            ticket.granted.set_result(None)
+            granted = True
+        if granted:
+            self._notify()
+        self._forget_served()
+
+    def _forget_served(self):
+        """Убирает историю, которая уже не влияет на порядок.
+
+        Пользователь без ожидающих и выполняющихся запросов, обслуженный раньше всех
+        ожидающих, при возвращении и так встанет перед ними, как новый.
+        """
+        for priority in list(self._last_served):
+            last_served = self._last_served[priority]
+            users = self._waiting.get(priority, {})
+            oldest = min((last_served.get(user_id, -1) for user_id in users), default=None)
+            for user_id, served in list(last_served.items()):
+                if user_id in users or self._running_by_user[user_id]:
+                    continue
+                if oldest is None or served < oldest:
+                    del last_served[user_id]
+            if not last_served:
+                del self._last_served[priority]
+
+    def _rotation(self, priority: int) -> List[int]:
+        """Ожидающие пользователи уровня в порядке круга: кто обслуживался давнее, тот раньше."""
+        users = self._waiting.get(priority, {})
+        last_served = self._last_served.get(priority, {})
+        return sorted(users, key=lambda user_id: (last_served.get(user_id, -1), users[user_id][0].seq))
+
+    def _next_ticket(self) -> Optional[_Ticket]:
+        for priority in sorted(self._waiting):
+            users = self._waiting[priority]
+            for user_id in self._rotation(priority):
+                if not self._eligible(user_id, priority):
+                    continue
+                tickets = users[user_id]
+                ticket = tickets.popleft()
+                if not tickets:
+                    del users[user_id]
+                if not users:
+                    del self._waiting[priority]
+                self._grants += 1
+                self._last_served.setdefault(priority, {})[user_id] = self._grants
+                return ticket
+            if users and priority == PRIORITY_INTERACTIVE:
+                # Ждущие интерактивные запросы не пропускают вперёд фоновые
+                return None
+        return None
+
+    def _notify(self):
+        for users in self._waiting.values():
+            for tickets in users.values():
+                for ticket in tickets:
+                    ticket.moved.set()
+
+    def _remove(self, ticket: _Ticket):
+        users = self._waiting.get(ticket.priority, {})
+        tickets = users.get(ticket.user_id)
+        if tickets and ticket in tickets:
+            tickets.remove(ticket)
+            if not tickets:
+                del users[ticket.user_id]
+            if not users:
+                self._waiting.pop(ticket.priority, None)
+            self._notify()
+            self._forget_served()
+
+    def _release(self, ticket: _Ticket):
+        self._running -= 1
+        if ticket.priority == PRIORITY_INTERACTIVE:
+            self._running_by_user[ticket.user_id] -= 1
+            if not self._running_by_user[ticket.user_id]:
+                del self._running_by_user[ticket.user_id]
+        else:
+            self._running_background -= 1
+        self._dispatch()
+
+    def position(self, ticket: _Ticket) -> int:
+        """Сколько запросов стартует раньше этого (оценка по круговому обходу)."""
+        ahead = 0
+        for priority, users in self._waiting.items():
+            if priority < ticket.priority:
+                ahead += sum(len(tickets) for tickets in users.values())
+            elif priority == ticket.priority:
+                own = users.get(ticket.user_id)
+                if not own or ticket not in own:
+                    continue
+                index = own.index(ticket)
+                before = True  # пользователи до нашего в круге обслуживаются на этом круге раньше
+                for user_id in self._rotation(priority):
+                    if user_id == ticket.user_id:
+                        before = False
+                        ahead += index
+                    else:
+                        ahead += min(len(users[user_id]), index + 1 if before else index)
+        return ahead
+
+    async def _wait(self, ticket: _Ticket, on_position: Optional[PositionCallback]):
+        last = None
+        while not ticket.granted.done():
+            ticket.moved.clear()
+            position = self.position(ticket) + 1
+            if on_position and position != last:
+                last = position
+                try:
+                    await on_position(position)
+                except Exception as e:
+                    logger.debug(f"Queue position callback failed: {str(e)}")
+                if ticket.moved.is_set() or ticket.granted.done():
+                    continue
+            moved = asyncio.ensure_future(ticket.moved.wait())
+            try:
+                await asyncio.wait({ticket.granted, moved}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                moved.cancel()
+
+    @asynccontextmanager
+    async def slot(self, user_id: int, priority: int = PRIORITY_INTERACTIVE,
+                   on_position: Optional[PositionCallback] = None):
+        ticket = _Ticket(user_id, priority)
+        self._waiting.setdefault(priority, OrderedDict()).setdefault(user_id, deque()).append(ticket)
+        self._notify()
+        self._dispatch()
+        if not ticket.granted.done():
+            logger.info(f"Scrape for user {user_id} queued (priority {priority}), "
+                        f"{self.position(ticket)} ahead, {self._running} running")
+        try:
+            await self._wait(ticket, on_position)
+        except BaseException:
+            if ticket.granted.done():
+                self._release(ticket)
+            else:
+                self._remove(ticket)
+            raise
+        try:
+            yield
+        finally:
+            self._release(ticket)
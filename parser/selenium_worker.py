@@ -0,0 +1,62 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+import config
+
+logger = logging.getLogger(__name__)
+
+SELENIUM_WORKERS = getattr(config, "SELENIUM_WORKERS", getattr(config, "BROWSER_POOL_SIZE", 2))
+SELENIUM_QUEUE_SIZE = getattr(config, "SELENIUM_QUEUE_SIZE", 20)
+
+T = TypeVar("T")
+
+
+class SeleniumQueueFull(Exception):
+    pass
+
+
+class SeleniumWorker:
+    """Выполняет синхронный Selenium-код в отдельных потоках, не блокируя цикл событий бота.
+
+    Потоков столько же, сколько драйверов в SeleniumDriverPool, поэтому каждый поток
+    берёт уже прогретый драйвер из пула. Очередь ожидающих задач ограничена
+    SELENIUM_QUEUE_SIZE: при переполнении run() сразу выбрасывает SeleniumQueueFull.
+    Задача считается в очереди, пока её поток не закончит работу: отмена ожидающей
+    корутины (дедлайн) не останавливает уже запущенный Selenium-код.
+    """
+
+    def __init__(self, workers: int = SELENIUM_WORKERS, queue_size: int = SELENIUM_QUEUE_SIZE):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="selenium")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        if self._pending >= self.workers + self.queue_size:
+            logger.warning(f"Selenium queue is full ({self._pending} tasks)")
+            raise SeleniumQueueFull("Selenium queue is full")
+        with self._lock:
+            self._pending += 1
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._task_done()
+            raise
+        # Вызывается из потока по завершении задачи или при отмене ещё не начатой
+        future.add_done_callback(self._task_done)
+        return await asyncio.wrap_future(future)
+
+    def _task_done(self, future: Future = None):
+        with self._lock:
+            self._pending -= 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
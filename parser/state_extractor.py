@@ -0,0 +1,179 @@
+"""Извлечение данных из JSON-состояний виджетов, которые Ozon встраивает в страницу.
+
+Каждый виджет сервер рендерит вместе с его состоянием:
+<div id="state-tileGridDesktop-3669724-default-1" data-state="{...}">.
+Регулярным выражением находим только нужные виджеты и декодируем их JSON,
+не строя DOM всей страницы (~870 КБ).
+"""
+import html as html_lib
+import json
+import logging
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STATE_RE = re.compile(r'<div\s+id="state-(?P<widget>[A-Za-z]\w*)-[^"]*"[^>]*?\sdata-state=(?P<quote>["\'])(?P<state>.*?)(?P=quote)', re.S)
+TAG_RE = re.compile(r'<[^>]+>')
+SKU_RE = re.compile(r'/product/[^/?]*?-(\d+)/?')
+
+SEARCH_WIDGETS = ("tileGridDesktop", "tileGrid", "searchResultsV2")
+PRODUCT_DESCRIPTION_WIDGETS = ("webDescription", "webProductDescription")
+PRODUCT_CHARACTERISTICS_WIDGETS = ("webCharacteristics", "webShortCharacteristics")
+BREADCRUMB_WIDGETS = ("breadCrumbs", "webBreadCrumbs")
+
+
+def _strip_tags(text: str) -> str:
+    # В тексте атомов встречаются и теги, и HTML-сущности (например, "&#x2F;")
+    return re.sub(r'\s+', ' ', html_lib.unescape(TAG_RE.sub(' ', text))).strip()
+
+
+def iter_widget_states(html: str, widgets: Iterable[str] = None) -> Iterator[Tuple[str, dict]]:
+    """Возвращает (имя виджета, состояние) для всех data-state на странице.
+
+    Если задан widgets, JSON декодируется только у виджетов с этими префиксами имени.
+    """
+    prefixes = tuple(widgets) if widgets else None
+    for match in STATE_RE.finditer(html):
+        widget = match.group("widget")
+        if prefixes and not widget.startswith(prefixes):
+            continue
+        raw = match.group("state")
+        if not raw or raw == "{}":
+            continue
+        try:
+            yield widget, json.loads(html_lib.unescape(raw))
+        except ValueError as e:
+            logger.debug(f"Failed to decode state of widget {widget}: {str(e)}")
+
+
+def product_sku(link: str) -> Optional[str]:
+    """ID товара Ozon из ссылки вида /product/boots-obba-1651226672/?at=..."""
+    match = SKU_RE.search(link or "")
+    return match.group(1) if match else None
+
+
+def _tile_to_card(tile: dict) -> Optional[Dict[str, str]]:
+    title = ""
+    description = ""
+    for atom in tile.get("mainState", []):
+        kind = atom.get("type")
+        if kind == "textAtom":
+            text_atom = atom.get("textAtom", {})
+            automation_id = text_atom.get("testInfo", {}).get("automatizationId")
+            if not title and (atom.get("id") == "name" or automation_id == "tile-name"):
+                title = _strip_tags(text_atom.get("text", ""))
+        elif not description and kind == "priceV2":
+            prices = atom.get("priceV2", {}).get("price", [])
+            if prices:
+                description = _strip_tags(prices[0].get("text", ""))
+        elif not description and kind == "labelList":
+            labels = atom.get("labelList", {}).get("items", [])
+            if labels:
+                description = _strip_tags(labels[0].get("title", ""))
+    link = tile.get("action", {}).get("link", "")
+    if not title and not link:
+        return None
+    return {
+        "sku": str(tile.get("sku") or product_sku(link) or ""),
+        "title": title,
+        "description": description,
+        "alt_text": "",
+        "link": link,
+    }
+
+
+def _collect_cards(states: Iterator[Tuple[str, dict]], limit: int = None) -> List[Dict[str, str]]:
+    cards = []
+    seen = set()
+    for _, state in states:
+        for tile in state.get("items", []):
+            card = _tile_to_card(tile)
+            if not card:
+                continue
+            key = card["sku"] or card["link"]
+            if key in seen:
+                continue
+            seen.add(key)
+            cards.append(card)
+            if limit and len(cards) >= limit:
+                return cards
+    return cards
+
+
+def extract_search_cards(html: str, limit: int = None) -> List[Dict[str, str]]:
+    """Карточки поиска в порядке выдачи: sku, title, description, alt_text, link."""
+    return _collect_cards(iter_widget_states(html, SEARCH_WIDGETS), limit)
+
+
+def extract_breadcrumbs(html: str) -> str:
+    for _, state in iter_widget_states(html, BREADCRUMB_WIDGETS):
+        crumbs = state.get("breadcrumbs") or state.get("items") or []
+        texts = [_strip_tags(c.get("text") or c.get("title") or "") for c in crumbs if isinstance(c, dict)]
+        texts = [t for t in texts if t]
+        if texts:
+            return " ".join(texts)
+    return ""
+
+
+def _walk_texts(node, keys: Tuple[str, ...]) -> Iterator[str]:
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key in keys and isinstance(value, str):
+                yield value
+            else:
+                yield from _walk_texts(value, keys)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk_texts(value, keys)
+
+
+def _walk_characteristics(node) -> Iterator[str]:
+    if isinstance(node, dict):
+        if "name" in node and isinstance(node.get("values"), list):
+            values = [_strip_tags(v.get("text", "")) for v in node["values"] if isinstance(v, dict)]
+            values = [v for v in values if v]
+            if values:
+                yield f"{_strip_tags(node['name'])}: {', '.join(values)}"
+            return
+        for value in node.values():
+            yield from _walk_characteristics(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk_characteristics(value)
+
+
+def _product_details(states: Iterator[Tuple[str, dict]]) -> Dict[str, object]:
+    description_parts = []
+    characteristics = []
+    for widget, state in states:
+        if widget.startswith(PRODUCT_CHARACTERISTICS_WIDGETS):
+            characteristics.extend(_walk_characteristics(state))
+        else:
+            for text in _walk_texts(state, ("richAnnotation", "annotation", "description", "text")):
+                text = _strip_tags(text)
+                if text and text not in description_parts:
+                    description_parts.append(text)
+    return {"description": " ".join(description_parts), "characteristics": characteristics}
+
+
+def extract_product_details(html: str) -> Dict[str, object]:
+    """Описание и характеристики товара: {"description": str, "characteristics": [str]}."""
+    return _product_details(iter_widget_states(html, PRODUCT_DESCRIPTION_WIDGETS + PRODUCT_CHARACTERISTICS_WIDGETS))
+
+
+def product_text(details: Dict[str, object]) -> str:
+    """Текст для анализа n-грамм: описание + характеристики."""
+    parts = [details.get("description") or ""] + list(details.get("characteristics") or [])
+    return " ".join(p for p in parts if p)
+
+
+def tile_grid_fragment(html: str) -> str:
+    """Фрагмент HTML от первой сетки карточек до последней карточки (для DOM-добора)."""
+    start = html.find('data-widget="tileGridDesktop"')
+    if start == -1:
+        return html
+    start = html.rfind('<', 0, start)
+    last_tile = html.rfind('tile-root')
+    end = html.find('data-widget="', last_tile)
+    return html[start:end if end != -1 else len(html)]
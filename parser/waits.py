@@ -0,0 +1,143 @@
+"""Ожидания по событиям страницы вместо фиксированных случайных пауз.
+
+Ждём конкретных условий: появился селектор, число карточек перестало расти,
+виджет описания заполнился текстом. Для вежливости к Ozon остаётся короткая
+случайная пауза (WAIT_JITTER_FLOOR + до WAIT_JITTER_SPREAD мс). Время каждого шага
+пишется в лог, чтобы было видно, сколько задержки уходит на антидетект.
+"""
+import asyncio
+import logging
+import random
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+import config
+
+logger = logging.getLogger(__name__)
+
+WAIT_JITTER_FLOOR = getattr(config, "WAIT_JITTER_FLOOR", 300)  # мс
+WAIT_JITTER_SPREAD = getattr(config, "WAIT_JITTER_SPREAD", 700)  # мс
+STABLE_COUNT_MS = getattr(config, "STABLE_COUNT_MS", 1000)  # сколько число карточек не должно меняться
+WAIT_POLL_MS = 250
+
+SEARCH_RESULTS_SELECTOR = ".tile-root, [data-widget='searchResultsV2'], [data-widget='catalogResults'], .tile-container, .qj6_24"
+TILE_SELECTOR = ".tile-root, [data-widget='searchResultsV2'] .tile-container, .qj6_24"
+DESCRIPTION_SELECTOR = "[data-widget='webCharacteristics'], .tsBody500Medium, .webDescription, .pdp-description-text, .pdp-details, .tsBodyM, .tsBodyL, [data-auto='description'], .product-description, .description-container, [data-widget='webProductDescription']"
+HYDRATED_DESCRIPTION_SELECTOR = "[data-widget='webDescription'], [data-widget='webCharacteristics'], [data-widget='webProductDescription']"
+SHOW_MORE_SELECTOR = "[data-auto='showMoreDescription'], .show-more, [data-state*='webShowMore']"
+
+_HYDRATED_JS = """
+([selector, minChars]) => {
+    return Array.from(document.querySelectorAll(selector))
+        .some(el => (el.innerText || '').trim().length >= minChars);
+}
+"""
+
+
+def jitter_seconds(floor_ms: float = WAIT_JITTER_FLOOR, spread_ms: float = WAIT_JITTER_SPREAD) -> float:
+    return (floor_ms + random.uniform(0, spread_ms)) / 1000
+
+
+class StepTimer:
+    """Время шагов загрузки одной страницы."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.steps: List[tuple] = []
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def step(self, label: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps.append((label, (time.perf_counter() - started) * 1000))
+
+    def totals(self) -> Dict[str, float]:
+        totals: Dict[str, float] = {}
+        for label, ms in self.steps:
+            totals[label] = totals.get(label, 0) + ms
+        return totals
+
+    def log(self):
+        total = (time.perf_counter() - self._started) * 1000
+        parts = ", ".join(f"{label}={ms:.0f}ms" for label, ms in self.totals().items())
+        logger.info(f"Timings for {self.name}: {parts}, total={total:.0f}ms")
+
+
+async def polite_pause(timer: StepTimer = None, floor_ms: float = WAIT_JITTER_FLOOR,
+                       spread_ms: float = WAIT_JITTER_SPREAD):
+    if timer:
+        with timer.step("jitter"):
+            await asyncio.sleep(jitter_seconds(floor_ms, spread_ms))
+    else:
+        await asyncio.sleep(jitter_seconds(floor_ms, spread_ms))
+
+
+async def wait_for_stable_count(page, selector: str = TILE_SELECTOR, stable_ms: float = STABLE_COUNT_MS,
+                                timeout_ms: float = 8000) -> int:
+    """Ждёт, пока число элементов перестанет расти (догрузка ленты после прокрутки)."""
+    deadline = time.perf_counter() + timeout_ms / 1000
+    last_count = -1
+    stable_since = time.perf_counter()
+    while time.perf_counter() < deadline:
+        count = await page.locator(selector).count()
+        now = time.perf_counter()
+        if count != last_count:
+            last_count = count
+            stable_since = now
+        elif (now - stable_since) * 1000 >= stable_ms:
+            break
+        await asyncio.sleep(WAIT_POLL_MS / 1000)
+    return last_count
+
+
+async def wait_for_hydrated(page, selector: str = HYDRATED_DESCRIPTION_SELECTOR, min_chars: int = 20,
+                            timeout_ms: float = 8000) -> bool:
+    """Ждёт, пока виджет описания заполнится текстом."""
+    try:
+        await page.wait_for_function(_HYDRATED_JS, arg=[selector, min_chars], timeout=timeout_ms)
+        return True
+    except Exception:
+        logger.debug(f"Description widget not hydrated within {timeout_ms} ms")
+        return False
+
+
+def polite_pause_sync(timer: StepTimer = None, floor_ms: float = WAIT_JITTER_FLOOR,
+                      spread_ms: float = WAIT_JITTER_SPREAD):
+    if timer:
+        with timer.step("jitter"):
+            time.sleep(jitter_seconds(floor_ms, spread_ms))
+    else:
+        time.sleep(jitter_seconds(floor_ms, spread_ms))
+
+
+def wait_for_stable_count_sync(driver, selector: str = TILE_SELECTOR, stable_ms: float = STABLE_COUNT_MS,
+                               timeout_ms: float = 8000) -> int:
+    deadline = time.perf_counter() + timeout_ms / 1000
+    last_count = -1
+    stable_since = time.perf_counter()
+    while time.perf_counter() < deadline:
+        count = driver.execute_script("return document.querySelectorAll(arguments[0]).length;", selector)
+        now = time.perf_counter()
+        if count != last_count:
+            last_count = count
+            stable_since = now
+        elif (now - stable_since) * 1000 >= stable_ms:
+            break
+        time.sleep(WAIT_POLL_MS / 1000)
+    return last_count
+
+
+def wait_for_hydrated_sync(driver, selector: str = HYDRATED_DESCRIPTION_SELECTOR, min_chars: int = 20,
+                           timeout_ms: float = 8000) -> bool:
+    script = "return (" + _HYDRATED_JS + ")(arguments[0]);"
+    deadline = time.perf_counter() + timeout_ms / 1000
+    while time.perf_counter() < deadline:
+        if driver.execute_script(script, [selector, min_chars]):
+            return True
+        time.sleep(WAIT_POLL_MS / 1000)
+    logger.debug(f"Description widget not hydrated within {timeout_ms} ms")
+    return False
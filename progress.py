@@ -0,0 +1,43 @@
+"""События хода анализа для статуса пользователю.
+
+OzonParser.parse_search и GPTProcessor.process_ngrams принимают on_progress и вызывают
+его на каждом этапе с ProgressEvent(stage, done, total). Обработчик бота превращает
+события в правки одного статусного сообщения (bot.live_message.ProgressReporter).
+Ошибка в обработчике события только пишется в лог и не прерывает анализ.
+"""
+import logging
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"  # done — место в очереди на парсинг
+SEARCH_STARTED = "search_started"
+SEARCH_LOADED = "search_loaded"  # total — карточек в выдаче
+PRODUCTS = "products"  # done из total страниц товаров (включая взятые из кэша)
+GPT_STARTED = "gpt_started"  # total — частей текста для GPT
+GPT_CHUNKS = "gpt_chunks"  # done из total частей обработано
+GPT_FILTER = "gpt_filter"  # фильтрация мусорных фраз
+FALLBACK = "fallback"  # GPT не помог, локальный анализ
+
+
+class ProgressEvent:
+    def __init__(self, stage: str, done: Optional[int] = None, total: Optional[int] = None):
+        self.stage = stage
+        self.done = done
+        self.total = total
+
+    def __repr__(self) -> str:
+        return f"ProgressEvent(stage={self.stage}, done={self.done}, total={self.total})"
+
+
+ProgressCallback = Callable[[ProgressEvent], Awaitable[None]]
+
+
+async def emit(on_progress: Optional[ProgressCallback], stage: str, done: Optional[int] = None,
+               total: Optional[int] = None):
+    if on_progress is None:
+        return
+    try:
+        await on_progress(ProgressEvent(stage, done, total))
+    except Exception as e:
+        logger.debug(f"Progress callback failed at {stage}: {str(e)}")
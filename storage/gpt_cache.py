@@ -0,0 +1,111 @@
+import hashlib
+import json
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+import config
+from storage.redis import AsyncRedisStorage, CACHE_SOFT_TTL, CACHE_HARD_TTL
+
+logger = logging.getLogger(__name__)
+
+GPT_CACHE_SOFT_TTL = getattr(config, "GPT_CACHE_SOFT_TTL", CACHE_SOFT_TTL)
+GPT_CACHE_HARD_TTL = getattr(config, "GPT_CACHE_HARD_TTL", CACHE_HARD_TTL)
+GPT_NEGATIVE_TTL = getattr(config, "GPT_NEGATIVE_TTL", 600)  # сколько не повторять неудачный запрос, сек
+# Цена за 1M токенов (вход, выход) в долларах
+GPT_PRICES = getattr(config, "GPT_PRICES", {
+    "gpt-3.5-turbo": (0.5, 1.5),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-4o": (2.5, 10.0),
+})
+
+TEXT_FIELDS = ('titles', 'descriptions', 'alt_texts', 'breadcrumbs', 'product_descriptions')
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", str(text).lower().replace("ё", "е")).strip()
+
+
+def canonical_input(query: str, data: Dict[str, List[str]], model: str, prompt_version: str) -> str:
+    """Вход GPT, не зависящий от порядка карточек, регистра, пробелов и повторов текстов."""
+    texts = sorted({_normalize(t) for field in TEXT_FIELDS for t in data.get(field, []) if t and _normalize(t)})
+    return json.dumps({"model": model, "prompt": prompt_version, "query": _normalize(query), "texts": texts},
+                      ensure_ascii=False, sort_keys=True)
+
+
+def request_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    price_in, price_out = GPT_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * price_in + completion_tokens * price_out) / 1_000_000
+
+
+class GPTResultCache:
+    """Кэш результатов GPT по содержимому входа.
+
+    Ключ — sha256 канонической формы (нормализованные, уникальные, отсортированные
+    тексты, запрос, модель и версия промптов). Рядом с результатом хранится его цена:
+    доллары по GPT_PRICES и секунды расчёта. Каждое попадание прибавляет их к
+    сэкономленному в stats:gpt_cache. Неудачные ответы попадают в отрицательный кэш
+    на GPT_NEGATIVE_TTL, чтобы один и тот же вход не отправлялся в GPT снова и снова.
+    """
+
+    STATS_NAME = "gpt_cache"
+
+    def __init__(self, redis: AsyncRedisStorage, soft_ttl: int = GPT_CACHE_SOFT_TTL,
+                 hard_ttl: int = GPT_CACHE_HARD_TTL, negative_ttl: int = GPT_NEGATIVE_TTL):
+        self.redis = redis
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self.negative_ttl = negative_ttl
+
+    @staticmethod
+    def key(query: str, data: Dict[str, List[str]], model: str, prompt_version: str) -> str:
+        digest = hashlib.sha256(canonical_input(query, data, model, prompt_version).encode()).hexdigest()
+        return f"gpt:{digest}"
+
+    async def _count(self, **fields: int):
+        try:
+            pipe = self.redis.client.pipeline(transaction=False)
+            for field, amount in fields.items():
+                if amount:
+                    pipe.hincrby(f"stats:{self.STATS_NAME}", field, amount)
+            await pipe.execute()
+        except Exception as e:
+            logger.debug(f"Failed to update GPT cache stats: {str(e)}")
+
+    async def get(self, key: str) -> Tuple[Optional[List[Dict[str, int]]], bool]:
+        """(результат, устарел ли он) или (None, False) при промахе."""
+        entry, stale = await self.redis.get_json_swr(key)
+        if not entry:
+            await self._count(miss=1)
+            return None, False
+        cost = entry.get("cost", {})
+        await self._count(**{"stale" if stale else "hit": 1,
+                             "saved_usd_micro": int(cost.get("usd", 0) * 1_000_000),
+                             "saved_ms": int(cost.get("seconds", 0) * 1000)})
+        return entry["result"], stale
+
+    async def set(self, key: str, result: List[Dict[str, int]], model: str, usage: Dict[str, int], seconds: float):
+        usd = request_cost(model, usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0))
+        cost = {"usd": usd, "seconds": seconds, "prompt_tokens": usage.get("prompt_tokens", 0),
+                "completion_tokens": usage.get("completion_tokens", 0)}
+        await self.redis.set_json_swr(key, {"result": result, "cost": cost}, self.soft_ttl, self.hard_ttl)
+        await self._count(stored=1, spent_usd_micro=int(usd * 1_000_000), spent_ms=int(seconds * 1000))
+
+    async def is_negative(self, key: str) -> bool:
+        reason = await self.redis.get_json(f"{key}:negative")
+        if reason:
+            await self._count(negative_hit=1)
+            logger.info(f"Negative GPT cache hit ({reason.get('reason')}): {key}")
+            return True
+        return False
+
+    async def set_negative(self, key: str, reason: str):
+        await self.redis.set_json(f"{key}:negative", {"reason": reason}, self.negative_ttl)
+        await self._count(negative_stored=1)
+
+    async def stats(self) -> dict:
+        stats = await self.redis.get_stats(self.STATS_NAME)
+        stats["saved_usd"] = stats.get("saved_usd_micro", 0) / 1_000_000
+        stats["spent_usd"] = stats.get("spent_usd_micro", 0) / 1_000_000
+        stats["saved_seconds"] = stats.get("saved_ms", 0) / 1000
+        return stats
@@ -0,0 +1,73 @@
+import logging
+import time
+from typing import Dict, List, Optional
+
+import config
+from storage.redis import AsyncRedisStorage
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_CACHE_TTL = getattr(config, "PRODUCT_CACHE_TTL", 7 * 86400)  # запись живёт неделю
+PRODUCT_REFRESH_AFTER = getattr(config, "PRODUCT_REFRESH_AFTER", 86400)  # после суток — кандидат на обновление
+PRODUCT_REFRESH_PER_QUERY = getattr(config, "PRODUCT_REFRESH_PER_QUERY", 3)
+
+
+class ProductCache:
+    """Кэш извлечённых данных товара по ID Ozon (не сырого HTML).
+
+    Запись свежая первые PRODUCT_REFRESH_AFTER секунд. Позже она ещё действительна до
+    PRODUCT_CACHE_TTL, но считается устаревшей: парсер обновляет не больше
+    PRODUCT_REFRESH_PER_QUERY таких товаров за запрос, а если обновить не удалось —
+    использует старую запись.
+    """
+
+    def __init__(self, redis: AsyncRedisStorage, ttl: int = PRODUCT_CACHE_TTL,
+                 refresh_after: int = PRODUCT_REFRESH_AFTER, refresh_per_query: int = PRODUCT_REFRESH_PER_QUERY):
+        self.redis = redis
+        self.ttl = ttl
+        self.refresh_after = refresh_after
+        self.refresh_per_query = refresh_per_query
+
+    @staticmethod
+    def key(sku: str) -> str:
+        return f"product:{sku}"
+
+    async def get_many(self, skus: List[Optional[str]]) -> List[Optional[dict]]:
+        keys = [self.key(sku) for sku in skus if sku]
+        found = dict(zip(keys, await self.redis.get_json_many(keys))) if keys else {}
+        return [found.get(self.key(sku)) if sku else None for sku in skus]
+
+    @staticmethod
+    def entry(sku: str, text: str, details: Dict[str, object] = None) -> dict:
+        details = details or {}
+        return {
+            "sku": sku,
+            "text": text,
+            "description": details.get("description", ""),
+            "characteristics": details.get("characteristics", []),
+            "fetched_at": time.time()
+        }
+
+    async def set(self, sku: str, text: str, details: Dict[str, object] = None):
+        await self.redis.set_json(self.key(sku), self.entry(sku, text, details), self.ttl)
+
+    async def set_many(self, entries: List[dict]):
+        """Сохраняет записи entry() одним конвейером."""
+        await self.redis.set_json_many({self.key(e["sku"]): e for e in entries}, self.ttl)
+
+    def is_stale(self, entry: dict) -> bool:
+        return time.time() - entry.get("fetched_at", 0) > self.refresh_after
+
+    def plan(self, skus: List[Optional[str]], entries: List[Optional[dict]]) -> List[int]:
+        """Индексы карточек, которые нужно загрузить: нет в кэше или устарели (с лимитом)."""
+        to_fetch = []
+        refreshes = 0
+        for i, (sku, entry) in enumerate(zip(skus, entries)):
+            if entry is None:
+                to_fetch.append(i)
+            elif self.is_stale(entry) and refreshes < self.refresh_per_query:
+                refreshes += 1
+                to_fetch.append(i)
+        hits = sum(1 for entry in entries if entry is not None)
+        logger.info(f"Product cache: {hits}/{len(skus)} cached, {len(to_fetch)} to fetch ({refreshes} refresh)")
+        return to_fetch
@@ -0,0 +1,182 @@
+"""Ограничение частоты запросов одним Lua-скриптом на стороне Redis.
+
+Проверка и учёт запроса выполняются атомарно за один round trip сразу для нескольких
+лимитов (пользовательского и глобального): запрос засчитывается, только если его
+пропускают все лимиты. Политики:
+- "fixed_window" — счётчик на окно floor(now / window) (как прежний check_request_limit,
+  но окна выровнены по времени, а не по первому запросу);
+- "sliding_log" — журнал времён запросов в sorted set, честное скользящее окно;
+- "token_bucket" — ведро на limit токенов, пополняется равномерно за window секунд.
+
+Время передаётся из Python (now), поэтому лимитер одинаково работает с Redis и fakeredis
+и проверяется без ожидания реального времени. Все ключи, с которыми работает скрипт,
+передаются в KEYS (у fixed_window — уже с номером окна), а общий hash tag {prefix}
+держит пользовательский и глобальный ключи в одном слоте, так что скрипт выполняется
+и в Redis Cluster.
+"""
+import logging
+import time
+import uuid
+from typing import List, Optional, Tuple
+
+import config
+from config import REQUEST_LIMIT, REQUEST_TTL
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_POLICY = getattr(config, "RATE_LIMIT_POLICY", "fixed_window")
+GLOBAL_REQUEST_LIMIT = getattr(config, "GLOBAL_REQUEST_LIMIT", 0)  # 0 — без глобального лимита
+GLOBAL_REQUEST_TTL = getattr(config, "GLOBAL_REQUEST_TTL", 60)
+
+# KEYS — ключи лимитов; ARGV: now_ms, затем пары limit, window_ms для каждого ключа, затем id запроса.
+# Ответ: {allowed, retry_after_ms, remaining, индекс сработавшего лимита (0 — ни один)}.
+# У fixed_window в KEYS счётчики текущих окон: <ключ>:floor(now_ms / window_ms).
+_FIXED_WINDOW = """
+local now = tonumber(ARGV[1])
+local remaining = -1
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[2 * i])
+    local window = tonumber(ARGV[2 * i + 1])
+    local count = tonumber(redis.call('GET', key) or '0')
+    if count >= limit then
+        return {0, (math.floor(now / window) + 1) * window - now, 0, i}
+    end
+    local left = limit - count - 1
+    if remaining < 0 or left < remaining then remaining = left end
+end
+for i, key in ipairs(KEYS) do
+    if redis.call('INCR', key) == 1 then
+        redis.call('PEXPIRE', key, tonumber(ARGV[2 * i + 1]))
+    end
+end
+return {1, 0, remaining, 0}
+"""
+
+_SLIDING_LOG = """
+local now = tonumber(ARGV[1])
+local member = ARGV[2 * #KEYS + 2]
+local remaining = -1
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[2 * i])
+    local window = tonumber(ARGV[2 * i + 1])
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+    local count = redis.call('ZCARD', key)
+    if count >= limit then
+        local oldest = redis.call('ZRANGE', key, count - limit, count - limit, 'WITHSCORES')
+        return {0, math.max(0, tonumber(oldest[2]) + window - now), 0, i}
+    end
+    local left = limit - count - 1
+    if remaining < 0 or left < remaining then remaining = left end
+end
+for i, key in ipairs(KEYS) do
+    redis.call('ZADD', key, now, member)
+    redis.call('PEXPIRE', key, tonumber(ARGV[2 * i + 1]))
+end
+return {1, 0, remaining, 0}
+"""
+
+_TOKEN_BUCKET = """
+local now = tonumber(ARGV[1])
+local remaining = -1
+local levels = {}
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[2 * i])
+    local window = tonumber(ARGV[2 * i + 1])
+    local rate = limit / window
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or limit
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(limit, tokens + math.max(0, now - ts) * rate)
+    if tokens < 1 then
+        return {0, math.ceil((1 - tokens) / rate), 0, i}
+    end
+    levels[i] = tokens
+    local left = math.floor(tokens - 1)
+    if remaining < 0 or left < remaining then remaining = left end
+end
+for i, key in ipairs(KEYS) do
+    redis.call('HSET', key, 'tokens', tostring(levels[i] - 1), 'ts', now)
+    redis.call('PEXPIRE', key, tonumber(ARGV[2 * i + 1]))
+end
+return {1, 0, remaining, 0}
+"""
+
+SCRIPTS = {
+    "fixed_window": _FIXED_WINDOW,
+    "sliding_log": _SLIDING_LOG,
+    "token_bucket": _TOKEN_BUCKET,
+}
+
+
+class RateLimitResult:
+    def __init__(self, allowed: bool, retry_after: float = 0.0, remaining: int = 0, scope: Optional[str] = None,
+                 limit: int = 0, window: float = 0.0):
+        self.allowed = allowed
+        self.retry_after = retry_after  # секунд до следующей попытки
+        self.remaining = remaining
+        self.scope = scope  # "user" или "global" — какой лимит сработал
+        self.limit = limit  # запросов за window секунд у сработавшего лимита
+        self.window = window
+
+    def __bool__(self) -> bool:
+        return self.allowed
+
+    def __repr__(self) -> str:
+        return (f"RateLimitResult(allowed={self.allowed}, retry_after={self.retry_after:.1f}, "
+                f"remaining={self.remaining}, scope={self.scope})")
+
+
+class RateLimiter:
+    """Пользовательский и (необязательно) глобальный лимит запросов к парсеру.
+
+    client — redis.Redis, redis.asyncio.Redis или их аналог из fakeredis: для первого
+    вызывается acquire_sync(), для асинхронного — acquire().
+    """
+
+    def __init__(self, client, policy: str = RATE_LIMIT_POLICY, limit: int = REQUEST_LIMIT,
+                 window: float = REQUEST_TTL, global_limit: int = GLOBAL_REQUEST_LIMIT,
+                 global_window: float = GLOBAL_REQUEST_TTL, prefix: str = "ratelimit"):
+        if policy not in SCRIPTS:
+            raise ValueError(f"Unknown rate limit policy: {policy}")
+        self.policy = policy
+        self.limit = limit
+        self.window = window
+        self.global_limit = global_limit
+        self.global_window = global_window
+        self.prefix = prefix
+        self._script = client.register_script(SCRIPTS[policy])
+
+    def _limits(self, user_id: int) -> List[Tuple[str, str, int, float]]:
+        base = f"{{{self.prefix}}}:{self.policy}"
+        limits = [("user", f"{base}:user:{user_id}", self.limit, self.window)]
+        if self.global_limit:
+            limits.append(("global", f"{base}:global", self.global_limit, self.global_window))
+        return limits
+
+    def _call_args(self, user_id: int, now: float = None):
+        limits = self._limits(user_id)
+        now_ms = int((time.time() if now is None else now) * 1000)
+        args = [now_ms]
+        keys = []
+        for _, key, limit, window in limits:
+            window_ms = int(window * 1000)
+            args += [limit, window_ms]
+            keys.append(f"{key}:{now_ms // window_ms}" if self.policy == "fixed_window" else key)
+        args.append(uuid.uuid4().hex)
+        return limits, keys, args
+
+    @staticmethod
+    def _result(limits, raw) -> RateLimitResult:
+        allowed, retry_ms, remaining, index = (int(v) for v in raw)
+        if not index:
+            return RateLimitResult(bool(allowed), retry_ms / 1000, remaining)
+        scope, _, limit, window = limits[index - 1]
+        return RateLimitResult(bool(allowed), retry_ms / 1000, remaining, scope, limit, window)
+
+    async def acquire(self, user_id: int, now: float = None) -> RateLimitResult:
+        limits, keys, args = self._call_args(user_id, now)
+        return self._result(limits, await self._script(keys=keys, args=args))
+
+    def acquire_sync(self, user_id: int, now: float = None) -> RateLimitResult:
+        limits, keys, args = self._call_args(user_id, now)
+        return self._result(limits, self._script(keys=keys, args=args))
@@ -1,8 +1,12 @@
 import redis
+import redis.asyncio as aioredis
 import json
 import logging
-from config import CACHE_TTL, REQUEST_LIMIT, REQUEST_TTL, DEBUG_MODE
-from typing import List, Optional
+import time
+import config
+from config import CACHE_TTL, DEBUG_MODE
+from storage.rate_limit import RateLimiter, RateLimitResult
+from typing import Dict, List, Optional, Tuple
 
 # Настройка логирования
 logging.basicConfig(
@@ -15,40 +19,110 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Stale-while-revalidate: до мягкого TTL запись свежая, до жёсткого — отдаётся как устаревшая
+SWR_ENABLED = getattr(config, "SWR_ENABLED", True)
+CACHE_SOFT_TTL = getattr(config, "CACHE_SOFT_TTL", CACHE_TTL)
+CACHE_HARD_TTL = getattr(config, "CACHE_HARD_TTL", 3 * CACHE_TTL)
+REDIS_POOL_SIZE = getattr(config, "REDIS_POOL_SIZE", 20)
+
+
+def _pack_swr(data, soft_ttl: int, hard_ttl: int) -> Tuple[str, int]:
+    """JSON записи с меткой времени и TTL, с которым её нужно сохранить."""
+    envelope = {"__swr__": 1, "data": data, "stored_at": time.time(), "soft_ttl": soft_ttl}
+    return json.dumps(envelope), max(soft_ttl, hard_ttl if SWR_ENABLED else soft_ttl)
+
+
+def _unpack_swr(raw: Optional[str]) -> Tuple[Optional[dict], bool]:
+    if not raw:
+        return None, False
+    envelope = json.loads(raw)
+    if not isinstance(envelope, dict) or "__swr__" not in envelope:
+        # Запись старого формата без метки времени
+        return envelope, False
+    stale = time.time() - envelope["stored_at"] > envelope["soft_ttl"]
+    if stale and not SWR_ENABLED:
+        return None, False
+    return envelope["data"], stale
+
+
+def _log_limit(result: RateLimitResult, user_id: int) -> RateLimitResult:
+    if result.allowed:
+        logger.info(f"Request allowed for user {user_id}, {result.remaining} left")
+    else:
+        logger.warning(f"User {user_id} hit {result.scope} request limit, retry after {result.retry_after:.0f}s")
+    return result
+
+
 class RedisStorage:
+    """Синхронный клиент: для скриптов и кода, который выполняется вне цикла событий."""
+
     def __init__(self, host="localhost", port=6379, db=0):
         self.client = redis.Redis(host=host, port=port, db=db, decode_responses=True)
+        self.rate_limiter = RateLimiter(self.client)
 
     def check_request_limit(self, user_id: int) -> bool:
+        return self.acquire_request(user_id).allowed
+
+    def acquire_request(self, user_id: int) -> RateLimitResult:
+        """Учитывает запрос пользователя; результат содержит retry_after, если лимит исчерпан."""
         logger.info(f"Checking request limit for user {user_id}, DEBUG_MODE={DEBUG_MODE}")
         if DEBUG_MODE:
             logger.debug(f"Debug mode enabled, skipping request limit for user {user_id}")
-            return True
-        key = f"user:{user_id}:requests"
-        count = self.client.get(key)
-        logger.debug(f"Request count for user {user_id}: {count}")
-        if count is None:
-            self.client.setex(key, REQUEST_TTL, 1)
-            logger.info(f"Set initial request count for user {user_id}")
-            return True
-        if int(count) >= REQUEST_LIMIT:
-            logger.warning(f"User {user_id} exceeded request limit")
-            return False
-        self.client.incr(key)
-        logger.info(f"Incremented request count for user {user_id}")
-        return True
-
-    def set_cache(self, user_id: int, key: str, data: dict):
+            return RateLimitResult(True)
+        return _log_limit(self.rate_limiter.acquire_sync(user_id), user_id)
+
+    def set_cache(self, user_id: int, key: str, data: dict, soft_ttl: int = CACHE_SOFT_TTL,
+                  hard_ttl: int = CACHE_HARD_TTL):
         cache_key = f"cache:{user_id}:{key}"
-        self.client.setex(cache_key, CACHE_TTL, json.dumps(data))
+        self.set_json_swr(cache_key, data, soft_ttl, hard_ttl)
         logger.debug(f"Cached data for user {user_id}, key: {key}")
 
     def get_cache(self, user_id: int, key: str) -> Optional[dict]:
+        """Только свежие данные (моложе мягкого TTL)."""
+        data, stale = self.get_cache_swr(user_id, key)
+        return None if stale else data
+
+    def get_cache_swr(self, user_id: int, key: str) -> Tuple[Optional[dict], bool]:
+        """(данные, устарели ли они). Устаревшие данные отдаются только при SWR_ENABLED."""
         cache_key = f"cache:{user_id}:{key}"
-        data = self.client.get(cache_key)
-        logger.debug(f"Cache lookup for user {user_id}, key: {key}, found: {bool(data)}")
+        data, stale = self.get_json_swr(cache_key)
+        logger.debug(f"Cache lookup for user {user_id}, key: {key}, found: {bool(data)}, stale: {stale}")
+        return data, stale
+
+    def set_json_swr(self, key: str, data, soft_ttl: int = CACHE_SOFT_TTL, hard_ttl: int = CACHE_HARD_TTL):
+        raw, ttl = _pack_swr(data, soft_ttl, hard_ttl)
+        self.client.setex(key, ttl, raw)
+
+    def get_json_swr(self, key: str) -> Tuple[Optional[dict], bool]:
+        return _unpack_swr(self.client.get(key))
+
+    def set_json(self, key: str, data, ttl: int = CACHE_TTL):
+        self.client.setex(key, ttl, json.dumps(data))
+
+    def get_json(self, key: str):
+        data = self.client.get(key)
         return json.loads(data) if data else None
 
+    def get_json_many(self, keys: List[str]) -> list:
+        """Несколько JSON-записей за один MGET."""
+        if not keys:
+            return []
+        return [json.loads(data) if data else None for data in self.client.mget(keys)]
+
+    def set_json_many(self, items: Dict[str, object], ttl: int = CACHE_TTL):
+        """Несколько записей одним конвейером (pipeline)."""
+        pipe = self.client.pipeline(transaction=False)
+        for key, data in items.items():
+            pipe.setex(key, ttl, json.dumps(data))
+        pipe.execute()
+
+    def incr_stat(self, name: str, field: str, amount: int = 1):
+        """Счётчики для статистики кэшей: HINCRBY stats:{name} {field}."""
+        self.client.hincrby(f"stats:{name}", field, amount)
+
+    def get_stats(self, name: str) -> dict:
+        return {k: int(v) for k, v in self.client.hgetall(f"stats:{name}").items()}
+
     def add_stopword(self, word: str, user_id: int = None):
         word = word.lower().strip()
         self.client.sadd("global_stopwords", word)
@@ -60,7 +134,116 @@ class RedisStorage:
         word = word.lower().strip()
         return self.client.sismember("global_stopwords", word)
 
+    def is_stopword_many(self, words: List[str]) -> List[bool]:
+        """Проверка списка слов одним SMISMEMBER."""
+        if not words:
+            return []
+        return [bool(v) for v in self.client.smismember("global_stopwords", [w.lower().strip() for w in words])]
+
     def get_stopwords(self, user_id: int = None) -> List[str]:
         if user_id:
             return list(self.client.smembers(f"user:{user_id}:stopwords"))
-        return list(self.client.smembers("global_stopwords"))
\ No newline at end of file
+        return list(self.client.smembers("global_stopwords"))
+
+
+class AsyncRedisStorage:
+    """Асинхронный вариант RedisStorage на redis.asyncio для кода в цикле событий бота.
+
+    Все экземпляры с одинаковыми host/port/db используют общий пул соединений.
+    API совпадает с RedisStorage, но методы — корутины.
+    """
+
+    _pools: Dict[tuple, aioredis.ConnectionPool] = {}
+
+    def __init__(self, host="localhost", port=6379, db=0, pool_size: int = REDIS_POOL_SIZE):
+        pool_key = (host, port, db)
+        if pool_key not in self._pools:
+            self._pools[pool_key] = aioredis.ConnectionPool(
+                host=host, port=port, db=db, max_connections=pool_size, decode_responses=True
+            )
+        self.client = aioredis.Redis(connection_pool=self._pools[pool_key])
+        self.rate_limiter = RateLimiter(self.client)
+
+    async def check_request_limit(self, user_id: int) -> bool:
+        return (await self.acquire_request(user_id)).allowed
+
+    async def acquire_request(self, user_id: int) -> RateLimitResult:
+        logger.info(f"Checking request limit for user {user_id}, DEBUG_MODE={DEBUG_MODE}")
+        if DEBUG_MODE:
+            logger.debug(f"Debug mode enabled, skipping request limit for user {user_id}")
+            return RateLimitResult(True)
+        return _log_limit(await self.rate_limiter.acquire(user_id), user_id)
+
+    async def set_cache(self, user_id: int, key: str, data: dict, soft_ttl: int = CACHE_SOFT_TTL,
+                        hard_ttl: int = CACHE_HARD_TTL):
+        await self.set_json_swr(f"cache:{user_id}:{key}", data, soft_ttl, hard_ttl)
+        logger.debug(f"Cached data for user {user_id}, key: {key}")
+
+    async def get_cache(self, user_id: int, key: str) -> Optional[dict]:
+        data, stale = await self.get_cache_swr(user_id, key)
+        return None if stale else data
+
+    async def get_cache_swr(self, user_id: int, key: str) -> Tuple[Optional[dict], bool]:
+        return await self.get_json_swr(f"cache:{user_id}:{key}")
+
+    async def set_json_swr(self, key: str, data, soft_ttl: int = CACHE_SOFT_TTL, hard_ttl: int = CACHE_HARD_TTL):
+        raw, ttl = _pack_swr(data, soft_ttl, hard_ttl)
+        await self.client.setex(key, ttl, raw)
+
+    async def get_json_swr(self, key: str) -> Tuple[Optional[dict], bool]:
+        return _unpack_swr(await self.client.get(key))
+
+    async def set_json(self, key: str, data, ttl: int = CACHE_TTL):
+        await self.client.setex(key, ttl, json.dumps(data))
+
+    async def get_json(self, key: str):
+        data = await self.client.get(key)
+        return json.loads(data) if data else None
+
+    async def get_json_many(self, keys: List[str]) -> list:
+        if not keys:
+            return []
+        return [json.loads(data) if data else None for data in await self.client.mget(keys)]
+
+    async def set_json_many(self, items: Dict[str, object], ttl: int = CACHE_TTL):
+        if not items:
+            return
+        pipe = self.client.pipeline(transaction=False)
+        for key, data in items.items():
+            pipe.setex(key, ttl, json.dumps(data))
+        await pipe.execute()
+
+    async def incr_stat(self, name: str, field: str, amount: int = 1):
+        await self.client.hincrby(f"stats:{name}", field, amount)
+
+    async def get_stats(self, name: str) -> dict:
+        return {k: int(v) for k, v in (await self.client.hgetall(f"stats:{name}")).items()}
+
+    async def add_stopword(self, word: str, user_id: int = None):
+        word = word.lower().strip()
+        pipe = self.client.pipeline(transaction=False)
+        pipe.sadd("global_stopwords", word)
+        if user_id:
+            pipe.sadd(f"user:{user_id}:stopwords", word)
+        await pipe.execute()
+        logger.info(f"Added stopword to Redis: {word} (user_id={user_id})")
+
+    async def is_stopword(self, word: str) -> bool:
+        return bool(await self.client.sismember("global_stopwords", word.lower().strip()))
+
+    async def is_stopword_many(self, words: List[str]) -> List[bool]:
+        if not words:
+            return []
+        flags = await self.client.smismember("global_stopwords", [w.lower().strip() for w in words])
+        return [bool(v) for v in flags]
+
+    async def get_stopwords(self, user_id: int = None) -> List[str]:
+        if user_id:
+            return list(await self.client.smembers(f"user:{user_id}:stopwords"))
+        return list(await self.client.smembers("global_stopwords"))
+
+    @classmethod
+    async def close_pools(cls):
+        for pool in cls._pools.values():
+            await pool.disconnect()
+        cls._pools.clear()
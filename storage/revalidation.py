@@ -0,0 +1,55 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict
+
+import config
+
+logger = logging.getLogger(__name__)
+
+SWR_MAX_REFRESHES = getattr(config, "SWR_MAX_REFRESHES", 2)
+
+
+class Revalidator:
+    """Фоновое обновление устаревших записей кэша.
+
+    Одна задача на ключ; одновременно выполняется не больше max_concurrent обновлений,
+    лишние запросы на обновление отбрасываются (запись обновит следующий промах).
+    """
+
+    def __init__(self, max_concurrent: int = SWR_MAX_REFRESHES):
+        self.max_concurrent = max_concurrent
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    @property
+    def running(self) -> int:
+        return len(self._tasks)
+
+    def schedule(self, key: str, refresh: Callable[[], Awaitable[object]]) -> bool:
+        if key in self._tasks:
+            return False
+        if len(self._tasks) >= self.max_concurrent:
+            logger.info(f"Refresh limit reached ({self.max_concurrent}), skipping refresh of {key}")
+            return False
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            logger.debug(f"No running event loop, skipping refresh of {key}")
+            return False
+        task = loop.create_task(self._run(key, refresh))
+        self._tasks[key] = task
+        return True
+
+    async def _run(self, key: str, refresh: Callable[[], Awaitable[object]]):
+        try:
+            await refresh()
+            logger.info(f"Background refresh completed for {key}")
+        except Exception as e:
+            logger.error(f"Background refresh failed for {key}: {str(e)}")
+        finally:
+            self._tasks.pop(key, None)
+
+    async def close(self):
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
@@ -0,0 +1,151 @@
+import asyncio
+import hashlib
+import logging
+import re
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from storage.redis import AsyncRedisStorage, CACHE_SOFT_TTL, CACHE_HARD_TTL
+from storage.revalidation import Revalidator
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('logs/bot.log', encoding='utf-8'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+_morph = None
+
+
+def _lemmatize(token: str) -> str:
+    global _morph
+    if _morph is None:
+        import pymorphy3
+        _morph = pymorphy3.MorphAnalyzer()
+    return _morph.parse(token)[0].normal_form
+
+
+def normalize_query(query: str) -> str:
+    """Нормальная форма запроса: регистр, ё, пунктуация, пробелы, леммы и порядок слов.
+
+    "Чехол  iPhone", "чехлы iphone" и "iphone чехол" дают один и тот же ключ.
+    """
+    text = query.lower().replace("ё", "е")
+    tokens = re.findall(r"\w+", text)
+    return " ".join(sorted(_lemmatize(token) for token in tokens))
+
+
+class _LeaderCancelled(Exception):
+    """Парсинг, к которому присоединились ожидающие, отменён у его владельца."""
+
+
+class SearchResultCache:
+    """Общий для всех пользователей кэш результатов парсинга по нормализованному запросу.
+
+    Одинаковые запросы, пришедшие одновременно, объединяются: парсинг запускается
+    один раз, остальные вызовы ждут его результат. Если вызов, запустивший парсинг,
+    отменён (дедлайн, отмена задачи), ожидающие не отменяются вместе с ним: один из
+    них запускает парсинг заново, остальные присоединяются к нему. Запись старше
+    soft_ttl (но моложе hard_ttl) отдаётся сразу с пометкой "stale", а парсинг
+    перезапускается в фоне.
+    Счётчики hit/stale/miss/coalesced пишутся в Redis (stats:search_cache) и доступны
+    через stats().
+    """
+
+    STATS_NAME = "search_cache"
+
+    def __init__(self, redis: AsyncRedisStorage, soft_ttl: int = CACHE_SOFT_TTL, hard_ttl: int = CACHE_HARD_TTL,
+                 revalidator: Revalidator = None):
+        self.redis = redis
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self.revalidator = revalidator or Revalidator()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.counters = {"hit": 0, "stale": 0, "miss": 0, "coalesced": 0}
+
+    def key(self, query: str) -> str:
+        normalized = normalize_query(query)
+        return f"search:{hashlib.md5(normalized.encode()).hexdigest()}"
+
+    async def _count(self, field: str):
+        self.counters[field] += 1
+        try:
+            await self.redis.incr_stat(self.STATS_NAME, field)
+        except Exception as e:
+            logger.debug(f"Failed to update cache stats: {str(e)}")
+
+    async def get(self, query: str) -> Optional[dict]:
+        data, _ = await self.redis.get_json_swr(self.key(query))
+        return data
+
+    async def set(self, query: str, data: dict):
+        await self.redis.set_json_swr(self.key(query), data, self.soft_ttl, self.hard_ttl)
+
+    async def get_or_fetch(self, query: str, fetch: Callable[[str], Awaitable[Tuple[dict, bool]]],
+                           refresh: Callable[[str], Awaitable[Tuple[dict, bool]]] = None) -> dict:
+        """Результат из кэша или от fetch(query) -> (данные, можно ли кэшировать).
+
+        Устаревшая запись обновляется в фоне через refresh (по умолчанию — тот же fetch).
+        """
+        key = self.key(query)
+        while True:
+            cached, stale = await self.redis.get_json_swr(key)
+            if cached and not stale:
+                await self._count("hit")
+                logger.info(f"Search cache hit for query: {query}")
+                return cached
+            if cached:
+                await self._count("stale")
+                logger.info(f"Serving stale search result for query: {query}")
+                if key not in self._inflight:
+                    self.revalidator.schedule(key, lambda: self._fetch(key, query, refresh or fetch))
+                return {**cached, "stale": True}
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                await self._count("miss")
+                return await self._fetch(key, query, fetch)
+            await self._count("coalesced")
+            logger.info(f"Joining in-flight scrape for query: {query}")
+            try:
+                return await asyncio.shield(inflight)
+            except _LeaderCancelled:
+                logger.info(f"In-flight scrape cancelled by its owner, retrying query: {query}")
+
+    async def _fetch(self, key: str, query: str,
+                     fetch: Callable[[str], Awaitable[Tuple[dict, bool]]]) -> dict:
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            data, cacheable = await fetch(query)
+            if cacheable:
+                await self.redis.set_json_swr(key, data, self.soft_ttl, self.hard_ttl)
+            future.set_result(data)
+            return data
+        except asyncio.CancelledError:
+            # Отмена касается только этого вызова: ожидающие повторят запрос сами
+            self._reject(future, _LeaderCancelled())
+            raise
+        except Exception as e:
+            self._reject(future, e)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    @staticmethod
+    def _reject(future: asyncio.Future, error: BaseException):
+        if future.done():
+            return
+        future.set_exception(error)
+        # Ожидающих может не быть — помечаем исключение как полученное
+        future.exception()
+
+    async def stats(self) -> dict:
+        try:
+            return await self.redis.get_stats(self.STATS_NAME)
+        except Exception:
+            return dict(self.counters)
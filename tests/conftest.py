@@ -0,0 +1,25 @@
+import os
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.makedirs(os.path.join(ROOT, "logs"), exist_ok=True)
+
+try:
+    import config  # noqa: F401
+except ImportError:
+    # config.py с токенами не хранится в репозитории; для тестов хватает обязательных настроек,
+    # остальные модули читают через getattr со значениями по умолчанию
+    config = types.ModuleType("config")
+    config.BOT_TOKEN = "0:test"
+    config.OPENAI_API_KEY = "sk-test"
+    config.OZON_SEARCH_URL = "https://www.ozon.ru/search/"
+    config.MAX_CARDS = 20
+    config.CACHE_TTL = 86400
+    config.REQUEST_LIMIT = 5
+    config.REQUEST_TTL = 3600
+    config.PARSER_MODE = "playwright"
+    config.DEBUG_MODE = False
+    config.AUTO_FLUSH_REDIS = False
+    sys.modules["config"] = config
@@ -0,0 +1,66 @@
+import asyncio
+
+from parser.fanout import HostThrottle, fetch_ordered
+
+URLS = [f"https://www.ozon.ru/product/{i}/" for i in range(4)]
+
+
+def test_results_keep_order_and_failures_become_none():
+    async def scenario():
+        progress = []
+
+        async def fetch(url):
+            index = URLS.index(url)
+            await asyncio.sleep(0.01 * (4 - index))
+            if index == 2:
+                raise RuntimeError("boom")
+            return index
+
+        async def on_done(finished, total):
+            progress.append((finished, total))
+
+        results = await fetch_ordered(URLS, fetch, concurrency=4, throttle=HostThrottle(0), on_done=on_done)
+        assert results == [0, 1, None, 3]
+        assert progress == [(1, 4), (2, 4), (3, 4), (4, 4)]
+    asyncio.run(scenario())
+
+
+def test_deadline_cancels_slow_pages():
+    async def scenario():
+        cancelled = []
+
+        async def fetch(url):
+            try:
+                await asyncio.sleep(0.01 if url == URLS[0] else 10)
+            except asyncio.CancelledError:
+                cancelled.append(url)
+                raise
+            return url
+
+        results = await fetch_ordered(URLS, fetch, concurrency=4, throttle=HostThrottle(0), deadline=0.1)
+        assert results == [URLS[0], None, None, None]
+        assert sorted(cancelled) == URLS[1:]
+    asyncio.run(scenario())
+
+
+def test_cancelling_caller_cancels_page_tasks():
+    async def scenario():
+        started, cancelled = [], []
+
+        async def fetch(url):
+            started.append(url)
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(url)
+                raise
+
+        caller = asyncio.create_task(fetch_ordered(URLS, fetch, concurrency=2, throttle=HostThrottle(0)))
+        await asyncio.sleep(0.05)
+        caller.cancel()
+        await asyncio.gather(caller, return_exceptions=True)
+        assert caller.cancelled()
+        # Запущенные загрузки отменены к моменту выхода, а не брошены висеть
+        assert sorted(cancelled) == sorted(started) == URLS[:2]
+        assert not [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    asyncio.run(scenario())
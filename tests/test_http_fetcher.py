@@ -0,0 +1,59 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from aiohttp import web
+
+from parser.http_fetcher import HttpFetcher
+
+PAGE = "<html><body><div data-widget='searchResultsV2'>чехол</div></body></html>"
+
+
+def make_app() -> web.Application:
+    async def handler(request: web.Request) -> web.Response:
+        name = request.match_info["name"]
+        if name == "ok":
+            return web.Response(text=PAGE, content_type="text/html")
+        if name == "antibot":
+            return web.Response(text="<h1>Доступ ограничен</h1>", content_type="text/html")
+        if name == "bad-bytes":
+            return web.Response(body=b"\xff\xfe\xfa", headers={"Content-Type": "text/html; charset=utf-8"})
+        return web.Response(status=int(name), text="<h1>Доступ ограничен</h1>", content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/{name}", handler)
+    return app
+
+
+@asynccontextmanager
+async def ozon_stub():
+    runner = web.AppRunner(make_app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    fetcher = HttpFetcher({"User-Agent": "test"}, [], proxies=None)
+    try:
+        yield fetcher, f"http://127.0.0.1:{runner.addresses[0][1]}"
+    finally:
+        await fetcher.close()
+        await runner.cleanup()
+
+
+def test_fetch_outcomes():
+    async def scenario():
+        async with ozon_stub() as (fetcher, base):
+            assert await fetcher.fetch(f"{base}/ok") == (PAGE, False)
+            # Браузер нужен только против антибота
+            assert await fetcher.fetch(f"{base}/antibot") == (None, True)
+            assert await fetcher.fetch(f"{base}/403") == (None, True)
+            assert await fetcher.fetch(f"{base}/429") == (None, True)
+            assert await fetcher.fetch(f"{base}/404") == (None, False)
+            assert await fetcher.fetch(f"{base}/503") == (None, False)
+            assert await fetcher.fetch("http://127.0.0.1:1/ok") == (None, False)
+    asyncio.run(scenario())
+
+
+def test_decode_errors_are_caught():
+    async def scenario():
+        async with ozon_stub() as (fetcher, base):
+            assert await fetcher.fetch(f"{base}/bad-bytes") == (None, False)
+    asyncio.run(scenario())
@@ -0,0 +1,60 @@
+import asyncio
+import types
+
+from parser.interception import RequestFilter, TrafficMeter
+
+
+class FakeContext:
+    async def route(self, pattern, handler):
+        self.handler = handler
+
+
+class FakeRoute:
+    def __init__(self, url: str, resource_type: str):
+        self.request = types.SimpleNamespace(url=url, resource_type=resource_type)
+        self.aborted = False
+
+    async def abort(self):
+        self.aborted = True
+
+    async def continue_(self):
+        pass
+
+
+class FakePage:
+    def on(self, event, handler):
+        pass
+
+    def remove_listener(self, event, handler):
+        pass
+
+
+def test_should_block():
+    request_filter = RequestFilter(blocked_types=["image"])
+    assert request_filter.should_block("https://www.ozon.ru/a.jpg", "image")
+    assert request_filter.should_block("https://mc.yandex.ru/watch", "script")
+    assert request_filter.should_block("https://cdn.example.com/x.js", "script")
+    assert not request_filter.should_block("https://cdn.example.com/redirect", "document")
+    assert not request_filter.should_block("https://st.ozone.ru/app.js", "script")
+
+
+def test_blocked_requests_are_counted_per_context():
+    async def scenario():
+        request_filter = RequestFilter(blocked_types=["image"])
+        contexts = [FakeContext(), FakeContext()]
+        counters = [await request_filter.install(context) for context in contexts]
+        meters = [TrafficMeter(FakePage(), counter) for counter in counters]
+        for meter in meters:
+            meter.start()
+
+        # Две страницы загружаются одновременно, каждая видит только свои блокировки
+        routes = [FakeRoute("https://www.ozon.ru/a.jpg", "image") for _ in range(3)]
+        await contexts[0].handler(routes[0])
+        await contexts[1].handler(routes[1])
+        await contexts[1].handler(routes[2])
+        await contexts[0].handler(FakeRoute("https://www.ozon.ru/search", "document"))
+
+        assert all(route.aborted for route in routes)
+        assert [meter.stop()["blocked"] for meter in meters] == [1, 2]
+        assert request_filter.blocked == 3
+    asyncio.run(scenario())
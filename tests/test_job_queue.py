@@ -0,0 +1,355 @@
+import asyncio
+import types
+
+import fakeredis
+
+from jobs.queue import JobQueue, JobProgress, QUEUED, RUNNING, DONE, FAILED, CANCELLED
+from progress import ProgressEvent, GPT_CHUNKS
+
+T0 = 1_000_000.0
+
+
+def make_queue(**kwargs) -> JobQueue:
+    redis = types.SimpleNamespace(client=fakeredis.FakeAsyncRedis(decode_responses=True))
+    kwargs.setdefault("timeout", 10)
+    kwargs.setdefault("max_attempts", 2)
+    kwargs.setdefault("retry_backoff", 5)
+    kwargs.setdefault("lease_grace", 1)
+    return JobQueue(redis, **kwargs)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_enqueue_and_claim_in_fifo_order():
+    async def scenario():
+        queue = make_queue()
+        first = await queue.enqueue("analysis", {"query": "платье"}, user_id=1, chat_id=10, now=T0)
+        second = await queue.enqueue("analysis", {"query": "куртка"}, user_id=2, now=T0)
+
+        job = await queue.claim("w1", now=T0)
+        assert job.id == first
+        assert job.status == RUNNING
+        assert job.attempts == 1
+        assert job.payload == {"query": "платье"}
+        assert (job.user_id, job.chat_id) == (1, 10)
+        assert (await queue.claim("w2", now=T0)).id == second
+        assert await queue.claim("w3", now=T0) is None
+        assert await queue.stats() == {"queued": 0, "delayed": 0, "running": 2, "finished": 0}
+    run(scenario())
+
+
+def test_complete_stores_result():
+    async def scenario():
+        queue = make_queue()
+        job_id = await queue.enqueue("analysis", {}, now=T0)
+        await queue.claim("w1", now=T0)
+        assert await queue.complete(job_id, {"status": "ok"}, now=T0 + 1)
+        job = await queue.get(job_id)
+        assert job.status == DONE
+        assert job.result == {"status": "ok"}
+        assert (await queue.stats())["running"] == 0
+    run(scenario())
+
+
+def test_failed_job_is_retried_through_delayed_set():
+    async def scenario():
+        queue = make_queue()
+        job_id = await queue.enqueue("analysis", {}, now=T0)
+        await queue.claim("w1", now=T0)
+        assert await queue.fail(job_id, "boom", now=T0) == QUEUED
+        assert await queue.stats() == {"queued": 0, "delayed": 1, "running": 0, "finished": 0}
+
+        # Повтор созревает через retry_backoff
+        assert await queue.claim("w1", now=T0 + 4) is None
+        job = await queue.claim("w1", now=T0 + 5)
+        assert job.id == job_id
+        assert job.attempts == 2
+        assert job.error == "boom"
+    run(scenario())
+
+
+def test_failure_after_max_attempts_is_final():
+    async def scenario():
+        queue = make_queue()
+        job_id = await queue.enqueue("analysis", {}, now=T0)
+        await queue.claim("w1", now=T0)
+        await queue.fail(job_id, "boom", now=T0)
+        await queue.claim("w1", now=T0 + 5)
+        assert await queue.fail(job_id, "boom again", now=T0 + 6) == FAILED
+        job = await queue.get(job_id)
+        assert job.status == FAILED
+        assert job.error == "boom again"
+        assert await queue.stats() == {"queued": 0, "delayed": 0, "running": 0, "finished": 1}
+    run(scenario())
+
+
+def test_fail_without_retry_is_final():
+    async def scenario():
+        queue = make_queue()
+        job_id = await queue.enqueue("analysis", {}, now=T0)
+        await queue.claim("w1", now=T0)
+        assert await queue.fail(job_id, "unknown job type", retry=False, now=T0) == FAILED
+        assert (await queue.get(job_id)).attempts == 1
+    run(scenario())
+
+
+def test_expired_lease_is_reclaimed():
+    async def scenario():
+        queue = make_queue()
+        job_id = await queue.enqueue("analysis", {}, now=T0)
+        await queue.claim("dead-worker", now=T0)
+        # Срок аренды — timeout + lease_grace
+        assert await queue.claim("w2", now=T0 + 10) is None
+        job = await queue.claim("w2", now=T0 + 11)
+        assert job.id == job_id
+        assert job.attempts == 2
+    run(scenario())
+
+
+def test_expired_lease_after_last_attempt_fails_job():
+    async def scenario():
+        queue = make_queue(max_attempts=1)
+        job_id = await queue.enqueue("analysis", {}, now=T0)
+        await queue.claim("dead-worker", now=T0)
+        assert await queue.claim("w2", now=T0 + 11) is None
+        job = await queue.get(job_id)
+        assert job.status == FAILED
+        assert job.error == "worker lost"
+        assert (await queue.next_finished(timeout=1)).id == job_id
+    run(scenario())
+
+
+def test_late_finish_after_reclaim_is_dropped():
+    async def scenario():
+        queue = make_queue()
+        job_id = await queue.enqueue("analysis", {}, now=T0)
+        await queue.claim("slow-worker", now=T0)
+        reclaimed = await queue.claim("w2", now=T0 + 11)
+        assert reclaimed.id == job_id
+
+        # Аренду снимает первый завершивший; второй результат не записывается
+        assert await queue.complete(job_id, {"status": "ok", "by": "w2"}, now=T0 + 12)
+        assert not await queue.complete(job_id, {"status": "ok", "by": "slow"}, now=T0 + 13)
+        job = await queue.get(job_id)
+        assert job.result == {"status": "ok", "by": "w2"}
+        assert (await queue.stats())["finished"] == 1
+    run(scenario())
+
+
+def test_late_fail_after_reclaim_does_not_requeue():
+    async def scenario():
+        queue = make_queue()
+        job_id = await queue.enqueue("analysis", {}, now=T0)
+        await queue.claim("slow-worker", now=T0)
+        await queue.claim("w2", now=T0 + 11)
+        await queue.complete(job_id, {"status": "ok"}, now=T0 + 12)
+        await queue.fail(job_id, "timeout", now=T0 + 13)
+        assert (await queue.get(job_id)).status == DONE
+        assert (await queue.stats())["delayed"] == 0
+    run(scenario())
+
+
+def test_cancel_queued_job():
+    async def scenario():
+        queue = make_queue()
+        job_id = await queue.enqueue("analysis", {}, now=T0)
+        assert await queue.cancel(job_id, now=T0) == CANCELLED
+        assert await queue.claim("w1", now=T0) is None
+        assert (await queue.get(job_id)).status == CANCELLED
+        assert (await queue.next_finished(timeout=1)).id == job_id
+    run(scenario())
+
+
+def test_cancel_delayed_job():
+    async def scenario():
+        queue = make_queue()
+        job_id = await queue.enqueue("analysis", {}, now=T0)
+        await queue.claim("w1", now=T0)
+        await queue.fail(job_id, "boom", now=T0)
+        assert await queue.cancel(job_id, now=T0 + 1) == CANCELLED
+        assert await queue.claim("w1", now=T0 + 100) is None
+        assert (await queue.stats())["delayed"] == 0
+    run(scenario())
+
+
+def test_cancel_running_job():
+    async def scenario():
+        queue = make_queue()
+        job_id = await queue.enqueue("analysis", {}, now=T0)
+        await queue.claim("w1", now=T0)
+        assert await queue.cancel(job_id, now=T0 + 1) == "cancelling"
+        assert await queue.is_cancel_requested(job_id)
+        # Воркер увидел флаг и прервал задачу
+        assert await queue.cancelled(job_id, now=T0 + 2)
+        assert (await queue.get(job_id)).status == CANCELLED
+    run(scenario())
+
+
+def test_cancel_requested_job_that_fails_is_cancelled():
+    async def scenario():
+        queue = make_queue()
+        job_id = await queue.enqueue("analysis", {}, now=T0)
+        await queue.claim("w1", now=T0)
+        await queue.cancel(job_id, now=T0 + 1)
+        assert await queue.fail(job_id, "CancelledError", now=T0 + 2) == CANCELLED
+        assert (await queue.stats())["delayed"] == 0
+    run(scenario())
+
+
+def test_cancel_requested_job_of_lost_worker_is_cancelled_on_reclaim():
+    async def scenario():
+        queue = make_queue()
+        job_id = await queue.enqueue("analysis", {}, now=T0)
+        await queue.claim("dead-worker", now=T0)
+        await queue.cancel(job_id, now=T0 + 1)
+        assert await queue.claim("w2", now=T0 + 11) is None
+        assert (await queue.get(job_id)).status == CANCELLED
+    run(scenario())
+
+
+def test_cancel_finished_job_keeps_status():
+    async def scenario():
+        queue = make_queue()
+        job_id = await queue.enqueue("analysis", {}, now=T0)
+        await queue.claim("w1", now=T0)
+        await queue.complete(job_id, {}, now=T0)
+        assert await queue.cancel(job_id, now=T0 + 1) == DONE
+        assert await queue.cancel("missing", now=T0 + 1) is None
+    run(scenario())
+
+
+def test_next_finished_returns_jobs_in_completion_order():
+    async def scenario():
+        queue = make_queue()
+        first = await queue.enqueue("analysis", {}, now=T0)
+        second = await queue.enqueue("analysis", {}, now=T0)
+        await queue.claim("w1", now=T0)
+        await queue.claim("w2", now=T0)
+        await queue.complete(second, {"n": 2}, now=T0 + 1)
+        await queue.fail(first, "boom", retry=False, now=T0 + 2)
+
+        job = await queue.next_finished(timeout=1)
+        assert (job.id, job.status, job.result) == (second, DONE, {"n": 2})
+        job = await queue.next_finished(timeout=1)
+        assert (job.id, job.status, job.error) == (first, FAILED, "boom")
+        assert await queue.next_finished(timeout=0.1) is None
+    run(scenario())
+
+
+def test_worker_runs_handler_and_completes_job():
+    from jobs.worker import Worker
+
+    async def scenario():
+        queue = make_queue()
+        job_id = await queue.enqueue("echo", {"x": 1})
+
+        async def echo(payload, progress):
+            return {"status": "ok", "payload": payload}
+
+        await Worker(queue, {"echo": echo}).process(await queue.claim("w1"))
+        job = await queue.get(job_id)
+        assert job.status == DONE
+        assert job.result == {"status": "ok", "payload": {"x": 1}}
+    run(scenario())
+
+
+def test_worker_retries_on_error_and_timeout():
+    from jobs.worker import Worker
+
+    async def scenario():
+        queue = make_queue(timeout=0.2, retry_backoff=0)
+        job_id = await queue.enqueue("flaky", {})
+        calls = []
+
+        async def flaky(payload, progress):
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("boom")
+            await asyncio.sleep(10)
+
+        worker = Worker(queue, {"flaky": flaky})
+        await worker.process(await queue.claim("w1"))
+        assert (await queue.get(job_id)).error == "boom"
+        await worker.process(await queue.claim("w1"))
+        job = await queue.get(job_id)
+        assert (job.status, job.error, job.attempts) == (FAILED, "timeout", 2)
+    run(scenario())
+
+
+def test_worker_interrupts_cancelled_job(monkeypatch):
+    import jobs.worker
+    from jobs.worker import Worker
+
+    monkeypatch.setattr(jobs.worker, "JOB_CANCEL_POLL", 0.05)
+
+    async def scenario():
+        queue = make_queue()
+        job_id = await queue.enqueue("slow", {})
+        interrupted = asyncio.Event()
+
+        async def slow(payload, progress):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                interrupted.set()
+                raise
+
+        worker = Worker(queue, {"slow": slow})
+        task = asyncio.create_task(worker.process(await queue.claim("w1")))
+        await asyncio.sleep(0.1)
+        await queue.cancel(job_id)
+        await asyncio.wait_for(task, 2)
+        assert interrupted.is_set()
+        assert (await queue.get(job_id)).status == CANCELLED
+    run(scenario())
+
+
+def test_progress_reaches_subscriber_and_partials_are_throttled():
+    async def scenario():
+        queue = make_queue()
+        received = []
+
+        async def listen():
+            async for update in queue.progress_updates():
+                received.append(update)
+
+        listener = asyncio.create_task(listen())
+        await asyncio.sleep(0.05)
+        progress = JobProgress(queue, "job1", interval=10)
+        await progress.on_progress(ProgressEvent(GPT_CHUNKS, 1, 3))
+        await progress.on_partial([{"phrase": "платье", "count": 2}])
+        await progress.on_partial([{"phrase": "платье", "count": 3}])  # раньше interval — не публикуется
+        await progress.on_progress(ProgressEvent(GPT_CHUNKS, 2, 3))
+        await asyncio.sleep(0.05)
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+        assert received == [
+            {"id": "job1", "stage": GPT_CHUNKS, "done": 1, "total": 3},
+            {"id": "job1", "phrases": [{"phrase": "платье", "count": 2}]},
+            {"id": "job1", "stage": GPT_CHUNKS, "done": 2, "total": 3},
+        ]
+    run(scenario())
+
+
+def test_progress_errors_do_not_fail_job():
+    from jobs.worker import Worker
+
+    async def scenario():
+        queue = make_queue()
+        job_id = await queue.enqueue("echo", {})
+
+        async def broken_publish(job_id, update):
+            raise ConnectionError("redis down")
+
+        queue.publish_progress = broken_publish
+
+        async def echo(payload, progress):
+            await progress.on_progress(ProgressEvent(GPT_CHUNKS, 1, 1))
+            await progress.on_partial([])
+            return {"status": "ok"}
+
+        await Worker(queue, {"echo": echo}).process(await queue.claim("w1"))
+        assert (await queue.get(job_id)).status == DONE
+    run(scenario())
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from analyzer.gpt_processor import parse_phrases
+from analyzer.json_stream import JSONArrayStream
+
+ITEMS = [
+    {"phrase": "чехол \"soft\" [2 шт]", "count": 3},
+    {"phrase": "обратный \\ слэш, {скобки}", "count": 2},
+    {"phrase": "вложенный", "count": 1, "meta": {"tags": ["a", {"b": "}"}]}},
+]
+TEXT = 'Ответ: {"phrases": ' + json.dumps(ITEMS, ensure_ascii=False) + '}'
+
+
+def feed_in_pieces(text: str, size: int) -> JSONArrayStream:
+    parser = JSONArrayStream()
+    for start in range(0, len(text), size):
+        parser.feed(text[start:start + size])
+    return parser
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 11, len(TEXT)])
+def test_any_split_gives_same_items(size):
+    parser = feed_in_pieces(TEXT, size)
+    assert parser.items == ITEMS
+    assert parser.done
+
+
+def test_split_at_every_position():
+    # Разрез проходит и внутри строк, и между "\" и экранированным символом
+    for cut in range(len(TEXT) + 1):
+        parser = JSONArrayStream()
+        found = parser.feed(TEXT[:cut]) + parser.feed(TEXT[cut:])
+        assert found == ITEMS, cut
+
+
+def test_items_are_returned_as_soon_as_they_close():
+    parser = JSONArrayStream()
+    first = json.dumps(ITEMS[0], ensure_ascii=False)
+    assert parser.feed('[' + first[:-1]) == []
+    assert parser.feed(first[-1] + ', {"phr') == [ITEMS[0]]
+    assert not parser.done
+
+
+def test_truncated_tail_keeps_complete_items():
+    text = json.dumps(ITEMS, ensure_ascii=False)
+    cut = text.index('"вложенный"') + 5
+    parser = feed_in_pieces(text[:cut], 4)
+    assert parser.items == ITEMS[:2]
+    assert not parser.done
+
+
+def test_malformed_object_is_skipped():
+    text = '[{"phrase": "a", "count": 1}, {"phrase": "b" "count": 2}, {"phrase": "c", "count": 3}]'
+    parser = feed_in_pieces(text, 3)
+    assert [item["phrase"] for item in parser.items] == ["a", "c"]
+    assert parser.done
+
+
+def test_text_after_array_is_ignored():
+    parser = JSONArrayStream()
+    assert parser.feed('[{"phrase": "a", "count": 1}] [{"phrase": "b", "count": 1}]') == [
+        {"phrase": "a", "count": 1}]
+    assert parser.feed('{"phrase": "c", "count": 1}') == []
+
+
+def test_parse_phrases_coerces_or_drops_bad_counts():
+    content = json.dumps([
+        {"phrase": "строка", "count": "3"},
+        {"phrase": "дробь", "count": 2.0},
+        {"phrase": "null", "count": None},
+        {"phrase": "bool", "count": True},
+        {"phrase": "текст", "count": "много"},
+        {"phrase": "ноль", "count": 0},
+        {"phrase": 5, "count": 1},
+        {"count": 1},
+        "не объект",
+    ], ensure_ascii=False)
+    assert parse_phrases(content) == [{"phrase": "строка", "count": 3}, {"phrase": "дробь", "count": 2}]
@@ -0,0 +1,104 @@
+import asyncio
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import EditMessageText
+
+from bot.live_message import LiveMessage
+
+
+def retry_after(seconds: float) -> TelegramRetryAfter:
+    return TelegramRetryAfter(EditMessageText(text="", chat_id=1, message_id=1), "Flood control", seconds)
+
+
+class FakeMessage:
+    """Сообщение Telegram: запоминает правки и по очереди выдаёт заданные ошибки."""
+
+    def __init__(self, errors=()):
+        self.texts = []
+        self.errors = list(errors)
+
+    async def edit_text(self, text: str):
+        if self.errors:
+            error = self.errors.pop(0)
+            if error:
+                raise error
+        self.texts.append(text)
+
+
+class FakeChat:
+    def __init__(self, message: FakeMessage):
+        self.message = message
+
+    async def answer(self, text: str) -> FakeMessage:
+        self.message.texts.append(text)
+        return self.message
+
+
+def test_updates_are_throttled_and_coalesced():
+    async def scenario():
+        message = FakeMessage()
+        live = LiveMessage(FakeChat(message), interval=0.1)
+        await live.update("1")
+        await live.update("2")
+        await live.update("3")
+        assert message.texts == ["1"]
+        await asyncio.sleep(0.15)
+        assert message.texts == ["1", "3"]
+    asyncio.run(scenario())
+
+
+def test_text_rejected_with_retry_after_is_resent():
+    async def scenario():
+        message = FakeMessage([retry_after(0.1)])
+        live = LiveMessage(FakeChat(message), interval=0.05)
+        await live.update("1")
+        await asyncio.sleep(0.06)
+        await live.update("2")
+        assert message.texts == ["1"]
+        # После паузы статус не остаётся устаревшим, хотя новых событий нет
+        await asyncio.sleep(0.15)
+        assert message.texts == ["1", "2"]
+    asyncio.run(scenario())
+
+
+def test_newer_text_wins_over_rejected_one():
+    async def scenario():
+        message = FakeMessage()
+        live = LiveMessage(FakeChat(message), interval=0.05)
+        await live.update("1")
+
+        async def slow_rejected_edit(text):
+            await live.update("3")  # пришло, пока запрос правки ещё выполнялся
+            raise retry_after(0.05)
+
+        message.edit_text, plain_edit = slow_rejected_edit, message.edit_text
+        await asyncio.sleep(0.06)
+        await live.update("2")
+        message.edit_text = plain_edit
+        await asyncio.sleep(0.1)
+        assert message.texts == ["1", "3"]
+    asyncio.run(scenario())
+
+
+def test_finish_waits_for_flood_pause():
+    async def scenario():
+        message = FakeMessage([retry_after(0.1), retry_after(0.05)])
+        live = LiveMessage(FakeChat(message), interval=0.05)
+        await live.update("1")
+        await asyncio.sleep(0.06)
+        await live.update("2")
+        await live.finish("done")
+        await asyncio.sleep(0.1)
+        assert message.texts == ["1", "done"]
+        await live.update("late")
+        assert message.texts == ["1", "done"]
+    asyncio.run(scenario())
+
+
+def test_finish_without_message_sends_nothing():
+    async def scenario():
+        message = FakeMessage()
+        live = LiveMessage(FakeChat(message))
+        await live.finish("done")
+        assert message.texts == []
+    asyncio.run(scenario())
@@ -0,0 +1,178 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import fakeredis
+import openai
+import pytest
+from aiohttp import web
+
+from analyzer.gpt_processor import GPTProcessor
+from analyzer.openai_client import GPTClient
+from benchmarks.mock_openai import STATS, make_app
+
+PROMPT = 'Дан запрос: "чехол iphone". Текст:\nЧехол для iPhone силиконовый, чехол прозрачный'
+DATA = {"titles": ["Чехол для iPhone силиконовый", "Чехол прозрачный для iPhone"], "descriptions": []}
+
+
+@asynccontextmanager
+async def mock_server(**kwargs):
+    app = make_app(**{"latency": 0.01, **kwargs})
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    try:
+        yield app[STATS], f"http://127.0.0.1:{port}/v1"
+    finally:
+        await runner.cleanup()
+
+
+def make_client(base_url: str, **kwargs) -> GPTClient:
+    kwargs.setdefault("backoff", 0.01)
+    kwargs.setdefault("max_retries", 3)
+    return GPTClient("mock-key", base_url=base_url, **kwargs)
+
+
+def make_processor(base_url: str, **kwargs) -> GPTProcessor:
+    processor = GPTProcessor("mock-key", **kwargs)
+    processor.gpt = make_client(base_url)
+    processor.redis.client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    return processor
+
+
+def ask(client: GPTClient):
+    return client.complete([{"role": "user", "content": PROMPT}], max_tokens=200)
+
+
+def test_retries_429_and_500():
+    async def scenario():
+        async with mock_server(failures=[429, 500]) as (stats, base_url):
+            client = make_client(base_url)
+            response = await ask(client)
+            assert "чехол" in response.choices[0].message.content
+            assert stats["requests"] == 3
+            assert client.counters == {"requests": 3, "retries": 2, "errors": 0}
+            await client.close()
+    asyncio.run(scenario())
+
+
+def test_stream_retries_before_first_chunk():
+    async def scenario():
+        async with mock_server(failures=[500]) as (stats, base_url):
+            client = make_client(base_url)
+            usage = {"prompt_tokens": 0, "completion_tokens": 0}
+            text = "".join([piece async for piece in client.stream(
+                [{"role": "user", "content": PROMPT}], max_tokens=200, usage=usage)])
+            assert "чехол" in text
+            assert client.counters["retries"] == 1
+            assert usage["completion_tokens"] > 0
+            await client.close()
+    asyncio.run(scenario())
+
+
+def test_error_after_retries_run_out():
+    async def scenario():
+        async with mock_server(failures=[500] * 3) as (stats, base_url):
+            client = make_client(base_url, max_retries=2)
+            with pytest.raises(openai.InternalServerError):
+                await ask(client)
+            assert stats["requests"] == 3
+            assert client.counters == {"requests": 3, "retries": 2, "errors": 1}
+            await client.close()
+    asyncio.run(scenario())
+
+
+def test_semaphore_caps_concurrent_requests():
+    async def scenario():
+        async with mock_server(latency=0.05) as (stats, base_url):
+            client = make_client(base_url, concurrency=2)
+            await asyncio.gather(*(ask(client) for _ in range(8)))
+            assert stats["requests"] == 8
+            assert stats["max_in_flight"] == 2
+            await client.close()
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_processor_extracts_filters_and_caches(stream):
+    async def scenario():
+        async with mock_server() as (stats, base_url):
+            processor = make_processor(base_url, merged_call=False, stream=stream)
+            phrases = await processor.process_ngrams("чехол iphone", DATA)
+            assert {"phrase": "чехол", "count": 2} in phrases
+            # Извлечение и отдельный запрос фильтра мусора
+            assert stats["requests"] == 2
+            assert await processor.process_ngrams("чехол iphone", DATA) == phrases
+            assert stats["requests"] == 2
+            await processor.close()
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_processor_merged_call_skips_filter_request(stream):
+    async def scenario():
+        async with mock_server() as (stats, base_url):
+            processor = make_processor(base_url, merged_call=True, stream=stream)
+            phrases = await processor.process_ngrams("чехол iphone", DATA)
+            assert {"phrase": "чехол", "count": 2} in phrases
+            assert stats["requests"] == 1
+            await processor.close()
+    asyncio.run(scenario())
+
+
+def test_processor_falls_back_when_retries_run_out():
+    async def scenario():
+        async with mock_server(failures=[500] * 10) as (stats, base_url):
+            processor = make_processor(base_url, stream=False)
+            processor.gpt.max_retries = 1
+            fallback = [{"phrase": "локально", "count": 1}]
+
+            async def fallback_ngram_analysis(query, data):
+                return fallback
+
+            processor.fallback_ngram_analysis = fallback_ngram_analysis
+            assert await processor.process_ngrams("чехол iphone", DATA) == fallback
+            assert stats["requests"] == 2
+            # Неудачный вход попал в отрицательный кэш: повторный вызов не идёт в GPT
+            assert await processor.process_ngrams("чехол iphone", DATA) == fallback
+            assert stats["requests"] == 2
+            await processor.close()
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("merged_call", [False, True])
+def test_processor_runs_fallback_through_pipeline_when_gpt_finds_nothing(merged_call):
+    async def scenario():
+        async with mock_server() as (stats, base_url):
+            processor = make_processor(base_url, merged_call=merged_call, stream=False)
+
+            async def fallback_ngram_analysis(query, data):
+                return [{"phrase": "x1 ботинки", "count": 2}, {"phrase": "x1 ботинки", "count": 1}]
+
+            processor.fallback_ngram_analysis = fallback_ngram_analysis
+            # В тексте нет слов, из которых мок собирает фразы: GPT отвечает пустым массивом
+            data = {"titles": ["12 34", "x1 y2"], "descriptions": []}
+            phrases = await processor.process_ngrams("ботинки", data)
+            assert phrases == [{"phrase": "x1 ботинки", "count": 3}]
+            # Пустой ответ GPT и фильтр мусора для локальных фраз, даже при merged_call
+            assert stats["requests"] == 2
+            assert await processor.process_ngrams("ботинки", data) == phrases
+            assert stats["requests"] == 2
+            await processor.close()
+    asyncio.run(scenario())
+
+
+def test_processor_survives_local_analysis_error():
+    async def scenario():
+        async with mock_server() as (stats, base_url):
+            processor = make_processor(base_url, stream=False)
+
+            async def tfidf(texts, **kwargs):
+                raise ValueError("empty vocabulary; perhaps the documents only contain stop words")
+
+            processor.executor.tfidf = tfidf
+            assert await processor.process_ngrams("ботинки", {"titles": ["распродажа", ""]}) == []
+            assert await processor.process_ngrams("ботинки", {"titles": ["12 34"]}) == []
+            await processor.close()
+    asyncio.run(scenario())
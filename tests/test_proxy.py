@@ -0,0 +1,124 @@
+import asyncio
+
+from parser.proxy import ProxyManager
+
+GOOD = ["http://10.0.0.1:8080", "http://10.0.0.2:8080", "http://10.0.0.3:8080"]
+DEAD = ["http://10.0.0.9:8080"]
+
+
+def make_manager(proxies=GOOD + DEAD, latencies=None, **kwargs) -> ProxyManager:
+    latencies = latencies or {}
+    checked = []
+
+    async def validator(proxy):
+        checked.append(proxy)
+        if proxy in DEAD:
+            return None
+        if proxy == "http://10.0.0.8:8080":
+            raise OSError("connection refused")
+        return latencies.get(proxy, 0.1)
+
+    manager = ProxyManager.from_list(proxies, validator=validator, refill_interval=3600, **kwargs)
+    manager.checked = checked
+    return manager
+
+
+def test_validation_drops_dead_proxies():
+    async def scenario():
+        manager = make_manager(GOOD + DEAD + ["http://10.0.0.8:8080", GOOD[0]])
+        assert await manager.fetch_proxies() == 3
+        assert sorted(manager.proxies) == GOOD
+        # Повторное пополнение не проверяет заново тех, кто уже в пуле
+        manager.checked.clear()
+        await manager.fetch_proxies()
+        assert GOOD[0] not in manager.checked
+    asyncio.run(scenario())
+
+
+def test_failures_lower_score_and_change_choice():
+    async def scenario():
+        manager = make_manager(latencies={GOOD[0]: 0.1, GOOD[1]: 0.5, GOOD[2]: 0.5})
+        await manager.fetch_proxies()
+        assert await manager.get_proxy() == GOOD[0]
+        score = manager.proxies[GOOD[0]].score
+        manager.report(GOOD[0], ok=True)
+        manager.report(GOOD[0], ok=False)
+        assert manager.proxies[GOOD[0]].score < score
+        assert await manager.get_proxy() == GOOD[1]
+        await manager.stop()
+    asyncio.run(scenario())
+
+
+def test_bad_proxy_is_evicted_and_unpinned():
+    async def scenario():
+        manager = make_manager()
+        await manager.fetch_proxies()
+        proxy = await manager.get_proxy("ctx-1")
+        for _ in range(3):
+            manager.report(proxy, ok=False, banned=True)
+        assert proxy not in manager.proxies
+        assert proxy in manager.evicted
+        assert "ctx-1" not in manager.sessions
+        assert await manager.get_proxy("ctx-1") != proxy
+        # Пока выселение в силе, прокси не возвращается в пул при пополнении
+        await manager.fetch_proxies()
+        assert proxy not in manager.proxies
+        await manager.stop()
+    asyncio.run(scenario())
+
+
+def test_evicted_proxy_returns_after_ttl():
+    async def scenario():
+        manager = make_manager(evict_ttl=0.05)
+        await manager.fetch_proxies()
+        manager.evict(GOOD[0])
+        await manager.fetch_proxies()
+        assert GOOD[0] not in manager.proxies
+        await asyncio.sleep(0.06)
+        await manager.fetch_proxies()
+        assert GOOD[0] in manager.proxies
+        assert not manager.evicted
+    asyncio.run(scenario())
+
+
+def test_session_keeps_proxy_until_release():
+    async def scenario():
+        manager = make_manager()
+        await manager.fetch_proxies()
+        first = await manager.get_proxy("ctx-1")
+        assert await manager.get_proxy("ctx-1") == first
+        # Новая сессия получает наименее занятый из равных по качеству
+        assert await manager.get_proxy("ctx-2") != first
+        assert manager.proxies[first].leases == 1
+        manager.release("ctx-1")
+        assert "ctx-1" not in manager.sessions
+        await manager.stop()
+    asyncio.run(scenario())
+
+
+def test_refill_loop_tops_up_pool():
+    async def scenario():
+        pool = list(GOOD[:1])
+
+        async def source(limit):
+            return list(pool)
+
+        async def validator(proxy):
+            return 0.1
+
+        manager = ProxyManager(source=source, validator=validator, min_pool=2, refill_interval=0.01)
+        assert await manager.get_proxy() == GOOD[0]
+        pool.extend(GOOD[1:])
+        await asyncio.sleep(0.05)
+        assert sorted(manager.proxies) == GOOD
+        await manager.stop()
+        assert manager._task is None
+    asyncio.run(scenario())
+
+
+def test_disabled_manager_returns_no_proxy():
+    async def scenario():
+        manager = make_manager(enabled=False)
+        assert await manager.get_proxy("ctx-1") is None
+        assert manager._task is None
+    asyncio.run(scenario())
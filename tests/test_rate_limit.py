@@ -0,0 +1,144 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from storage.rate_limit import RateLimiter, SCRIPTS
+
+T0 = 1_000_000.0
+
+
+def make_limiter(policy: str, **kwargs) -> RateLimiter:
+    kwargs.setdefault("limit", 3)
+    kwargs.setdefault("window", 10)
+    kwargs.setdefault("global_limit", 0)
+    return RateLimiter(fakeredis.FakeRedis(decode_responses=True), policy=policy, **kwargs)
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        make_limiter("leaky")
+
+
+@pytest.mark.parametrize("policy", sorted(SCRIPTS))
+def test_limit_is_enforced_per_user(policy):
+    limiter = make_limiter(policy)
+    results = [limiter.acquire_sync(1, now=T0) for _ in range(3)]
+    assert all(results)
+    assert [r.remaining for r in results] == [2, 1, 0]
+
+    denied = limiter.acquire_sync(1, now=T0)
+    assert not denied
+    assert denied.scope == "user"
+    assert denied.retry_after > 0
+    # Лимит другого пользователя не тронут
+    assert limiter.acquire_sync(2, now=T0)
+
+
+def test_fixed_window_resets_at_window_boundary():
+    limiter = make_limiter("fixed_window")
+    for offset in (1, 2, 3):
+        assert limiter.acquire_sync(1, now=T0 + offset)
+    denied = limiter.acquire_sync(1, now=T0 + 4)
+    assert not denied
+    assert denied.retry_after == pytest.approx(6)
+    # Новое окно начинается на границе floor(now / window), без ожидания реального времени
+    assert limiter.acquire_sync(1, now=T0 + 10)
+    assert limiter.acquire_sync(1, now=T0 + 111)
+
+
+def test_sliding_log_frees_slots_as_requests_age_out():
+    limiter = make_limiter("sliding_log")
+    for offset in (0, 4, 8):
+        assert limiter.acquire_sync(1, now=T0 + offset)
+    denied = limiter.acquire_sync(1, now=T0 + 9)
+    assert not denied
+    assert denied.retry_after == pytest.approx(1)
+    # Через окно после первого запроса освобождается ровно одно место
+    assert limiter.acquire_sync(1, now=T0 + 10)
+    assert not limiter.acquire_sync(1, now=T0 + 11)
+    assert limiter.acquire_sync(1, now=T0 + 14)
+
+
+def test_sliding_log_denied_requests_are_not_logged():
+    limiter = make_limiter("sliding_log")
+    for _ in range(3):
+        limiter.acquire_sync(1, now=T0)
+    for offset in range(1, 10):
+        assert not limiter.acquire_sync(1, now=T0 + offset)
+    assert limiter.acquire_sync(1, now=T0 + 10)
+
+
+def test_token_bucket_refills_gradually():
+    limiter = make_limiter("token_bucket", limit=2, window=10)
+    assert limiter.acquire_sync(1, now=T0)
+    assert limiter.acquire_sync(1, now=T0)
+    denied = limiter.acquire_sync(1, now=T0 + 1)
+    assert not denied
+    # Токен пополняется за window / limit = 5 с
+    assert denied.retry_after == pytest.approx(4)
+    assert limiter.acquire_sync(1, now=T0 + 5)
+    assert not limiter.acquire_sync(1, now=T0 + 6)
+    # Ведро не копит больше limit токенов
+    assert limiter.acquire_sync(1, now=T0 + 100)
+    assert limiter.acquire_sync(1, now=T0 + 100)
+    assert not limiter.acquire_sync(1, now=T0 + 100)
+
+
+@pytest.mark.parametrize("policy", sorted(SCRIPTS))
+def test_global_limit_spans_users(policy):
+    limiter = make_limiter(policy, global_limit=4, global_window=10)
+    for user_id in (1, 1, 2, 3):
+        assert limiter.acquire_sync(user_id, now=T0)
+    denied = limiter.acquire_sync(4, now=T0)
+    assert not denied
+    assert denied.scope == "global"
+
+
+@pytest.mark.parametrize("policy", sorted(SCRIPTS))
+def test_request_denied_by_one_limit_is_not_counted_by_the_other(policy):
+    limiter = make_limiter(policy, limit=1, global_limit=2, global_window=10)
+    assert limiter.acquire_sync(1, now=T0)
+    # Отказ по пользовательскому лимиту не тратит глобальный
+    for _ in range(5):
+        assert limiter.acquire_sync(1, now=T0).scope == "user"
+    allowed = limiter.acquire_sync(2, now=T0)
+    assert allowed
+    assert allowed.remaining == 0
+    assert limiter.acquire_sync(3, now=T0).scope == "global"
+
+
+@pytest.mark.parametrize("policy", sorted(SCRIPTS))
+def test_async_client(policy):
+    async def scenario():
+        limiter = RateLimiter(fakeredis.FakeAsyncRedis(decode_responses=True), policy=policy,
+                              limit=1, window=10, global_limit=0)
+        assert await limiter.acquire(1, now=T0)
+        assert not await limiter.acquire(1, now=T0)
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("policy", sorted(SCRIPTS))
+def test_script_touches_only_passed_keys_in_one_slot(policy):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    limiter = RateLimiter(client, policy=policy, limit=1, window=10, global_limit=5, global_window=60)
+    passed = set()
+    script = limiter._script
+
+    def recording_script(keys, args):
+        passed.update(keys)
+        return script(keys=keys, args=args)
+
+    limiter._script = recording_script
+    for offset in (0, 0, 25):
+        limiter.acquire_sync(1, now=T0 + offset)
+    # Redis Cluster требует, чтобы скрипт обращался только к ключам из KEYS одного слота
+    assert set(client.keys("*")) <= passed
+    assert {key.split("}", 1)[0] for key in passed} == {"{ratelimit"}
+
+
+def test_denied_result_names_triggered_limit():
+    limiter = make_limiter("fixed_window", limit=1, window=3600, global_limit=10, global_window=60)
+    assert limiter.acquire_sync(1, now=T0)
+    denied = limiter.acquire_sync(1, now=T0)
+    assert (denied.scope, denied.limit, denied.window) == ("user", 1, 3600)
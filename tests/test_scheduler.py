@@ -0,0 +1,128 @@
+import asyncio
+
+from parser.scheduler import ScrapeScheduler, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class Recorder:
+    """Запускает «парсинги», которые держат место, пока тест их не отпустит."""
+
+    def __init__(self, scheduler: ScrapeScheduler):
+        self.scheduler = scheduler
+        self.order = []
+        self.release = {}
+        self.positions = {}
+        self.tasks = {}
+
+    async def submit(self, name: str, user_id: int, priority: int = PRIORITY_INTERACTIVE):
+        self.release[name] = asyncio.Event()
+
+        async def on_position(position):
+            self.positions.setdefault(name, []).append(position)
+
+        async def scrape():
+            async with self.scheduler.slot(user_id, priority, on_position):
+                self.order.append(name)
+                await self.release[name].wait()
+
+        self.tasks[name] = asyncio.create_task(scrape())
+        await settle()
+
+    async def finish(self, name: str):
+        self.release[name].set()
+        await self.tasks[name]
+        await settle()
+
+
+def test_user_keeps_place_in_rotation_after_queue_empties():
+    async def scenario():
+        rec = Recorder(ScrapeScheduler(concurrency=1, per_user=1))
+        for name in ("a1", "a2", "a3"):
+            await rec.submit(name, user_id=1)
+        await rec.submit("b1", user_id=2)
+        for name in ("a1", "b1", "a2", "a3"):
+            assert rec.order[-1] == name
+            await rec.finish(name)
+        assert rec.order == ["a1", "b1", "a2", "a3"]
+    asyncio.run(scenario())
+
+
+def test_round_robin_between_users():
+    async def scenario():
+        rec = Recorder(ScrapeScheduler(concurrency=1, per_user=1))
+        await rec.submit("x", user_id=9)
+        for name in ("a1", "a2", "a3"):
+            await rec.submit(name, user_id=1)
+        for name in ("b1", "b2"):
+            await rec.submit(name, user_id=2)
+        await rec.submit("c1", user_id=3)
+        for name in ("x", "a1", "b1", "c1", "a2", "b2", "a3"):
+            await rec.finish(name)
+        assert rec.order == ["x", "a1", "b1", "c1", "a2", "b2", "a3"]
+    asyncio.run(scenario())
+
+
+def test_background_waits_for_interactive_and_background_slots():
+    async def scenario():
+        rec = Recorder(ScrapeScheduler(concurrency=2, per_user=1, background_slots=1))
+        await rec.submit("i1", user_id=1)
+        await rec.submit("i2", user_id=2)
+        await rec.submit("bg1", user_id=3, priority=PRIORITY_BACKGROUND)
+        await rec.submit("bg2", user_id=4, priority=PRIORITY_BACKGROUND)
+        await rec.submit("i3", user_id=5)
+        await rec.finish("i1")
+        assert rec.order == ["i1", "i2", "i3"]
+        await rec.finish("i2")
+        # Второе фоновое место не выдаётся, пока занято первое
+        assert rec.order == ["i1", "i2", "i3", "bg1"]
+        await rec.finish("i3")
+        assert rec.order[-1] == "bg1"
+        await rec.finish("bg1")
+        assert rec.order[-1] == "bg2"
+        await rec.finish("bg2")
+    asyncio.run(scenario())
+
+
+def test_queue_position_is_reported_and_cancelled_waiter_leaves_queue():
+    async def scenario():
+        scheduler = ScrapeScheduler(concurrency=1, per_user=1)
+        rec = Recorder(scheduler)
+        await rec.submit("a1", user_id=1)
+        await rec.submit("b1", user_id=2)
+        await rec.submit("c1", user_id=3)
+        assert rec.positions == {"b1": [1], "c1": [2]}
+
+        rec.tasks["b1"].cancel()
+        await settle()
+        assert rec.positions["c1"] == [2, 1]
+        assert scheduler.waiting == 1
+        await rec.finish("a1")
+        assert rec.order == ["a1", "c1"]
+        await rec.finish("c1")
+        assert (scheduler.running, scheduler.waiting) == (0, 0)
+        assert not scheduler._last_served
+    asyncio.run(scenario())
+
+
+def test_background_refresh_does_not_block_own_user():
+    async def scenario():
+        scheduler = ScrapeScheduler(concurrency=2, per_user=1, background_slots=1)
+        rec = Recorder(scheduler)
+        # Обновление устаревшего кэша, запущенное запросом пользователя 1
+        await rec.submit("bg1", user_id=1, priority=PRIORITY_BACKGROUND)
+        await rec.submit("i1", user_id=1)
+        assert rec.order == ["bg1", "i1"]
+        await rec.submit("i2", user_id=1)
+        assert rec.order == ["bg1", "i1"]  # лимит на пользователя по-прежнему действует
+        await rec.finish("bg1")
+        assert rec.order == ["bg1", "i1"]
+        await rec.finish("i1")
+        assert rec.order == ["bg1", "i1", "i2"]
+        await rec.finish("i2")
+        assert (scheduler.running, scheduler.waiting) == (0, 0)
+        assert not scheduler._running_by_user
+    asyncio.run(scenario())
@@ -0,0 +1,76 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+import storage.search_cache
+from storage.redis import AsyncRedisStorage
+from storage.search_cache import SearchResultCache
+
+
+@pytest.fixture(autouse=True)
+def no_lemmatizer(monkeypatch):
+    monkeypatch.setattr(storage.search_cache, "_lemmatize", lambda token: token)
+
+
+def make_cache() -> SearchResultCache:
+    redis = AsyncRedisStorage()
+    redis.client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    return SearchResultCache(redis)
+
+
+def test_concurrent_queries_share_one_fetch():
+    async def scenario():
+        cache = make_cache()
+        calls = []
+
+        async def fetch(query):
+            calls.append(query)
+            await asyncio.sleep(0.05)
+            return {"titles": [query]}, True
+
+        results = await asyncio.gather(*(cache.get_or_fetch(q, fetch) for q in ("чехол iphone", "iPhone  чехол")))
+        assert len(calls) == 1
+        assert results[0] == results[1]
+        assert cache.counters["coalesced"] == 1
+        assert await cache.get_or_fetch("чехол iphone", fetch) == results[0]
+        assert len(calls) == 1
+    asyncio.run(scenario())
+
+
+def test_cancelled_leader_does_not_cancel_waiters():
+    async def scenario():
+        cache = make_cache()
+        calls = []
+
+        async def fetch(query):
+            calls.append(query)
+            await asyncio.sleep(0.05)
+            return {"titles": [len(calls)]}, True
+
+        leader = asyncio.create_task(cache.get_or_fetch("платье", fetch))
+        await asyncio.sleep(0.01)
+        waiters = [asyncio.create_task(cache.get_or_fetch("платье", fetch)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+
+        results = await asyncio.gather(*waiters)
+        assert leader.cancelled()
+        # Один из ожидающих повторил парсинг, второй присоединился к нему
+        assert results == [{"titles": [2]}, {"titles": [2]}]
+        assert len(calls) == 2
+    asyncio.run(scenario())
+
+
+def test_fetch_error_reaches_waiters():
+    async def scenario():
+        cache = make_cache()
+
+        async def fetch(query):
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(*(cache.get_or_fetch("платье", fetch) for _ in range(2)),
+                                       return_exceptions=True)
+        assert [str(r) for r in results] == ["boom", "boom"]
+    asyncio.run(scenario())
@@ -0,0 +1,35 @@
+import asyncio
+import threading
+
+import pytest
+
+from parser.selenium_worker import SeleniumWorker, SeleniumQueueFull
+
+
+def test_cancelled_call_counts_until_thread_finishes():
+    async def scenario():
+        worker = SeleniumWorker(workers=1, queue_size=1)
+        release = threading.Event()
+        running = asyncio.create_task(worker.run(release.wait, 5))
+        await asyncio.sleep(0.05)
+        # Дедлайн отменил ожидание, но поток ещё занят драйвером
+        running.cancel()
+        await asyncio.sleep(0.01)
+        assert worker.pending == 1
+
+        queued = asyncio.create_task(worker.run(lambda: None))
+        await asyncio.sleep(0.01)
+        with pytest.raises(SeleniumQueueFull):
+            await worker.run(lambda: None)
+        # Ещё не начатая задача при отмене сразу освобождает место
+        queued.cancel()
+        await asyncio.sleep(0.01)
+        assert worker.pending == 1
+
+        release.set()
+        await asyncio.sleep(0.05)
+        assert worker.pending == 0
+        assert await worker.run(lambda: 5) == 5
+        assert worker.pending == 0
+        worker.shutdown()
+    asyncio.run(scenario())
@@ -0,0 +1,69 @@
+import glob
+import html
+import json
+import os
+
+import pytest
+
+from parser.state_extractor import extract_product_details, extract_search_cards, product_sku, product_text
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEARCH_PAGES = sorted(glob.glob(os.path.join(ROOT, "debug_ozon_*.html")))
+
+
+def read(path: str) -> str:
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def state_div(widget: str, state: dict) -> str:
+    return f'<div id="state-{widget}-3-default-1" data-state="{html.escape(json.dumps(state, ensure_ascii=False))}"></div>'
+
+
+@pytest.mark.parametrize("path", SEARCH_PAGES, ids=os.path.basename)
+def test_search_cards_from_saved_pages(path):
+    cards = extract_search_cards(read(path))
+    assert len(cards) == 12
+    assert len({card["sku"] for card in cards}) == 12
+    for card in cards:
+        assert card["title"].startswith("Ботинки")
+        assert card["description"].endswith("₾")
+        assert card["link"].startswith("/product/")
+        assert product_sku(card["link"]) == card["sku"]
+        assert "&#" not in card["title"] and "<" not in card["title"]
+
+
+def test_search_cards_order_and_limit():
+    page = read(os.path.join(ROOT, "debug_ozon_search_1749386191.html"))
+    cards = extract_search_cards(page)
+    assert [card["sku"] for card in cards[:3]] == ["1651226672", "1802061897", "1169752350"]
+    assert cards[2]["title"] == "Ботинки Vicappy"
+    assert cards[-1]["title"] == "Ботинки ARPSTAR Угги/ботинки женские"
+    assert extract_search_cards(page, limit=5) == cards[:5]
+
+
+@pytest.mark.parametrize("path", SEARCH_PAGES + [os.path.join(ROOT, "ozon_error_1749398080.html")],
+                         ids=os.path.basename)
+def test_no_product_details_on_other_pages(path):
+    assert extract_product_details(read(path)) == {"description": "", "characteristics": []}
+
+
+def test_no_cards_on_error_page():
+    assert extract_search_cards(read(os.path.join(ROOT, "ozon_error_1749398080.html"))) == []
+
+
+def test_product_details():
+    page = "".join([
+        "<html><body>",
+        state_div("webDescription", {"richAnnotation": "<p>Тёплые ботинки</p> на&nbsp;меху"}),
+        state_div("webDescription", {"richAnnotation": "<p>Тёплые ботинки</p> на&nbsp;меху"}),
+        state_div("webShortCharacteristics", {"characteristics": [
+            {"name": "Материал", "values": [{"text": "Кожа"}, {"text": "Мех"}]},
+            {"name": "Сезон", "values": [{"text": ""}]},
+        ]}),
+        state_div("webGallery", {"text": "не описание"}),
+        "</body></html>",
+    ])
+    details = extract_product_details(page)
+    assert details == {"description": "Тёплые ботинки на меху", "characteristics": ["Материал: Кожа, Мех"]}
+    assert product_text(details) == "Тёплые ботинки на меху Материал: Кожа, Мех"